@@ -190,6 +190,14 @@ class SubMaster:
       self.valid[s] = False
       self.freq_tracker[s] = FrequencyTracker(SERVICE_LIST[s].frequency, self.update_freq, s == poll)
 
+    # per-service bookkeeping is fixed at init, so split services up front instead of deciding every update
+    # services with an expected frequency get alive and frequency checks, the rest are always alive and freq ok
+    self._checked_services = {s for s in services if SERVICE_LIST[s].frequency > 1e-5 and not self.simulation}
+    self._alive_timeouts = [(s, 10. / SERVICE_LIST[s].frequency) for s in services if s in self._checked_services]
+    self._unchecked_services = [s for s in services if s not in self._checked_services]
+    self._non_polled_socks = [self.sock[s] for s in self.non_polled_services]
+    self._updated_services: List[str] = []
+
   def __getitem__(self, s: str) -> capnp.lib.capnp._DynamicStructReader:
     return self.data[s]
 
@@ -197,41 +205,53 @@ class SubMaster:
     return SERVICE_LIST[s].frequency > 0.99 and (s not in self.ignore_average_freq) and (s not in self.ignore_alive)
 
   def update(self, timeout: int = 100) -> None:
-    msgs = []
-    for sock in self.poller.poll(timeout):
-      msgs.append(recv_one_or_none(sock))
+    # drain every ready socket first, then parse. sockets are conflated, so there's at most one message each
+    dats = [sock.receive(non_blocking=True) for sock in self.poller.poll(timeout)]
 
     # non-blocking receive for non-polled sockets
-    for s in self.non_polled_services:
-      msgs.append(recv_one_or_none(self.sock[s]))
-    self.update_msgs(time.monotonic(), msgs)
+    dats += [sock.receive(non_blocking=True) for sock in self._non_polled_socks]
+    self.update_msgs(time.monotonic(), [log_from_bytes(dat) for dat in dats if dat is not None])
 
   def update_msgs(self, cur_time: float, msgs: List[capnp.lib.capnp._DynamicStructReader]) -> None:
     self.frame += 1
-    self.updated = dict.fromkeys(self.services, False)
+
+    # only reset what was set last frame, the dicts are reused
+    updated = self.updated
+    for s in self._updated_services:
+      updated[s] = False
+    self._updated_services.clear()
+
     for msg in msgs:
       if msg is None:
         continue
 
       s = msg.which()
+      if not updated[s]:
+        self._updated_services.append(s)
       self.seen[s] = True
-      self.updated[s] = True
+      updated[s] = True
 
-      self.freq_tracker[s].record_recv_time(cur_time)
+      if s in self._checked_services:
+        self.freq_tracker[s].record_recv_time(cur_time)
       self.recv_time[s] = cur_time
       self.recv_frame[s] = self.frame
       self.data[s] = getattr(msg, s)
       self.logMonoTime[s] = msg.logMonoTime
       self.valid[s] = msg.valid
 
-    for s in self.services:
-      if SERVICE_LIST[s].frequency > 1e-5 and not self.simulation:
-        # alive if delay is within 10x the expected frequency
-        self.alive[s] = (cur_time - self.recv_time[s]) < (10. / SERVICE_LIST[s].frequency)
+    # alive if delay is within 10x the expected frequency
+    recv_time, alive = self.recv_time, self.alive
+    for s, alive_timeout in self._alive_timeouts:
+      alive[s] = (cur_time - recv_time[s]) < alive_timeout
+
+    # the frequency tracker only changes when a message is received
+    for s in self._updated_services:
+      if s in self._checked_services:
         self.freq_ok[s] = self.freq_tracker[s].valid
-      else:
-        self.freq_ok[s] = True
-        self.alive[s] = self.seen[s] if self.simulation else True
+
+    for s in self._unchecked_services:
+      self.freq_ok[s] = True
+      alive[s] = self.seen[s] if self.simulation else True
 
   def all_alive(self, service_list: Optional[List[str]] = None) -> bool:
     return all(self.alive[s] for s in (service_list or self.services) if s not in self.ignore_alive)
@@ -3,6 +3,7 @@ import time
 from typing import Sized, cast
 
 import cereal.messaging as messaging
+from cereal.services import SERVICE_LIST
 from cereal.messaging.tests.test_messaging import events, random_sock, random_socks, \
                                                   random_bytes, random_carstate, assert_carstate, \
                                                   zmq_sleep
@@ -94,6 +95,30 @@ class TestSubMaster:
         else:
           assert not sm._check_avg_freq(service)
 
+  def test_update_msgs(self):
+    socks = ["carState", "modelV2", "carParams", "liveCalibration"]
+    sm = messaging.SubMaster(socks)
+
+    for i in range(200):
+      t = 1. + i * 0.01
+      sent = [s for s in socks if random.random() > 0.5]
+      msgs = [messaging.new_message(s, valid=bool(i % 2)) for s in sent]
+      sm.update_msgs(t, msgs)
+
+      assert sm.frame == i
+      assert {s for s, u in sm.updated.items() if u} == set(sent)
+      for s in sent:
+        assert sm.recv_frame[s] == i
+        assert sm.valid[s] == bool(i % 2)
+
+      # state is only updated on receive, but must match a full recompute every frame
+      for s in socks:
+        if SERVICE_LIST[s].frequency > 1e-5:
+          assert sm.freq_ok[s] == sm.freq_tracker[s].valid
+          assert sm.alive[s] == ((t - sm.recv_time[s]) < (10. / SERVICE_LIST[s].frequency))
+        else:
+          assert sm.freq_ok[s] and sm.alive[s]
+
   def test_alive(self):
     pass
 
@@ -1,3 +1,8 @@
+from bisect import bisect_left
+
+import numpy as np
+
+
 def clip(x, lo, hi):
   return max(lo, min(hi, x))
 
@@ -5,15 +10,66 @@ def interp(x, xp, fp):
   N = len(xp)
 
   def get_interp(xv):
-    hi = 0
-    while hi < N and xv > xp[hi]:
-      hi += 1
+    hi = bisect_left(xp, xv)
     low = hi - 1
-    return fp[-1] if hi == N and xv > xp[low] else (
+    return fp[-1] if hi == N else (
       fp[0] if hi == 0 else
       (xv - xp[low]) * (fp[hi] - fp[low]) / (xp[hi] - xp[low]) + fp[low])
 
   return [get_interp(v) for v in x] if hasattr(x, '__iter__') else get_interp(x)
 
+
+class Interpolator:
+  """
+  interp(x, xp, fp) with the table fixed up front, for lookups that run every control step.
+
+  Segment deltas are computed once at construction, and each scalar lookup is a bisect and one
+  multiply-divide. Results match interp exactly: the deltas are kept as rise and run instead of
+  a slope so the floating point operations are the same. Breakpoints must be non-decreasing.
+  Arrays and other iterables are interpolated vectorized and returned as an np.ndarray.
+  """
+
+  def __init__(self, xp, fp):
+    xp = xp.tolist() if isinstance(xp, np.ndarray) else list(xp)
+    fp = fp.tolist() if isinstance(fp, np.ndarray) else list(fp)
+    assert len(xp) == len(fp) > 0, "breakpoints and values need the same, non-zero length"
+    assert all(a <= b for a, b in zip(xp[:-1], xp[1:], strict=True)), "breakpoints must be non-decreasing"
+
+    self.xp = xp
+    self.fp = fp
+    self.x_lo, self.x_hi = xp[0], xp[-1]
+    self.f_lo, self.f_hi = fp[0], fp[-1]
+    # run and rise of the segment ending at each breakpoint
+    self.dx = [1.0] + [b - a for a, b in zip(xp[:-1], xp[1:], strict=True)]
+    self.df = [0.0] + [b - a for a, b in zip(fp[:-1], fp[1:], strict=True)]
+
+    self._xp = np.array(xp, dtype=np.float64)
+    self._fp = np.array(fp, dtype=np.float64)
+    self._dx = np.array(self.dx, dtype=np.float64)
+    self._df = np.array(self.df, dtype=np.float64)
+
+  def __call__(self, x):
+    if hasattr(x, '__iter__'):
+      return self.interp_array(x)
+    if not x > self.x_lo:  # also NaN, like interp
+      return self.f_lo
+    if x > self.x_hi:
+      return self.f_hi
+    hi = bisect_left(self.xp, x)
+    return (x - self.xp[hi - 1]) * self.df[hi] / self.dx[hi] + self.fp[hi - 1]
+
+  def interp_array(self, x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    hi = np.searchsorted(self._xp, x, side='left')
+    np.clip(hi, 1, len(self._xp) - 1, out=hi)
+    low = hi - 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+      out = (x - self._xp[low]) * self._df[hi] / self._dx[hi] + self._fp[low]
+      out[x > self.x_hi] = self.f_hi
+      out[~(x > self.x_lo)] = self.f_lo
+    return out
+
+
 def mean(x):
   return sum(x) / len(x)
@@ -0,0 +1,214 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+
+from openpilot.common.params import Params, ParamKeyType
+from openpilot.common.swaglog import cloudlog
+
+# from linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+ParamsCallback = Callable[[str], None]
+
+
+def _inotify_init(path: str) -> int | None:
+  """Returns a non-blocking inotify fd watching path, or None if inotify isn't available (e.g. macOS)"""
+  try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+  except (OSError, AttributeError):
+    return None
+
+  if fd < 0:
+    return None
+  if libc.inotify_add_watch(fd, path.encode(), WATCH_MASK) < 0:
+    os.close(fd)
+    return None
+  return fd
+
+
+def _stat_key(path: str) -> tuple[int, int, int] | None:
+  try:
+    st = os.stat(path)
+  except FileNotFoundError:
+    return None
+  return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class ParamsCache:
+  """
+  Per-process read cache for Params.
+
+  Each key is read from disk once and then served from memory until a change to its file
+  is seen on the params directory through inotify, so reading params in a loop costs a dict
+  lookup instead of open/read/close. Callbacks registered with subscribe() are called with the
+  key from the watcher thread whenever it changes, so daemons don't need to poll at all.
+
+  Without inotify, the watcher falls back to stat-ing the cached keys every poll_interval.
+  """
+
+  def __init__(self, d: str = "", poll_interval: float = 0.1):
+    self.params = Params(d)
+    self.path = os.path.realpath(self.params.get_param_path())
+    self.poll_interval = poll_interval
+
+    self._lock = threading.Lock()
+    self._values: dict[str, bytes | None] = {}
+    # only kept for keys that are cached, subscribed or being read, the params dir has many other names
+    self._versions: dict[str, int] = {}
+    self._reading: dict[str, int] = {}
+    # bumped by clear_all, which can remove keys that aren't cached yet
+    self._generation = 0
+    self._stats: dict[str, tuple[int, int, int] | None] = {}
+    self._callbacks: dict[str, list[ParamsCallback]] = defaultdict(list)
+
+    self._inotify_fd = _inotify_init(self.path)
+    self._stop_r, self._stop_w = os.pipe()
+    self._thread = threading.Thread(target=self._watch_thread, daemon=True)
+    self._thread.start()
+
+  def get(self, key: str | bytes, encoding: str = None) -> bytes | str | None:
+    key = key.decode() if isinstance(key, bytes) else key
+    try:
+      val = self._values[key]
+    except KeyError:
+      val = self._read(key)
+    return val if val is None or encoding is None else val.decode(encoding)
+
+  def get_bool(self, key: str | bytes) -> bool:
+    return self.get(key) == b"1"
+
+  def put(self, key: str | bytes, dat: str | bytes) -> None:
+    self.params.put(key, dat)
+    self._drop(key.decode() if isinstance(key, bytes) else key)
+
+  def put_bool(self, key: str | bytes, val: bool) -> None:
+    self.params.put_bool(key, val)
+    self._drop(key.decode() if isinstance(key, bytes) else key)
+
+  def remove(self, key: str | bytes) -> None:
+    self.params.remove(key)
+    self._drop(key.decode() if isinstance(key, bytes) else key)
+
+  def clear_all(self, tx_type: ParamKeyType = ParamKeyType.ALL) -> None:
+    self.params.clear_all(tx_type)
+    with self._lock:
+      self._generation += 1
+      self._values.clear()
+
+  def subscribe(self, keys: str | Iterable[str], callback: ParamsCallback) -> None:
+    """Call callback(key) from the watcher thread every time one of keys changes"""
+    for key in ([keys] if isinstance(keys, str) else keys):
+      self.params.check_key(key)
+      with self._lock:
+        self._callbacks[key].append(callback)
+        if self._inotify_fd is None and key not in self._stats:
+          self._stats[key] = _stat_key(os.path.join(self.path, key))
+
+  def unsubscribe(self, keys: str | Iterable[str], callback: ParamsCallback) -> None:
+    for key in ([keys] if isinstance(keys, str) else keys):
+      with self._lock:
+        if callback in self._callbacks.get(key, []):
+          self._callbacks[key].remove(callback)
+
+  def close(self) -> None:
+    if self._thread.is_alive():
+      os.write(self._stop_w, b"\x00")
+      self._thread.join()
+    for fd in (self._inotify_fd, self._stop_r, self._stop_w):
+      if fd is not None:
+        os.close(fd)
+    self._inotify_fd = None
+
+  def _read(self, key: str) -> bytes | None:
+    # a change or clear_all seen while reading bumps the version or generation, and then the (possibly stale) value isn't cached
+    with self._lock:
+      version = (self._generation, self._versions.get(key, 0))
+      self._reading[key] = self._reading.get(key, 0) + 1
+      if self._inotify_fd is None:
+        self._stats[key] = _stat_key(os.path.join(self.path, key))
+
+    val = None
+    try:
+      val = self.params.get(key)
+    finally:
+      with self._lock:
+        self._reading[key] -= 1
+        if not self._reading[key]:
+          del self._reading[key]
+        if (self._generation, self._versions.get(key, 0)) == version:
+          self._values[key] = val
+    return val
+
+  def _drop(self, key: str) -> None:
+    with self._lock:
+      if key in self._values or key in self._reading or self._callbacks.get(key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+      self._values.pop(key, None)
+
+  def _changed_keys_inotify(self) -> Iterable[str]:
+    try:
+      buf = os.read(self._inotify_fd, 64 * 1024)
+    except BlockingIOError:
+      return []
+
+    keys: dict[str, None] = {}
+    offset = 0
+    while offset < len(buf):
+      _, mask, _, name_len = INOTIFY_EVENT.unpack_from(buf, offset)
+      offset += INOTIFY_EVENT.size
+      if mask & IN_Q_OVERFLOW:
+        # events were lost, everything is suspect
+        with self._lock:
+          return set(self._values) | set(self._callbacks)
+      name = buf[offset:offset + name_len].rstrip(b"\x00").decode()
+      # skip the .tmp_value_XXXXXX files Params::put writes before renaming them over the key
+      if name and not name.startswith("."):
+        keys[name] = None
+      offset += name_len
+    return keys
+
+  def _changed_keys_stat(self) -> Iterable[str]:
+    with self._lock:
+      stats = dict(self._stats)
+
+    keys = []
+    for key, prev in stats.items():
+      cur = _stat_key(os.path.join(self.path, key))
+      if cur != prev:
+        with self._lock:
+          self._stats[key] = cur
+        keys.append(key)
+    return keys
+
+  def _watch_thread(self) -> None:
+    while True:
+      if self._inotify_fd is not None:
+        ready, _, _ = select.select([self._inotify_fd, self._stop_r], [], [])
+      else:
+        ready, _, _ = select.select([self._stop_r], [], [], self.poll_interval)
+      if self._stop_r in ready:
+        break
+
+      changed = self._changed_keys_inotify() if self._inotify_fd is not None else self._changed_keys_stat()
+      for key in changed:
+        self._drop(key)
+        with self._lock:
+          callbacks = list(self._callbacks.get(key, []))
+        for callback in callbacks:
+          try:
+            callback(key)
+          except Exception:
+            cloudlog.exception(f"params cache callback failed for {key}")
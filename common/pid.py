@@ -1,7 +1,7 @@
 import numpy as np
 from numbers import Number
 
-from openpilot.common.numpy_fast import clip, interp
+from openpilot.common.numpy_fast import Interpolator, clip
 
 
 class PIDController:
@@ -16,6 +16,9 @@ class PIDController:
       self._k_i = [[0], [self._k_i]]
     if isinstance(self._k_d, Number):
       self._k_d = [[0], [self._k_d]]
+    self._k_p_interp = Interpolator(*self._k_p)
+    self._k_i_interp = Interpolator(*self._k_i)
+    self._k_d_interp = Interpolator(*self._k_d)
 
     self.pos_limit = pos_limit
     self.neg_limit = neg_limit
@@ -28,15 +31,15 @@ class PIDController:
 
   @property
   def k_p(self):
-    return interp(self.speed, self._k_p[0], self._k_p[1])
+    return self._k_p_interp(self.speed)
 
   @property
   def k_i(self):
-    return interp(self.speed, self._k_i[0], self._k_i[1])
+    return self._k_i_interp(self.speed)
 
   @property
   def k_d(self):
-    return interp(self.speed, self._k_d[0], self._k_d[1])
+    return self._k_d_interp(self.speed)
 
   @property
   def error_integral(self):
@@ -1,12 +1,16 @@
 """Utilities for reading real time clocks and keeping soft real time constraints."""
 import gc
+import itertools
+import mmap
 import os
 import time
+import weakref
 from collections import deque
 
 from setproctitle import getproctitle
 
 from openpilot.system.hardware import PC
+from openpilot.system.hardware.hw import Paths
 
 
 # time step for each process
@@ -44,6 +48,121 @@ def config_realtime_process(cores: int | list[int], priority: int) -> None:
   set_core_affinity(c)
 
 
+# Loop stats table layout, in 8 byte slots. Histograms are linear from 0 to 2 loop intervals,
+# the last bucket also counts everything slower.
+LOOP_STATS_VERSION = 1
+LOOP_STATS_BUCKETS = 64
+LOOP_STATS_BUCKETS_PER_INTERVAL = 32
+_SLOT_VERSION, _SLOT_PID, _SLOT_RATE, _SLOT_FRAMES, _SLOT_OVERRUNS, _SLOT_MAX_DT = range(6)
+_NAME_OFFSET, _NAME_LEN = 8 * 8, 64
+_SLOT_DT_HIST = 16
+_SLOT_WORK_HIST = _SLOT_DT_HIST + LOOP_STATS_BUCKETS
+_LOOP_STATS_SIZE = 8 * (_SLOT_WORK_HIST + LOOP_STATS_BUCKETS)
+_loop_stats_ids = itertools.count()
+
+
+def _remove_loop_stats(path):
+  try:
+    os.unlink(path)
+  except OSError:
+    pass
+
+
+class LoopStats:
+  """
+  Per loop counters and histograms of loop period and work time, kept in a small shared memory table
+  so tools can read every process's loop timing live without a subscriber in the loop.
+  Each table is a file in Paths.loop_stats_root(), removed when the owner goes away.
+  """
+
+  def __init__(self, rate: float, name: str) -> None:
+    self._scale = rate * LOOP_STATS_BUCKETS_PER_INTERVAL
+    self.path: str | None = None
+    buf: mmap.mmap | bytearray
+    try:
+      root = Paths.loop_stats_root()
+      os.makedirs(root, exist_ok=True)
+      path = os.path.join(root, f"{os.getpid()}_{next(_loop_stats_ids)}")
+      fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+      try:
+        os.ftruncate(fd, _LOOP_STATS_SIZE)
+        buf = mmap.mmap(fd, _LOOP_STATS_SIZE)
+      finally:
+        os.close(fd)
+      self.path = path
+      weakref.finalize(self, _remove_loop_stats, path)
+    except OSError:
+      # not exported, stats are still kept in process
+      buf = bytearray(_LOOP_STATS_SIZE)
+
+    self._buf = buf
+    buf[_NAME_OFFSET:_NAME_OFFSET + _NAME_LEN] = name.encode()[:_NAME_LEN].ljust(_NAME_LEN, b'\0')
+    self._u = memoryview(buf).cast('Q')
+    self._d = memoryview(buf).cast('d')
+    self._dt_hist = self._u[_SLOT_DT_HIST:_SLOT_DT_HIST + LOOP_STATS_BUCKETS]
+    self._work_hist = self._u[_SLOT_WORK_HIST:_SLOT_WORK_HIST + LOOP_STATS_BUCKETS]
+    self._max_dt = 0.
+    self._u[_SLOT_PID] = os.getpid()
+    self._d[_SLOT_RATE] = rate
+    self._u[_SLOT_VERSION] = LOOP_STATS_VERSION
+
+  # called every loop, so kept to a handful of stores
+  def update(self, dt: float, work: float, overrun: bool) -> None:
+    b = int(dt * self._scale)
+    self._dt_hist[b if b < LOOP_STATS_BUCKETS else LOOP_STATS_BUCKETS - 1] += 1
+    b = int(work * self._scale)
+    self._work_hist[b if b < LOOP_STATS_BUCKETS else LOOP_STATS_BUCKETS - 1] += 1
+    self._u[_SLOT_FRAMES] += 1
+    if overrun:
+      self._u[_SLOT_OVERRUNS] += 1
+    if dt > self._max_dt:
+      self._max_dt = self._d[_SLOT_MAX_DT] = dt
+
+  def read(self) -> dict:
+    return _parse_loop_stats(self._buf)
+
+
+def _parse_loop_stats(buf) -> dict:
+  u, d = memoryview(buf).cast('Q'), memoryview(buf).cast('d')
+  return {
+    'version': u[_SLOT_VERSION],
+    'pid': u[_SLOT_PID],
+    'name': bytes(buf[_NAME_OFFSET:_NAME_OFFSET + _NAME_LEN]).rstrip(b'\0').decode(errors='replace'),
+    'rate': d[_SLOT_RATE],
+    'frames': u[_SLOT_FRAMES],
+    'overruns': u[_SLOT_OVERRUNS],
+    'max_dt': d[_SLOT_MAX_DT],
+    'dt_hist': u[_SLOT_DT_HIST:_SLOT_DT_HIST + LOOP_STATS_BUCKETS].tolist(),
+    'work_hist': u[_SLOT_WORK_HIST:_SLOT_WORK_HIST + LOOP_STATS_BUCKETS].tolist(),
+  }
+
+
+def read_loop_stats(path: str) -> dict | None:
+  """Snapshot of a LoopStats table, None if it's gone or not a table of this version"""
+  try:
+    with open(path, 'rb') as f:
+      buf = f.read(_LOOP_STATS_SIZE)
+  except OSError:
+    return None
+  if len(buf) != _LOOP_STATS_SIZE:
+    return None
+  stats = _parse_loop_stats(buf)
+  return stats if stats['version'] == LOOP_STATS_VERSION else None
+
+
+def loop_stats_percentile(hist: list[int], rate: float, p: float) -> float:
+  """Upper edge in seconds of the histogram bucket holding the p'th percentile, nan if empty"""
+  total = sum(hist)
+  if total == 0:
+    return float('nan')
+  target, seen = total * p / 100., 0
+  for i, n in enumerate(hist):
+    seen += n
+    if seen >= target:
+      return (i + 1) / (rate * LOOP_STATS_BUCKETS_PER_INTERVAL)
+  return len(hist) / (rate * LOOP_STATS_BUCKETS_PER_INTERVAL)
+
+
 class Ratekeeper:
   def __init__(self, rate: float, print_delay_threshold: float | None = 0.0) -> None:
     """Rate in Hz for ratekeeping. print_delay_threshold must be nonnegative."""
@@ -54,7 +173,10 @@ class Ratekeeper:
     self._remaining = 0.0
     self._process_name = getproctitle()
     self._dts = deque([self._interval], maxlen=100)
+    self._dts_sum = self._interval
     self._last_monitor_time = time.monotonic()
+    self._loop_start_time = self._last_monitor_time
+    self.stats = LoopStats(rate, self._process_name)
 
   @property
   def frame(self) -> int:
@@ -66,7 +188,7 @@ class Ratekeeper:
 
   @property
   def lagging(self) -> bool:
-    avg_dt = sum(self._dts) / len(self._dts)
+    avg_dt = self._dts_sum / len(self._dts)
     expected_dt = self._interval * (1 / 0.9)
     return avg_dt > expected_dt
 
@@ -75,20 +197,30 @@ class Ratekeeper:
     lagged = self.monitor_time()
     if self._remaining > 0:
       time.sleep(self._remaining)
+      self._loop_start_time = time.monotonic()
     return lagged
 
   # Monitors the cumulative lag, but does not enforce a rate
   def monitor_time(self) -> bool:
     prev = self._last_monitor_time
-    self._last_monitor_time = time.monotonic()
-    self._dts.append(self._last_monitor_time - prev)
+    now = self._last_monitor_time = time.monotonic()
+    dt = now - prev
+    if len(self._dts) == self._dts.maxlen:
+      self._dts_sum -= self._dts[0]
+    self._dts.append(dt)
+    self._dts_sum += dt
+    if self._frame % self._dts.maxlen == 0:
+      # drop accumulated rounding error
+      self._dts_sum = sum(self._dts)
 
     lagged = False
-    remaining = self._next_frame_time - time.monotonic()
+    remaining = self._next_frame_time - now
     self._next_frame_time += self._interval
     if self._print_delay_threshold is not None and remaining < -self._print_delay_threshold:
       print(f"{self._process_name} lagging by {-remaining * 1000:.2f} ms")
       lagged = True
+    self.stats.update(dt, now - self._loop_start_time, remaining < 0)
+    self._loop_start_time = now
     self._frame += 1
     self._remaining = remaining
     return lagged
@@ -1,6 +1,42 @@
+import math
 import numpy as np
+import pytest
 
-from openpilot.common.numpy_fast import interp
+from openpilot.common.numpy_fast import Interpolator, interp
+
+
+def interp_reference(x, xp, fp):
+  # linear scan implementation interp replaced, the semantics to keep
+  N = len(xp)
+
+  def get_interp(xv):
+    hi = 0
+    while hi < N and xv > xp[hi]:
+      hi += 1
+    low = hi - 1
+    return fp[-1] if hi == N and xv > xp[low] else (
+      fp[0] if hi == 0 else
+      (xv - xp[low]) * (fp[hi] - fp[low]) / (xp[hi] - xp[low]) + fp[low])
+
+  return [get_interp(v) for v in x] if hasattr(x, '__iter__') else get_interp(x)
+
+
+TABLES = [
+  ([0., 5., 10., 20., 40.], [-1.0, -.8, -.67, -.5, -.30]),
+  ([0, 10, 20, 30], [15, 13, 10, 5]),
+  ([2.0, 5.0], [0.1, -0.3]),
+  ([0.], [1.5]),
+  ([0, 0, 1, 1, 2, 2], [1, 2, 3, 4, 5, 6]),
+  ([-3., -1., -1., 4.], [7., 0., 2., -9.]),
+  (np.array([0., 10., 25., 40.]), np.array([1.6, 1.2, 0.8, 0.6])),
+]
+
+
+def points(xp):
+  xs = [-1e9, -1e-12, 1e9, math.inf, -math.inf]
+  for x in sorted({float(v) for v in xp}):
+    xs += [x, x - 1e-9, x + 1e-9, x + 0.5, x - 0.5, int(x)]
+  return xs + list(np.random.uniform(min(xp) - 5, max(xp) + 5, 100))
 
 
 class TestInterp:
@@ -19,3 +55,52 @@ class TestInterp:
       expected = np.interp(v_ego, _A_CRUISE_MIN_BP, _A_CRUISE_MIN_V)
       actual = interp(v_ego, _A_CRUISE_MIN_BP, _A_CRUISE_MIN_V)
       np.testing.assert_equal(actual, expected)
+
+  @pytest.mark.parametrize("xp,fp", TABLES)
+  def test_parity(self, xp, fp):
+    xs = points(xp)
+    expected = interp_reference(xs, xp, fp)
+    assert interp(xs, xp, fp) == expected
+    for x, e in zip(xs, expected, strict=True):
+      actual = interp(x, xp, fp)
+      assert actual == e and type(actual) is type(e), x
+
+  def test_nan(self):
+    assert interp(math.nan, [0., 1.], [2., 3.]) == 2.
+
+
+class TestInterpolator:
+  @pytest.mark.parametrize("xp,fp", TABLES)
+  def test_scalar_parity(self, xp, fp):
+    f = Interpolator(xp, fp)
+    for x in points(xp):
+      expected = interp_reference(x, xp, fp)
+      actual = f(x)
+      assert actual == expected, x
+      assert isinstance(actual, int) == isinstance(expected, int), x
+
+  @pytest.mark.parametrize("xp,fp", TABLES)
+  def test_array_parity(self, xp, fp):
+    f = Interpolator(xp, fp)
+    xs = points(xp)
+    expected = np.array(interp_reference(xs, xp, fp), dtype=np.float64)
+    for x in (np.array(xs), xs, tuple(xs)):
+      actual = f(x)
+      assert isinstance(actual, np.ndarray) and actual.shape == (len(xs),)
+      np.testing.assert_array_equal(actual, expected)
+
+    grid = np.array(xs[:100]).reshape(10, 10)
+    np.testing.assert_array_equal(f(grid), expected[:100].reshape(10, 10))
+
+  def test_nan(self):
+    f = Interpolator([0., 1.], [2., 3.])
+    assert f(math.nan) == 2.
+    np.testing.assert_array_equal(f([math.nan, 0.5]), [2., 2.5])
+
+  def test_invalid_table(self):
+    with pytest.raises(AssertionError):
+      Interpolator([1., 0.], [0., 1.])
+    with pytest.raises(AssertionError):
+      Interpolator([0., 1.], [0.])
+    with pytest.raises(AssertionError):
+      Interpolator([], [])
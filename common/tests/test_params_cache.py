@@ -0,0 +1,140 @@
+import multiprocessing
+import threading
+import time
+
+from openpilot.common.params import Params
+from openpilot.common.params_cache import ParamsCache
+import openpilot.common.params_cache as params_cache
+
+
+def wait_for(cond, timeout=2.):
+  st = time.monotonic()
+  while not cond():
+    if time.monotonic() - st > timeout:
+      return False
+    time.sleep(0.005)
+  return True
+
+
+def _writer(key, n, offset):
+  params = Params()
+  for i in range(n):
+    params.put(key, str(offset + i))
+
+
+class TestParamsCache:
+  def setup_method(self):
+    self.params = Params()
+    self.params.remove("CarParams")
+    self.params.remove("IsMetric")
+    self.cache = ParamsCache()
+
+  def teardown_method(self):
+    self.cache.close()
+
+  def test_get(self):
+    assert self.cache.get("CarParams") is None
+    self.params.put("CarParams", "test")
+    assert wait_for(lambda: self.cache.get("CarParams") == b"test")
+    assert self.cache.get("CarParams", encoding="utf8") == "test"
+
+  def test_get_bool(self):
+    assert not self.cache.get_bool("IsMetric")
+    self.params.put_bool("IsMetric", True)
+    assert wait_for(lambda: self.cache.get_bool("IsMetric"))
+    self.params.remove("IsMetric")
+    assert wait_for(lambda: not self.cache.get_bool("IsMetric"))
+
+  def test_local_write(self):
+    # writes through the cache are visible immediately
+    for i in range(10):
+      self.cache.put("CarParams", str(i))
+      assert self.cache.get("CarParams") == str(i).encode()
+    self.cache.remove("CarParams")
+    assert self.cache.get("CarParams") is None
+
+  def test_clear_all(self):
+    self.cache.put("CarParams", "test")
+    assert self.cache.get("CarParams") == b"test"
+    self.cache.clear_all()
+    assert self.cache.get("CarParams") is None
+
+  def test_clear_all_during_read(self, mocker):
+    # a read of an uncached key that races clear_all must not cache what it read before the clear
+    mocker.patch.object(params_cache, "_inotify_init", return_value=None)
+    cache = ParamsCache(poll_interval=60)
+    try:
+      self.params.put("CarParams", "test")
+      get = cache.params.get
+      def get_then_clear(key, *args, **kwargs):
+        val = get(key, *args, **kwargs)
+        cache.clear_all()
+        return val
+      mocker.patch.object(cache.params, "get", side_effect=get_then_clear)
+      assert cache.get("CarParams") == b"test"
+
+      mocker.patch.object(cache.params, "get", side_effect=get)
+      assert cache.get("CarParams") is None
+    finally:
+      cache.close()
+
+  def test_untracked_writes(self):
+    # writes to keys this process never read, and the tmp files Params::put renames, must not be tracked
+    self.cache.get("CarParams")
+    for i in range(20):
+      self.params.put("IsMetric", str(i))
+    self.params.put("CarParams", "test")
+    assert wait_for(lambda: self.cache.get("CarParams") == b"test")
+    assert set(self.cache._versions) <= {"CarParams"}
+
+  def test_subscribe(self):
+    changed = []
+    self.cache.subscribe(["CarParams", "IsMetric"], changed.append)
+    self.params.put("CarParams", "test")
+    self.params.put_bool("IsMetric", True)
+    assert wait_for(lambda: {"CarParams", "IsMetric"} <= set(changed))
+
+    self.cache.unsubscribe("CarParams", changed.append)
+    changed.clear()
+    self.params.put("CarParams", "test2")
+    self.params.put_bool("IsMetric", False)
+    assert wait_for(lambda: "IsMetric" in changed)
+    time.sleep(0.1)
+    assert "CarParams" not in changed
+
+  def test_concurrent_writers(self):
+    # readers hammer the cache while other processes and threads write, it must settle on what's on disk
+    stop = threading.Event()
+    def reader():
+      while not stop.is_set():
+        self.cache.get("CarParams")
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for t in readers:
+      t.start()
+
+    for _ in range(3):
+      writers = [multiprocessing.Process(target=_writer, args=("CarParams", 50, i * 1000)) for i in range(4)]
+      writers += [threading.Thread(target=_writer, args=("CarParams", 50, (i + 4) * 1000)) for i in range(2)]
+      for w in writers:
+        w.start()
+      for w in writers:
+        w.join()
+      assert wait_for(lambda: self.cache.get("CarParams") == self.params.get("CarParams"))
+
+    stop.set()
+    for t in readers:
+      t.join()
+
+  def test_stat_fallback(self, mocker):
+    mocker.patch.object(params_cache, "_inotify_init", return_value=None)
+    cache = ParamsCache(poll_interval=0.01)
+    try:
+      changed = []
+      cache.subscribe("IsMetric", changed.append)
+      assert cache.get("CarParams") is None
+      self.params.put("CarParams", "test")
+      self.params.put_bool("IsMetric", True)
+      assert wait_for(lambda: cache.get("CarParams") == b"test")
+      assert wait_for(lambda: changed == ["IsMetric"])
+    finally:
+      cache.close()
@@ -0,0 +1,68 @@
+import os
+import time
+
+from openpilot.common.realtime import LOOP_STATS_BUCKETS, LoopStats, Ratekeeper, loop_stats_percentile, read_loop_stats
+from openpilot.system.hardware.hw import Paths
+
+
+class TestLoopStats:
+  def test_histograms(self):
+    stats = LoopStats(100, "test_loop")
+    for _ in range(90):
+      stats.update(0.01, 0.002, False)
+    for _ in range(10):
+      stats.update(0.05, 0.04, True)
+
+    s = read_loop_stats(stats.path)
+    assert s == stats.read()
+    assert s['pid'] == os.getpid() and s['name'] == "test_loop" and s['rate'] == 100
+    assert s['frames'] == 100 and s['overruns'] == 10
+    assert s['max_dt'] == 0.05
+    assert sum(s['dt_hist']) == sum(s['work_hist']) == 100
+    assert s['dt_hist'][-1] == 10 and s['work_hist'][-1] == 10
+
+    bucket = 1 / (100 * 32)
+    assert 0.01 <= loop_stats_percentile(s['dt_hist'], 100, 50) <= 0.01 + bucket
+    assert 0.002 <= loop_stats_percentile(s['work_hist'], 100, 50) <= 0.002 + bucket
+    assert loop_stats_percentile(s['dt_hist'], 100, 99) == LOOP_STATS_BUCKETS * bucket
+
+  def test_removed(self):
+    stats = LoopStats(20, "test_loop")
+    path = stats.path
+    assert path.startswith(Paths.loop_stats_root()) and os.path.isfile(path)
+    del stats
+    assert not os.path.exists(path)
+    assert read_loop_stats(path) is None
+
+
+class TestRatekeeper:
+  def test_stats(self):
+    rk = Ratekeeper(100, print_delay_threshold=None)
+    for _ in range(20):
+      time.sleep(0.002)
+      rk.keep_time()
+    s = read_loop_stats(rk.stats.path)
+    assert s['frames'] == rk.frame == 20
+    assert sum(s['dt_hist']) == 20
+    # work is the time between waking up and the next keep_time, not the sleep
+    assert loop_stats_percentile(s['work_hist'], 100, 50) < 0.008
+    assert loop_stats_percentile(s['dt_hist'], 100, 50) > 0.008
+
+  def test_lagging(self):
+    rk = Ratekeeper(100, print_delay_threshold=None)
+    for _ in range(150):
+      rk.monitor_time()
+    assert not rk.lagging
+    for _ in range(30):
+      time.sleep(0.05)
+      rk.monitor_time()
+    assert rk.lagging
+    assert abs(rk._dts_sum - sum(rk._dts)) < 1e-9
+
+  def test_overruns(self):
+    rk = Ratekeeper(100, print_delay_threshold=None)
+    rk.keep_time()
+    time.sleep(0.03)
+    rk.keep_time()
+    assert rk.remaining < 0
+    assert read_loop_stats(rk.stats.path)['overruns'] == 1
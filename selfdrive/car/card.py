@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import os
 import time
-import threading
 
 import cereal.messaging as messaging
 
@@ -10,6 +9,7 @@ from cereal import car, log
 from panda import ALTERNATIVE_EXPERIENCE
 
 from openpilot.common.params import Params
+from openpilot.common.params_cache import ParamsCache
 from openpilot.common.realtime import config_realtime_process, Priority, Ratekeeper
 from openpilot.common.swaglog import cloudlog, ForwardingHandler
 
@@ -252,23 +252,20 @@ class Car:
     self.initialized_prev = initialized
     self.CS_prev = CS.as_reader()
 
-  def params_thread(self, evt):
-    while not evt.is_set():
-      self.is_metric = self.params.get_bool("IsMetric")
-      self.experimental_mode = self.params.get_bool("ExperimentalMode") and self.CP.openpilotLongitudinalControl
-      time.sleep(0.1)
+  def params_callback(self, key: str = None) -> None:
+    self.is_metric = self.params_cache.get_bool("IsMetric")
+    self.experimental_mode = self.params_cache.get_bool("ExperimentalMode") and self.CP.openpilotLongitudinalControl
 
   def card_thread(self):
-    e = threading.Event()
-    t = threading.Thread(target=self.params_thread, args=(e, ))
+    self.params_cache = ParamsCache()
     try:
-      t.start()
+      self.params_cache.subscribe(["IsMetric", "ExperimentalMode"], self.params_callback)
+      self.params_callback()
       while True:
         self.step()
         self.rk.monitor_time()
     finally:
-      e.set()
-      t.join()
+      self.params_cache.close()
 
 
 def main():
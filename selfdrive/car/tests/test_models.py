@@ -11,18 +11,18 @@ from parameterized import parameterized_class
 from cereal import messaging, log, car
 from openpilot.common.basedir import BASEDIR
 from openpilot.common.params import Params
-from opendbc.car import DT_CTRL, gen_empty_fingerprint, structs
+from opendbc.car import DT_CTRL, structs
 from opendbc.car.fingerprints import all_known_cars, MIGRATION
-from opendbc.car.car_helpers import FRAME_FINGERPRINT, interfaces
+from opendbc.car.car_helpers import interfaces
 from opendbc.car.honda.values import CAR as HONDA, HondaFlags
 from opendbc.car.values import Platform
 from opendbc.car.tests.routes import non_tested_cars, routes, CarTestRoute
+from openpilot.selfdrive.car.tests.testing_data import CarTestingData, extract_testing_data, load_testing_data
 from openpilot.selfdrive.selfdrived.events import ET
 from openpilot.selfdrive.selfdrived.selfdrived import SelfdriveD
 from openpilot.selfdrive.pandad import can_capnp_to_list
 from openpilot.selfdrive.test.helpers import read_segment_list
 from openpilot.system.hardware.hw import DEFAULT_DOWNLOAD_CACHE_ROOT
-from openpilot.tools.lib.logreader import LogReader
 from openpilot.tools.lib.route import SegmentName
 
 from panda.tests.libpanda import libpanda_py
@@ -75,46 +75,18 @@ class TestCarModelBase(unittest.TestCase):
 
   @classmethod
   def get_testing_data_from_logreader(cls, lr):
-    car_fw = []
-    can_msgs = []
-    cls.elm_frame = None
-    cls.car_safety_mode_frame = None
-    cls.fingerprint = gen_empty_fingerprint()
-    experimental_long = False
-    for msg in lr:
-      if msg.which() == "can":
-        can_msgs.append(msg)
-        if len(can_msgs) <= FRAME_FINGERPRINT:
-          for m in msg.can:
-            if m.src < 64:
-              cls.fingerprint[m.src][m.address] = len(m.dat)
-
-      elif msg.which() == "carParams":
-        car_fw = msg.carParams.carFw
-        if msg.carParams.openpilotLongitudinalControl:
-          experimental_long = True
-        if cls.platform is None and not cls.test_route_on_bucket:
-          live_fingerprint = msg.carParams.carFingerprint
-          cls.platform = MIGRATION.get(live_fingerprint, live_fingerprint)
-
-      # Log which can frame the panda safety mode left ELM327, for CAN validity checks
-      elif msg.which() == 'pandaStates':
-        for ps in msg.pandaStates:
-          if cls.elm_frame is None and ps.safetyModel != SafetyModel.elm327:
-            cls.elm_frame = len(can_msgs)
-          if cls.car_safety_mode_frame is None and ps.safetyModel not in \
-            (SafetyModel.elm327, SafetyModel.noOutput):
-            cls.car_safety_mode_frame = len(can_msgs)
-
-      elif msg.which() == 'pandaStateDEPRECATED':
-        if cls.elm_frame is None and msg.pandaStateDEPRECATED.safetyModel != SafetyModel.elm327:
-          cls.elm_frame = len(can_msgs)
-        if cls.car_safety_mode_frame is None and msg.pandaStateDEPRECATED.safetyModel not in \
-          (SafetyModel.elm327, SafetyModel.noOutput):
-          cls.car_safety_mode_frame = len(can_msgs)
-
-    if len(can_msgs) > int(50 / DT_CTRL):
-      return car_fw, can_msgs, experimental_long
+    return cls.use_testing_data(extract_testing_data(lr))
+
+  @classmethod
+  def use_testing_data(cls, data: CarTestingData):
+    cls.elm_frame = data.elm_frame
+    cls.car_safety_mode_frame = data.car_safety_mode_frame
+    cls.fingerprint = data.fingerprint
+    if cls.platform is None and not cls.test_route_on_bucket and data.live_fingerprint is not None:
+      cls.platform = MIGRATION.get(data.live_fingerprint, data.live_fingerprint)
+
+    if data.has_can:
+      return data.car_fw, data.can_msgs, data.experimental_long
 
     raise Exception("no can data found")
 
@@ -128,8 +100,8 @@ class TestCarModelBase(unittest.TestCase):
       segment_range = f"{cls.test_route.route}/{seg}"
 
       try:
-        lr = LogReader(segment_range)
-        return cls.get_testing_data_from_logreader(lr)
+        # extracted once per segment and cached, see testing_data.py to prefill the cache in parallel
+        return cls.use_testing_data(load_testing_data(segment_range))
       except Exception:
         pass
 
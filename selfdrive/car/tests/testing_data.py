@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import capnp
+import numpy as np
+
+from cereal import car, log
+from opendbc.car import DT_CTRL, gen_empty_fingerprint
+from opendbc.car.car_helpers import FRAME_FINGERPRINT
+from openpilot.common.file_helpers import atomic_write_in_dir
+from openpilot.system.hardware.hw import Paths
+from openpilot.tools.lib.logreader import LogReader
+
+SafetyModel = car.CarParams.SafetyModel
+
+# bump when the extracted fields change
+CACHE_VERSION = 1
+
+
+@dataclass
+class CarTestingData:
+  """What the car model tests read from a segment"""
+  can_msgs: list
+  # the last carParams event
+  car_params: capnp.lib.capnp._DynamicStructReader | None
+  experimental_long: bool
+  fingerprint: dict[int, dict[int, int]]
+  elm_frame: int | None
+  car_safety_mode_frame: int | None
+  live_fingerprint: str | None
+
+  @property
+  def car_fw(self):
+    return self.car_params.carParams.carFw if self.car_params is not None else []
+
+  @property
+  def has_can(self) -> bool:
+    return len(self.can_msgs) > int(50 / DT_CTRL)
+
+
+def extract_testing_data(lr) -> CarTestingData:
+  car_params = None
+  can_msgs = []
+  elm_frame = None
+  car_safety_mode_frame = None
+  fingerprint = gen_empty_fingerprint()
+  experimental_long = False
+  live_fingerprint = None
+  for msg in lr:
+    if msg.which() == "can":
+      can_msgs.append(msg)
+      if len(can_msgs) <= FRAME_FINGERPRINT:
+        for m in msg.can:
+          if m.src < 64:
+            fingerprint[m.src][m.address] = len(m.dat)
+
+    elif msg.which() == "carParams":
+      car_params = msg
+      if msg.carParams.openpilotLongitudinalControl:
+        experimental_long = True
+      live_fingerprint = msg.carParams.carFingerprint
+
+    # Log which can frame the panda safety mode left ELM327, for CAN validity checks
+    elif msg.which() == 'pandaStates':
+      for ps in msg.pandaStates:
+        if elm_frame is None and ps.safetyModel != SafetyModel.elm327:
+          elm_frame = len(can_msgs)
+        if car_safety_mode_frame is None and ps.safetyModel not in \
+          (SafetyModel.elm327, SafetyModel.noOutput):
+          car_safety_mode_frame = len(can_msgs)
+
+    elif msg.which() == 'pandaStateDEPRECATED':
+      if elm_frame is None and msg.pandaStateDEPRECATED.safetyModel != SafetyModel.elm327:
+        elm_frame = len(can_msgs)
+      if car_safety_mode_frame is None and msg.pandaStateDEPRECATED.safetyModel not in \
+        (SafetyModel.elm327, SafetyModel.noOutput):
+        car_safety_mode_frame = len(can_msgs)
+
+  return CarTestingData(can_msgs, car_params, experimental_long, fingerprint, elm_frame, car_safety_mode_frame, live_fingerprint)
+
+
+def cache_dir() -> str:
+  return os.path.join(Paths.download_cache_root(), "car_testing_data")
+
+
+def cache_path(segment_range: str) -> str:
+  key = hashlib.sha256(f"{CACHE_VERSION}:{segment_range}".encode()).hexdigest()[:32]
+  return os.path.join(cache_dir(), f"{key}.npz")
+
+
+def write_cache(path: str, data: CarTestingData) -> None:
+  """
+  CAN messages are kept as one serialized capnp stream, like an rlog with only CAN in it,
+  so loading is a single read_multiple_bytes instead of decoding the whole log.
+  """
+  can = b"".join(m.as_builder().to_bytes() for m in data.can_msgs)
+  car_params = data.car_params.as_builder().to_bytes() if data.car_params is not None else b""
+  fingerprint = np.array([(src, addr, size) for src, addrs in data.fingerprint.items() for addr, size in addrs.items()], dtype=np.int64).reshape(-1, 3)
+  meta = {'version': CACHE_VERSION, 'experimental_long': data.experimental_long, 'elm_frame': data.elm_frame,
+          'car_safety_mode_frame': data.car_safety_mode_frame, 'live_fingerprint': data.live_fingerprint, 'can_msgs': len(data.can_msgs)}
+
+  buf = io.BytesIO()
+  np.savez(buf, can=np.frombuffer(can, dtype=np.uint8), car_params=np.frombuffer(car_params, dtype=np.uint8),
+           fingerprint=fingerprint, meta=np.array(json.dumps(meta)))
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with atomic_write_in_dir(path, mode='wb', overwrite=True) as f:
+    f.write(buf.getvalue())
+
+
+def read_cache(path: str) -> CarTestingData:
+  with np.load(path, allow_pickle=False) as f:
+    meta = json.loads(str(f['meta']))
+    assert meta['version'] == CACHE_VERSION
+    can, car_params, fp = f['can'].tobytes(), f['car_params'].tobytes(), f['fingerprint']
+
+  can_msgs = list(log.Event.read_multiple_bytes(can))
+  assert len(can_msgs) == meta['can_msgs']
+  car_params = next(iter(log.Event.read_multiple_bytes(car_params))) if len(car_params) else None
+  fingerprint = gen_empty_fingerprint()
+  for src, addr, size in fp.tolist():
+    fingerprint[src][addr] = size
+  return CarTestingData(can_msgs, car_params, meta['experimental_long'], fingerprint, meta['elm_frame'], meta['car_safety_mode_frame'],
+                        meta['live_fingerprint'])
+
+
+def load_testing_data(segment_range: str, use_cache: bool = True) -> CarTestingData:
+  """Testing data of a segment from the cache, extracting and caching it on a miss"""
+  path = cache_path(segment_range)
+  if use_cache and os.path.isfile(path):
+    try:
+      return read_cache(path)
+    except Exception:
+      pass  # stale or partial, extract again
+
+  data = extract_testing_data(LogReader(segment_range))
+  if use_cache:
+    write_cache(path, data)
+  return data
+
+
+def _prepare_route(route_segs):
+  route, segs = route_segs
+  for seg in segs:
+    try:
+      if load_testing_data(f"{route}/{seg}").has_can:
+        return route, seg
+    except Exception:
+      pass
+  return route, None
+
+
+def prepare(test_cases, jobs=None):
+  """Extracts the testing data of every test route in parallel, trying segments in the order the tests do"""
+  routes = {}
+  for _, test_route in test_cases:
+    if test_route is not None:
+      routes[test_route.route] = (test_route.segment,) if test_route.segment is not None else (2, 1, 0)
+  with ProcessPoolExecutor(max_workers=jobs) as pool:
+    return dict(pool.map(_prepare_route, routes.items()))
+
+
+def time_test_models(pytest_args) -> tuple[float, float]:
+  """Wall time of the car model tests with the testing data cache cold, then warm. The logs stay in the download cache."""
+  shutil.rmtree(cache_dir(), ignore_errors=True)
+  cmd = [sys.executable, "-m", "pytest", os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_models.py"), *pytest_args]
+  times = []
+  for _ in range(2):
+    st = time.monotonic()
+    subprocess.run(cmd, check=False)
+    times.append(time.monotonic() - st)
+  return times[0], times[1]
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Extract and cache the CAN, carParams and fingerprints the car model tests use")
+  parser.add_argument("--jobs", type=int, default=os.cpu_count())
+  parser.add_argument("--timing", action="store_true", help="time the car model tests with a cold cache, then a warm one, instead of caching")
+  parser.add_argument("pytest_args", nargs="*", help="with --timing, passed to pytest, e.g. -- -n 8 -k TOYOTA")
+  args = parser.parse_args()
+
+  if args.timing:
+    cold, warm = time_test_models(args.pytest_args)
+    print(f"test_models.py: {cold:.1f} s with a cold cache, {warm:.1f} s warm")
+  else:
+    from openpilot.selfdrive.car.tests.test_models import get_test_cases
+    st = time.monotonic()
+    segs = prepare(get_test_cases(), jobs=args.jobs)
+    missing = [r for r, s in segs.items() if s is None]
+    print(f"cached {len(segs) - len(missing)} routes in {time.monotonic() - st:.1f} s, {len(missing)} failed: {missing}")
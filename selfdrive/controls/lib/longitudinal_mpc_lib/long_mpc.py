@@ -220,11 +220,35 @@ def gen_long_ocp():
   return ocp
 
 
+class SolverStats:
+  """Solver timings and QP iterations of the last `window` solves, and lifetime solve and reset counts"""
+  FIELDS = ('time_tot', 'time_qp', 'time_lin', 'qp_iter')
+
+  def __init__(self, window=100):
+    self.history = np.zeros((window, len(self.FIELDS)))
+    self.solves = 0
+    self.resets = 0
+
+  def record(self, time_tot, time_qp, time_lin, qp_iter):
+    self.history[self.solves % len(self.history)] = (time_tot, time_qp, time_lin, qp_iter)
+    self.solves += 1
+
+  def summary(self):
+    h = self.history[:min(self.solves, len(self.history))]
+    out = {'solves': self.solves, 'resets': self.resets}
+    for i, f in enumerate(self.FIELDS):
+      out[f] = {'mean': float(np.mean(h[:, i])) if len(h) else 0.0, 'max': float(np.max(h[:, i])) if len(h) else 0.0}
+    return out
+
+
 class LongitudinalMpc:
   def __init__(self, mode='acc', dt=DT_MDL):
     self.mode = mode
     self.dt = dt
     self.solver = AcadosOcpSolverCython(MODEL_NAME, ACADOS_SOLVER_TYPE, N)
+    self.stats = SolverStats()
+    # yref of all stages back to back as the solver takes it, the terminal stage has fewer costs
+    self.yref_flat = np.zeros(N * COST_DIM + COST_E_DIM)
     self.reset()
     self.source = SOURCES[2]
 
@@ -243,8 +267,7 @@ class LongitudinalMpc:
     self.x_sol = np.zeros((N+1, X_DIM))
     self.u_sol = np.zeros((N,1))
     self.params = np.zeros((N+1, PARAM_DIM))
-    for i in range(N+1):
-      self.solver.set(i, 'x', np.zeros(X_DIM))
+    self.solver.set_flat('x', np.zeros((N+1) * X_DIM))
     self.last_cloudlog_t = 0
     self.status = False
     self.crash_cnt = 0.0
@@ -254,6 +277,7 @@ class LongitudinalMpc:
     self.time_qp_solution = 0.0
     self.time_linearization = 0.0
     self.time_integrator = 0.0
+    self.qp_iter = 0
     self.x0 = np.zeros(X_DIM)
     self.set_weights()
 
@@ -292,8 +316,7 @@ class LongitudinalMpc:
     self.x0[1] = v
     self.x0[2] = a
     if abs(v_prev - v) > 2.:  # probably only helps if v < v_prev
-      for i in range(N+1):
-        self.solver.set(i, 'x', self.x0)
+      self.solver.set_flat('x', np.tile(self.x0, N+1))
 
   @staticmethod
   def extrapolate_lead(x_lead, v_lead, a_lead, a_lead_tau):
@@ -388,9 +411,9 @@ class LongitudinalMpc:
     self.yref[:,2] = v
     self.yref[:,3] = a
     self.yref[:,5] = j
-    for i in range(N):
-      self.solver.set(i, "yref", self.yref[i])
-    self.solver.set(N, "yref", self.yref[N][:COST_E_DIM])
+    self.yref_flat[:N * COST_DIM] = self.yref[:N].reshape(-1)
+    self.yref_flat[N * COST_DIM:] = self.yref[N, :COST_E_DIM]
+    self.solver.set_flat('yref', self.yref_flat)
 
     self.params[:,2] = np.min(x_obstacles, axis=1)
     self.params[:,3] = np.copy(self.prev_a)
@@ -413,10 +436,7 @@ class LongitudinalMpc:
         self.source = 'lead1'
 
   def run(self):
-    # t0 = time.monotonic()
-    # reset = 0
-    for i in range(N+1):
-      self.solver.set(i, 'p', self.params[i])
+    self.solver.set_flat('p', self.params.reshape(-1))
     self.solver.constraints_set(0, "lbx", self.x0)
     self.solver.constraints_set(0, "ubx", self.x0)
 
@@ -425,18 +445,11 @@ class LongitudinalMpc:
     self.time_qp_solution = float(self.solver.get_stats('time_qp')[0])
     self.time_linearization = float(self.solver.get_stats('time_lin')[0])
     self.time_integrator = float(self.solver.get_stats('time_sim')[0])
+    self.qp_iter = int(self.solver.get_stats('qp_iter')[-1])
+    self.stats.record(self.solve_time, self.time_qp_solution, self.time_linearization, self.qp_iter)
 
-    # qp_iter = self.solver.get_stats('statistics')[-1][-1] # SQP_RTI specific
-    # print(f"long_mpc timings: tot {self.solve_time:.2e}, qp {self.time_qp_solution:.2e}, lin {self.time_linearization:.2e}, \
-    # integrator {self.time_integrator:.2e}, qp_iter {qp_iter}")
-    # res = self.solver.get_residuals()
-    # print(f"long_mpc residuals: {res[0]:.2e}, {res[1]:.2e}, {res[2]:.2e}, {res[3]:.2e}")
-    # self.solver.print_statistics()
-
-    for i in range(N+1):
-      self.x_sol[i] = self.solver.get(i, 'x')
-    for i in range(N):
-      self.u_sol[i] = self.solver.get(i, 'u')
+    self.x_sol = self.solver.get_flat('x').reshape((N+1, X_DIM))
+    self.u_sol = self.solver.get_flat('u').reshape((N, 1))
 
     self.v_solution = self.x_sol[:,1]
     self.a_solution = self.x_sol[:,2]
@@ -449,10 +462,8 @@ class LongitudinalMpc:
       if t > self.last_cloudlog_t + 5.0:
         self.last_cloudlog_t = t
         cloudlog.warning(f"Long mpc reset, solution_status: {self.solution_status}")
+      self.stats.resets += 1
       self.reset()
-      # reset = 1
-    # print(f"long_mpc timings: total internal {self.solve_time:.2e}, external: {(time.monotonic() - t0):.2e} qp {self.time_qp_solution:.2e}, \
-    # lin {self.time_linearization:.2e} qp_iter {qp_iter}, reset {reset}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+import numpy as np
+from types import SimpleNamespace
+
+from openpilot.selfdrive.controls.lib.longitudinal_mpc_lib.long_mpc import N, LongitudinalMpc, SolverStats
+
+
+def lead(d_rel, v_lead):
+  return SimpleNamespace(status=True, dRel=d_rel, vLead=v_lead, aLeadK=0.0, aLeadTau=1.5, modelProb=1.0)
+
+
+class TestLongitudinalMpc:
+  def test_solver_stats_window(self):
+    stats = SolverStats(window=4)
+    assert stats.summary()['qp_iter'] == {'mean': 0.0, 'max': 0.0}
+    for i in range(10):
+      stats.record(i * 1e-3, i * 1e-4, i * 1e-5, i)
+    summary = stats.summary()
+    assert summary['solves'] == 10
+    assert summary['qp_iter'] == {'mean': 7.5, 'max': 9.0}
+
+  def test_flat_staging_matches_stages(self):
+    mpc = LongitudinalMpc()
+    zeros = np.zeros(N+1)
+    mpc.set_weights()
+    mpc.set_cur_state(20., 0.)
+    for _ in range(5):
+      mpc.update(SimpleNamespace(leadOne=lead(30., 15.), leadTwo=lead(80., 20.)), 25., zeros, zeros, zeros, zeros)
+
+    assert mpc.stats.solves == 5
+    assert mpc.stats.summary()['qp_iter']['max'] > 0
+    for i in range(N+1):
+      np.testing.assert_array_equal(mpc.x_sol[i], mpc.solver.get(i, 'x'))
+    for i in range(N):
+      np.testing.assert_array_equal(mpc.u_sol[i], mpc.solver.get(i, 'u'))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+N_SEGMENTS = int(os.getenv("N_SEGMENTS", "20"))
+SEGMENT_MB = int(os.getenv("SEGMENT_MB", "64"))
+FILES = ("fcamera.hevc", "ecamera.hevc", "dcamera.hevc", "qcamera.ts", "rlog", "qlog")
+
+
+def make_segments(root):
+  data = os.urandom(1024 * 1024)
+  for i in range(N_SEGMENTS):
+    d = os.path.join(root, f"00000004--0ac3964c96--{i}")
+    os.makedirs(d)
+    for fn in FILES:
+      with open(os.path.join(d, fn), "wb") as f:
+        for _ in range(SEGMENT_MB // len(FILES)):
+          f.write(data)
+
+
+def legacy(root):
+  # the old loop: one rmtree per pass, 0.1 s between passes
+  for d in sorted(os.listdir(root)):
+    shutil.rmtree(os.path.join(root, d))
+    time.sleep(.1)
+
+
+if __name__ == "__main__":
+  with tempfile.TemporaryDirectory() as root:
+    os.environ["LOG_ROOT"] = root
+    from openpilot.system.loggerd.deleter import Deleter
+
+    runs = {
+      "legacy": legacy,
+      "batched": lambda r: Deleter(r, rate=None).reclaim(1 << 62, threading.Event()),
+      "batched, 256 MB/s": lambda r: Deleter(r, rate=256 * 1024 * 1024).reclaim(1 << 62, threading.Event()),
+    }
+    for name, run in runs.items():
+      make_segments(root)
+      os.sync()
+      st = time.monotonic()
+      run(root)
+      dt = time.monotonic() - st
+      total_mb = N_SEGMENTS * (SEGMENT_MB // len(FILES)) * len(FILES)
+      print(f"{name:18} {N_SEGMENTS} segments, {total_mb} MB in {dt:6.2f} s, {total_mb / dt:8.1f} MB/s")
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# Route-hours of driver monitoring evaluated per second, for one settings variant and many in one pass
+import os
+import time
+
+from openpilot.common.realtime import DT_DMON
+from openpilot.selfdrive.monitoring.evaluate import DMInputs, evaluate
+from openpilot.selfdrive.monitoring.test_evaluate import make_route
+
+SECONDS = int(os.getenv("SECONDS", "600"))
+VARIANTS = int(os.getenv("VARIANTS", "8"))
+JOBS = int(os.getenv("JOBS", str(os.cpu_count())))
+
+
+if __name__ == "__main__":
+  msgs = make_route(SECONDS)
+  st = time.monotonic()
+  inputs = DMInputs.from_logs(msgs)
+  print(f"{len(inputs)} steps ({len(inputs) * DT_DMON / 3600:.2f} h) extracted from {len(msgs)} messages in {time.monotonic() - st:.2f} s")
+
+  variants = [None] + [{'_DISTRACTED_TIME': 7. + i} for i in range(VARIANTS - 1)]
+  for n, jobs in ((1, 1), (VARIANTS, 1), (VARIANTS, JOBS)):
+    st = time.monotonic()
+    evaluate(inputs, variants[:n], jobs=jobs)
+    dt = time.monotonic() - st
+    hours = n * len(inputs) * DT_DMON / 3600
+    print(f"{n:3d} variants, {jobs:2d} jobs: {hours / dt:7.2f} route-hours/s ({dt:.2f} s)")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import os
+import random
+import time
+
+import numpy as np
+
+from cereal import car, log
+from cereal.messaging import SubMaster
+from openpilot.selfdrive.selfdrived.events import ET, EVENTS, BitsetEvents, Events
+from openpilot.selfdrive.test.process_replay.process_replay import CONFIGS
+
+N_CYCLES = int(os.getenv("N_CYCLES", "5000"))
+N_ACTIVE = int(os.getenv("N_ACTIVE", "5"))
+
+
+def run_cycles(events, cycles, callback_args):
+  # what selfdrived does with its events every 10 ms
+  ts = []
+  names_prev = []
+  for added in cycles:
+    st = time.perf_counter_ns()
+    events.clear()
+    for e in added:
+      events.add(e)
+    for et in (ET.NO_ENTRY, ET.SOFT_DISABLE, ET.IMMEDIATE_DISABLE, ET.USER_DISABLE, ET.OVERRIDE_LATERAL, ET.OVERRIDE_LONGITUDINAL, ET.PRE_ENABLE):
+      events.contains(et)
+    events.create_alerts([ET.PERMANENT, ET.WARNING], callback_args)
+    if events.names != names_prev:
+      events.to_msg()
+    names_prev = events.names.copy()
+    ts.append(time.perf_counter_ns() - st)
+  return np.array(ts) / 1e3
+
+
+if __name__ == "__main__":
+  cfg = [c for c in CONFIGS if c.proc_name == 'selfdrived'][0]
+  callback_args = [car.CarParams.new_message(), car.CarState.new_message(), SubMaster(cfg.pubs), False, 100,
+                   log.LongitudinalPersonality.standard]
+
+  # a few events that persist, and one changing now and then
+  rng = random.Random(0)
+  names = list(EVENTS.keys())
+  sticky = rng.sample(names, N_ACTIVE)
+  cycles = [sticky + ([rng.choice(names)] if rng.random() < 0.05 else []) for _ in range(N_CYCLES)]
+
+  for name, cls in (("Events", Events), ("BitsetEvents", BitsetEvents)):
+    us = run_cycles(cls(), cycles, callback_args)
+    print(f"{name:14} {N_ACTIVE} active of {len(EVENTS)}: {np.mean(us):7.1f} mean us, {np.percentile(us, 99):7.1f} p99 us, " +
+          f"{np.mean(us) * 100 / 1e4:.2f}% of a core at 100 Hz")
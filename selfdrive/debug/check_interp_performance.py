@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# Call overhead of table lookups: the old linear scan interp, interp, Interpolator and np.interp
+import os
+import timeit
+import numpy as np
+
+from openpilot.common.numpy_fast import Interpolator, interp
+from openpilot.common.tests.test_numpy_fast import interp_reference
+
+N = int(os.getenv("N", "200000"))
+BATCH = int(os.getenv("BATCH", "1000"))
+
+TABLES = {
+  "LOW_SPEED_FACTOR (4 pts)": ([0, 10, 20, 30], [15, 13, 10, 5]),
+  "A_CRUISE_MAX (4 pts)": ([0., 10.0, 25., 40.], [1.6, 1.2, 0.8, 0.6]),
+  "T_IDXS (33 pts)": ([10.0 * (i / 32) ** 2 for i in range(33)], list(np.linspace(0., 30., 33))),
+}
+
+
+def bench(fn, n):
+  return min(timeit.repeat(fn, number=n, repeat=5)) / n * 1e9
+
+
+def bench_table(name, xp, fp):
+  f = Interpolator(xp, fp)
+  xp_arr, fp_arr = np.array(xp), np.array(fp)
+  x = 0.6 * xp[-1]
+  xs = np.random.uniform(xp[0] - 1, xp[-1] + 1, BATCH)
+  xs_list = xs.tolist()
+
+  print(f"{name}, ns per scalar call / per {BATCH} element batch")
+  for label, scalar, batch in (
+    ("linear scan interp", lambda: interp_reference(x, xp, fp), lambda: interp_reference(xs_list, xp, fp)),
+    ("interp", lambda: interp(x, xp, fp), lambda: interp(xs_list, xp, fp)),
+    ("Interpolator", lambda: f(x), lambda: f(xs)),
+    ("np.interp", lambda: np.interp(x, xp_arr, fp_arr), lambda: np.interp(xs, xp_arr, fp_arr)),
+  ):
+    print(f"  {label:20} {bench(scalar, N):8.0f} ns {bench(batch, max(N // BATCH, 10)) / 1e3:10.1f} us")
+
+
+if __name__ == "__main__":
+  for name, (xp, fp) in TABLES.items():
+    bench_table(name, xp, fp)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import os
+import time
+import capnp
+
+import cereal.messaging as messaging
+from cereal.services import SERVICE_LIST
+from openpilot.common.realtime import Ratekeeper
+from openpilot.tools.lib.live_logreader import LiveRecorder
+
+DURATION = float(os.getenv("DURATION", "30"))
+READ_INTERVAL = float(os.getenv("READ_INTERVAL", "1.0"))
+FREQ = 100.
+
+
+if __name__ == "__main__":
+  # synthetic publishers: every service at its device rate, a slow consumer reading once per READ_INTERVAL
+  services = [s for s, v in SERVICE_LIST.items() if v.frequency > 0]
+  pm = messaging.PubMaster(services)
+  dats = {}
+  for s in services:
+    try:
+      dats[s] = messaging.new_message(s).to_bytes()
+    except capnp.lib.capnp.KjException:
+      dats[s] = messaging.new_message(s, 0).to_bytes()
+
+  sent = dict.fromkeys(services, 0)
+  read = 0
+  with LiveRecorder(services) as recorder:
+    time.sleep(0.5)
+    rk = Ratekeeper(FREQ, print_delay_threshold=None)
+    last_read = time.monotonic()
+    while rk.frame < DURATION * FREQ:
+      for s in services:
+        # publish each service on the frames matching its rate
+        if int((rk.frame + 1) * SERVICE_LIST[s].frequency / FREQ) > int(rk.frame * SERVICE_LIST[s].frequency / FREQ):
+          pm.send(s, dats[s])
+          sent[s] += 1
+      if time.monotonic() - last_read > READ_INTERVAL:
+        read += len(recorder.read())
+        last_read = time.monotonic()
+      rk.keep_time()
+    time.sleep(0.5)
+    read += len(recorder.read())
+    stats = recorder.stats
+
+  lost = {s: sent[s] - stats[s]['received'] for s in services if sent[s] != stats[s]['received']}
+  dropped = {s: st['dropped'] for s, st in stats.items() if st['dropped']}
+  print(f"{len(services)} services for {DURATION:.0f} s: {sum(sent.values())} sent, {sum(st['received'] for st in stats.values())} received, {read} read")
+  print(f"lost at the socket: {lost or 'none'}")
+  print(f"dropped from the ring: {dropped or 'none'}")
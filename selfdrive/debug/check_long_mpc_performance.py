@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Python side overhead of a longitudinal MPC solve, apart from the solver itself,
+# and the cost of staging stage by stage compared to one call for all stages
+import os
+import time
+import timeit
+import numpy as np
+from types import SimpleNamespace
+
+from openpilot.selfdrive.controls.lib.longitudinal_mpc_lib.long_mpc import COST_DIM, COST_E_DIM, N, LongitudinalMpc
+
+N_SOLVES = int(os.getenv("N", "2000"))
+
+
+def lead(d_rel, v_lead):
+  return SimpleNamespace(status=True, dRel=d_rel, vLead=v_lead, aLeadK=0.0, aLeadTau=1.5, modelProb=1.0)
+
+
+def stage_per_stage(mpc):
+  for i in range(N):
+    mpc.solver.set(i, "yref", mpc.yref[i])
+  mpc.solver.set(N, "yref", mpc.yref[N][:COST_E_DIM])
+  for i in range(N+1):
+    mpc.solver.set(i, 'p', mpc.params[i])
+  for i in range(N+1):
+    mpc.x_sol[i] = mpc.solver.get(i, 'x')
+  for i in range(N):
+    mpc.u_sol[i] = mpc.solver.get(i, 'u')
+
+
+def stage_flat(mpc):
+  mpc.yref_flat[:N * COST_DIM] = mpc.yref[:N].reshape(-1)
+  mpc.yref_flat[N * COST_DIM:] = mpc.yref[N, :COST_E_DIM]
+  mpc.solver.set_flat('yref', mpc.yref_flat)
+  mpc.solver.set_flat('p', mpc.params.reshape(-1))
+  mpc.solver.get_flat('x').reshape((N+1, -1))
+  mpc.solver.get_flat('u').reshape((N, 1))
+
+
+if __name__ == "__main__":
+  mpc = LongitudinalMpc()
+  zeros = np.zeros(N+1)
+  overhead = []
+  for i in range(N_SOLVES):
+    v_ego = 20. + 5. * np.sin(i / 50.)
+    radarstate = SimpleNamespace(leadOne=lead(40. + 10. * np.sin(i / 30.), 18.), leadTwo=lead(80., 20.))
+    mpc.set_weights()
+    mpc.set_accel_limits(-1.2, 1.2)
+    mpc.set_cur_state(v_ego, 0.0)
+    st = time.perf_counter()
+    mpc.update(radarstate, 25., zeros.copy(), zeros.copy(), zeros.copy(), zeros.copy())
+    overhead.append(time.perf_counter() - st - mpc.solve_time)
+
+  overhead_us = np.array(overhead) * 1e6
+  summary = mpc.stats.summary()
+  print(f"{N_SOLVES} solves, {summary['resets']} resets, qp iterations mean {summary['qp_iter']['mean']:.1f} max {summary['qp_iter']['max']:.0f}")
+  for f in ('time_tot', 'time_qp', 'time_lin'):
+    print(f"  {f:9} mean {summary[f]['mean'] * 1e3:6.3f} ms, max {summary[f]['max'] * 1e3:6.3f} ms (last {len(mpc.stats.history)} solves)")
+  print(f"python overhead per update: mean {np.mean(overhead_us):7.1f} us, p99 {np.percentile(overhead_us, 99):7.1f} us")
+
+  n = 2000
+  per_stage = min(timeit.repeat(lambda: stage_per_stage(mpc), number=n, repeat=5)) / n * 1e6
+  flat = min(timeit.repeat(lambda: stage_flat(mpc), number=n, repeat=5)) / n * 1e6
+  print(f"staging yref + p and reading x + u: per stage {per_stage:6.1f} us, all stages at once {flat:6.1f} us")
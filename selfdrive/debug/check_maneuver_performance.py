@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# Longitudinal maneuver throughput: built messages one at a time like before, headless, and headless in a process pool
+import argparse
+import itertools
+import os
+import time
+
+from openpilot.selfdrive.test.longitudinal_maneuvers.runner import run_maneuvers
+from openpilot.selfdrive.test.longitudinal_maneuvers.test_longitudinal import create_maneuvers
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--jobs", type=int, default=os.cpu_count())
+  args = parser.parse_args()
+
+  maneuvers = [m for e2e, force_decel in itertools.product([True, False], repeat=2)
+               for m in create_maneuvers({"e2e": e2e, "force_decel": force_decel})]
+
+  for name, jobs, trace in (("traced, serial", 1, True), ("headless, serial", 1, False), (f"headless, {args.jobs} jobs", args.jobs, False)):
+    st = time.monotonic()
+    results, summary = run_maneuvers(maneuvers, jobs=jobs, trace=trace)
+    elapsed = time.monotonic() - st
+    solver = summary['solver']
+    print(f"{name:20} {len(maneuvers) / elapsed:6.2f} maneuvers/s, {summary['steps'] / elapsed:8.0f} steps/s, " +
+          f"solver mean {solver['mean'] * 1e3:.2f} ms p99 {solver['p99'] * 1e3:.2f} ms, failed {len(summary['failed'])}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import os
+import time
+import numpy as np
+
+from openpilot.common.params import Params
+from openpilot.common.params_cache import ParamsCache
+
+N_READS = int(os.getenv("N_READS", "10000"))
+KEYS = ["IsMetric", "ExperimentalMode", "LongitudinalPersonality", "DoUninstall", "DoShutdown", "DoReboot"]
+
+
+def read_syscalls() -> int:
+  # read(2) calls only, open/close are extra for each uncached read
+  with open("/proc/self/io") as f:
+    return next(int(line.split()[1]) for line in f if line.startswith("syscr"))
+
+
+def bench(name, get_bool):
+  ts = []
+  syscr = read_syscalls()
+  for _ in range(N_READS):
+    st = time.perf_counter_ns()
+    for k in KEYS:
+      get_bool(k)
+    ts.append(time.perf_counter_ns() - st)
+  syscr = read_syscalls() - syscr
+
+  us = np.array(ts) / 1e3 / len(KEYS)
+  syscalls = syscr / (N_READS * len(KEYS))
+  print(f"{name:12} {np.mean(us):7.2f} mean us/read, {np.percentile(us, 99):7.2f} p99 us/read, {syscalls:.2f} read syscalls/read")
+
+
+if __name__ == "__main__":
+  params = Params()
+  cache = ParamsCache()
+
+  print(f"{N_READS} polling cycles over {len(KEYS)} keys")
+  bench("Params", params.get_bool)
+  bench("ParamsCache", cache.get_bool)
+
+  # change notification latency: put in this process, callback on the watcher thread
+  latencies = []
+  cache.subscribe("IsMetric", lambda k: latencies.append(time.perf_counter_ns()))
+  for i in range(100):
+    n = len(latencies)
+    st = time.perf_counter_ns()
+    params.put_bool("IsMetric", bool(i % 2))
+    while len(latencies) == n:
+      time.sleep(0)
+    latencies[-1] -= st
+  print(f"put -> callback {np.mean(latencies) / 1e3:.1f} mean us, {np.max(latencies) / 1e3:.1f} max us (0.1 s poll before)")
+  cache.close()
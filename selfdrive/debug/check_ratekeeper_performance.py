@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Per loop cost of Ratekeeper bookkeeping, with and without the loop stats, excluding the sleep
+import os
+import time
+import timeit
+from collections import deque
+
+from openpilot.common.realtime import Ratekeeper
+
+N = int(os.getenv("N", "200000"))
+
+
+class UninstrumentedRatekeeper:
+  # Ratekeeper.monitor_time and lagging before the loop stats were added
+  def __init__(self, rate):
+    self._interval = 1. / rate
+    self._next_frame_time = time.monotonic() + self._interval
+    self._print_delay_threshold = None
+    self._frame = 0
+    self._remaining = 0.0
+    self._dts = deque([self._interval], maxlen=100)
+    self._last_monitor_time = time.monotonic()
+
+  @property
+  def lagging(self):
+    return sum(self._dts) / len(self._dts) > self._interval * (1 / 0.9)
+
+  def monitor_time(self):
+    prev = self._last_monitor_time
+    self._last_monitor_time = time.monotonic()
+    self._dts.append(self._last_monitor_time - prev)
+
+    remaining = self._next_frame_time - time.monotonic()
+    self._next_frame_time += self._interval
+    self._frame += 1
+    self._remaining = remaining
+    return False
+
+
+def bench(fn):
+  return min(timeit.repeat(fn, number=N, repeat=5)) / N * 1e9
+
+
+if __name__ == "__main__":
+  for name, rk in (("before", UninstrumentedRatekeeper(100)), ("after", Ratekeeper(100, print_delay_threshold=None))):
+    monitor = bench(rk.monitor_time)
+    loop = bench(lambda rk=rk: (rk.monitor_time(), rk.lagging))
+    print(f"{name:7} monitor_time {monitor:6.0f} ns, monitor_time + lagging {loop:6.0f} ns")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import os
+import time
+import capnp
+import numpy as np
+
+import cereal.messaging as messaging
+from cereal.services import SERVICE_LIST
+
+N_SERVICES = int(os.getenv("N_SERVICES", "25"))
+N_CYCLES = int(os.getenv("N_CYCLES", "2000"))
+FREQ = 100.
+
+
+if __name__ == "__main__":
+  # synthetic publishers: N services, all sending every 100 Hz cycle
+  services = [s for s in SERVICE_LIST if s not in ('can', 'sendcan', 'logMessage', 'errorLogMessage')][:N_SERVICES]
+  pm = messaging.PubMaster(services)
+  sm = messaging.SubMaster(services, frequency=FREQ)
+  dats = {}
+  for s in services:
+    try:
+      dats[s] = messaging.new_message(s).to_bytes()
+    except capnp.lib.capnp.KjException:
+      dats[s] = messaging.new_message(s, 0).to_bytes()
+  msgs = [messaging.log_from_bytes(dat) for dat in dats.values()]
+  time.sleep(0.5)
+
+  update_ts, update_msgs_ts, recvd = [], [], 0
+  for _ in range(N_CYCLES):
+    for s, dat in dats.items():
+      pm.send(s, dat)
+
+    st = time.perf_counter_ns()
+    sm.update(0)
+    update_ts.append(time.perf_counter_ns() - st)
+    recvd += sum(sm.updated.values())
+
+    # bookkeeping only, no sockets or parsing
+    st = time.perf_counter_ns()
+    sm.update_msgs(time.monotonic(), msgs)
+    update_msgs_ts.append(time.perf_counter_ns() - st)
+
+  print(f"{len(services)} services @ {FREQ:.0f} Hz, {N_CYCLES} cycles, {recvd / N_CYCLES:.1f} msgs received / cycle")
+  for name, ts in (("update", update_ts), ("update_msgs", update_msgs_ts)):
+    us = np.array(ts) / 1e3
+    print(f"{name:12} {np.mean(us):8.1f} mean us, {np.percentile(us, 99):8.1f} p99 us, {np.max(us):8.1f} max us, " +
+          f"{np.mean(us) * FREQ / 1e4:.2f}% of a core")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from openpilot.system.hardware.hardwared import ThermalZones
+from openpilot.system.hardware.tici.hardware import Tici
+
+N_CYCLES = int(os.getenv("N_CYCLES", "2000"))
+
+
+def make_fake_tree(root, thermal_config):
+  zones = [z for f in ('cpu', 'gpu', 'pmic') for z in getattr(thermal_config, f)[0]] + [thermal_config.mem[0]]
+  for i, z in enumerate(zones):
+    d = os.path.join(root, f"devices/virtual/thermal/thermal_zone{i}")
+    os.makedirs(d)
+    with open(os.path.join(d, "type"), "w") as f:
+      f.write(z + "\n")
+    with open(os.path.join(d, "temp"), "w") as f:
+      f.write("42000\n")
+
+
+def read_legacy(root, tz_by_type, thermal_config):
+  # what hardwared did before: an open, read and close per zone
+  out = []
+  for f in ('cpu', 'gpu', 'pmic'):
+    for z in getattr(thermal_config, f)[0]:
+      with open(f"{root}/devices/virtual/thermal/thermal_zone{tz_by_type[z]}/temp") as fp:
+        out.append(int(fp.read()))
+  with open(f"{root}/devices/virtual/thermal/thermal_zone{tz_by_type[thermal_config.mem[0]]}/temp") as fp:
+    out.append(int(fp.read()))
+  return out
+
+
+def run(mode, root, n_cycles=N_CYCLES):
+  thermal_config = Tici().get_thermal_config()
+  zones = ThermalZones(thermal_config, root=root)
+  tz_by_type = {z: i for i, z in enumerate([z for f in ('cpu', 'gpu', 'pmic') for z in getattr(thermal_config, f)[0]] + [thermal_config.mem[0]])}
+  st = time.perf_counter()
+  for _ in range(n_cycles):
+    if mode == "legacy":
+      read_legacy(root, tz_by_type, thermal_config)
+    else:
+      zones.read()
+  return (time.perf_counter() - st) / max(n_cycles, 1)
+
+
+def count_syscalls(mode, root, n_cycles):
+  with tempfile.NamedTemporaryFile(mode="r") as out:
+    subprocess.check_call(["strace", "-f", "-c", "-o", out.name, sys.executable, __file__, mode, root, str(n_cycles)])
+    total = [line for line in out.read().splitlines() if line.strip().endswith("total")]
+  return int(total[0].split()[2]) if total else None
+
+
+if __name__ == "__main__":
+  if len(sys.argv) == 4:
+    run(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+    sys.exit(0)
+
+  with tempfile.TemporaryDirectory() as root:
+    make_fake_tree(root, Tici().get_thermal_config())
+    for mode in ("legacy", "sampler"):
+      print(f"{mode:8} {run(mode, root) * 1e6:8.1f} us / cycle")
+
+    if shutil.which("strace"):
+      # the difference of N_CYCLES and 0 cycles leaves only the per-cycle syscalls
+      counts = {m: (count_syscalls(m, root, N_CYCLES) - count_syscalls(m, root, 0)) / N_CYCLES for m in ("legacy", "sampler")}
+      print("syscalls / cycle: " + ", ".join(f"{m} {c:.1f}" for m, c in counts.items()))
+    else:
+      print("install strace to count syscalls per cycle")
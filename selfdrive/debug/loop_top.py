@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Live loop timing of every process with a Ratekeeper, read from their shared memory stats tables
+import argparse
+import os
+import sys
+import time
+
+from openpilot.common.realtime import loop_stats_percentile, read_loop_stats
+from openpilot.system.hardware.hw import Paths
+
+
+def pid_alive(pid: int) -> bool:
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  except PermissionError:
+    pass
+  return True
+
+
+def read_all(root: str) -> dict[str, dict]:
+  tables = {}
+  for fn in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+    path = os.path.join(root, fn)
+    stats = read_loop_stats(path)
+    if stats is None:
+      continue
+    if not pid_alive(stats['pid']):
+      # owner was killed before it could clean up
+      try:
+        os.unlink(path)
+      except OSError:
+        pass
+      continue
+    tables[fn] = stats
+  return tables
+
+
+def diff_hist(cur: list[int], prev: list[int] | None) -> list[int]:
+  return cur if prev is None else [c - p for c, p in zip(cur, prev, strict=True)]
+
+
+def format_row(cur: dict, prev: dict | None, elapsed: float) -> str:
+  dt_hist = diff_hist(cur['dt_hist'], prev and prev['dt_hist'])
+  work_hist = diff_hist(cur['work_hist'], prev and prev['work_hist'])
+  frames = cur['frames'] - (prev['frames'] if prev else 0)
+  overruns = cur['overruns'] - (prev['overruns'] if prev else 0)
+  ms = [1e3 * loop_stats_percentile(h, cur['rate'], p) for h in (dt_hist, work_hist) for p in (50, 99)]
+  return (f"{cur['pid']:>7} {cur['name'][:28]:28} {cur['rate']:6.1f} {frames / elapsed if prev else float('nan'):7.1f} " +
+          f"{ms[0]:7.2f} {ms[1]:7.2f} {ms[2]:7.2f} {ms[3]:7.2f} {1e3 * cur['max_dt']:8.2f} {overruns:6d} {cur['overruns']:8d}")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Live loop timing of every Ratekeeper loop. Times are ms, percentiles over the last refresh")
+  parser.add_argument("--interval", type=float, default=1.0, help="refresh interval in seconds")
+  parser.add_argument("--once", action="store_true", help="print one snapshot and exit")
+  args = parser.parse_args()
+
+  root = Paths.loop_stats_root()
+  header = (f"{'PID':>7} {'NAME':28} {'RATE':>6} {'HZ':>7} {'DT p50':>7} {'DT p99':>7} {'WRK p50':>7} {'WRK p99':>7} " +
+            f"{'DT max':>8} {'OVRUN':>6} {'OVRUN tot':>8}")
+  prev: dict[str, dict] = {}
+  prev_t = time.monotonic()
+  while True:
+    if not args.once:
+      time.sleep(args.interval)
+    tables = read_all(root)
+    t = time.monotonic()
+    rows = [format_row(stats, prev.get(fn), t - prev_t) for fn, stats in tables.items()]
+    prev, prev_t = tables, t
+
+    if not args.once:
+      sys.stdout.write("\033[2J\033[H")
+    print(f"{len(rows)} loops in {root}")
+    print(header)
+    print("\n".join(rows))
+    sys.stdout.flush()
+    if args.once:
+      break
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+class HistoryBuffer:
+  """
+  Fixed length history of rows, as if shifting an (n * stride, width) array up by one row on every
+  push and reading every stride'th row, ending lag rows before the newest one.
+
+  Each of the stride phases is a ring stored twice back to back, so instead of copying the whole
+  history every frame a push writes two rows, and the current history is always a contiguous
+  (n, width) view that can be handed to the model runner as is.
+  """
+
+  def __init__(self, n: int, width: int, stride: int = 1, lag: int = 0, dtype=np.float32):
+    assert 0 <= lag < stride
+    self.n = n
+    self.stride = stride
+    self.lag = lag
+    self.rings = np.zeros((stride, 2 * n, width), dtype=dtype)
+    self.pos = [0] * stride
+    self.count = 0
+
+  def push(self, row: np.ndarray) -> None:
+    phase = self.count % self.stride
+    p = self.pos[phase]
+    ring = self.rings[phase]
+    ring[p] = row
+    ring[p + self.n] = row
+    self.pos[phase] = (p + 1) % self.n
+    self.count += 1
+
+  @property
+  def view(self) -> np.ndarray:
+    """(n, width) history, oldest first. Only valid until the next push"""
+    phase = (self.count - 1 - self.lag) % self.stride
+    p = self.pos[phase]
+    return self.rings[phase, p:p + self.n]
@@ -3,7 +3,7 @@ from openpilot.selfdrive.modeld.constants import ModelConstants
 
 def safe_exp(x, out=None):
   # -11 is around 10**14, more causes float16 overflow
-  return np.exp(np.clip(x, -np.inf, 11), out=out)
+  return np.exp(np.minimum(x, 11, out=out), out=out)
 
 def sigmoid(x):
   return 1. / (1. + safe_exp(-x))
@@ -40,6 +40,18 @@ class Parser:
     raw = outs[name]
     outs[name] = sigmoid(raw)
 
+  def parse_binary_crossentropies(self, names, outs):
+    # one sigmoid over all heads, outputs are views into it
+    names = [k for k in names if not self.check_missing(outs, k)]
+    if not names:
+      return
+    raws = [outs[k].reshape((outs[k].shape[0], -1)) for k in names]
+    probs = sigmoid(np.concatenate(raws, axis=1))
+    offset = 0
+    for k, raw in zip(names, raws, strict=True):
+      outs[k] = probs[:, offset:offset + raw.shape[1]].reshape(outs[k].shape)
+      offset += raw.shape[1]
+
   def parse_mdn(self, name, outs, in_N=0, out_N=1, out_shape=None):
     if self.check_missing(outs, name):
       return
@@ -51,28 +63,25 @@ class Parser:
     pred_std = safe_exp(raw[:,:,n_values: 2*n_values])
 
     if in_N > 1:
-      weights = np.zeros((raw.shape[0], in_N, out_N), dtype=raw.dtype)
-      for i in range(out_N):
-        weights[:,:,i - out_N] = softmax(raw[:,:,i - out_N], axis=-1)
+      weights = softmax(raw[:,:,raw.shape[2] - out_N:].copy(), axis=1)
 
+      # index whole hypotheses per frame, rows are gathered contiguously
+      frames = np.arange(raw.shape[0])[:,np.newaxis]
       if out_N == 1:
-        for fidx in range(weights.shape[0]):
-          idxs = np.argsort(weights[fidx][:,0])[::-1]
-          weights[fidx] = weights[fidx][idxs]
-          pred_mu[fidx] = pred_mu[fidx][idxs]
-          pred_std[fidx] = pred_std[fidx][idxs]
+        # sort hypotheses by weight, highest first
+        order = np.argsort(weights[:,:,0], axis=1)[:,::-1]
+        weights = weights[frames, order]
+        pred_mu = pred_mu[frames, order]
+        pred_std = pred_std[frames, order]
       full_shape = tuple([raw.shape[0], in_N] + list(out_shape))
       outs[name + '_weights'] = weights
       outs[name + '_hypotheses'] = pred_mu.reshape(full_shape)
       outs[name + '_stds_hypotheses'] = pred_std.reshape(full_shape)
 
-      pred_mu_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
-      pred_std_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
-      for fidx in range(weights.shape[0]):
-        for hidx in range(out_N):
-          idxs = np.argsort(weights[fidx,:,hidx])[::-1]
-          pred_mu_final[fidx, hidx] = pred_mu[fidx, idxs[0]]
-          pred_std_final[fidx, hidx] = pred_std[fidx, idxs[0]]
+      # most likely hypothesis for every selection
+      best = np.argsort(weights, axis=1)[:,-1,:]
+      pred_mu_final = pred_mu[frames, best]
+      pred_std_final = pred_std[frames, best]
     else:
       pred_mu_final = pred_mu
       pred_std_final = pred_std
@@ -84,22 +93,42 @@ class Parser:
     outs[name] = pred_mu_final.reshape(final_shape)
     outs[name + '_stds'] = pred_std_final.reshape(final_shape)
 
+  def parse_single_mdns(self, heads, outs):
+    # single hypothesis heads (in_N=0, out_N=0) share one exp over all their stds
+    heads = {k: v for k, v in heads.items() if not self.check_missing(outs, k)}
+    if not heads:
+      return
+    raws = [outs[k].reshape((outs[k].shape[0], -1)) for k in heads]
+    n_values = [raw.shape[1] // 2 for raw in raws]
+    stds = np.concatenate([raw[:, n:2*n] for raw, n in zip(raws, n_values, strict=True)], axis=1)
+    safe_exp(stds, out=stds)
+
+    offset = 0
+    for (k, out_shape), raw, n in zip(heads.items(), raws, n_values, strict=True):
+      final_shape = (raw.shape[0],) + out_shape
+      outs[k] = raw[:, :n].reshape(final_shape)
+      outs[k + '_stds'] = stds[:, offset:offset + n].reshape(final_shape)
+      offset += n
+
   def parse_outputs(self, outs: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Parses raw model outputs, every head has a leading batch dimension so many frames can be parsed at once"""
     self.parse_mdn('plan', outs, in_N=ModelConstants.PLAN_MHP_N, out_N=ModelConstants.PLAN_MHP_SELECTION,
                    out_shape=(ModelConstants.IDX_N,ModelConstants.PLAN_WIDTH))
-    self.parse_mdn('lane_lines', outs, in_N=0, out_N=0, out_shape=(ModelConstants.NUM_LANE_LINES,ModelConstants.IDX_N,ModelConstants.LANE_LINES_WIDTH))
-    self.parse_mdn('road_edges', outs, in_N=0, out_N=0, out_shape=(ModelConstants.NUM_ROAD_EDGES,ModelConstants.IDX_N,ModelConstants.LANE_LINES_WIDTH))
-    self.parse_mdn('pose', outs, in_N=0, out_N=0, out_shape=(ModelConstants.POSE_WIDTH,))
-    self.parse_mdn('road_transform', outs, in_N=0, out_N=0, out_shape=(ModelConstants.POSE_WIDTH,))
-    self.parse_mdn('wide_from_device_euler', outs, in_N=0, out_N=0, out_shape=(ModelConstants.WIDE_FROM_DEVICE_WIDTH,))
     self.parse_mdn('lead', outs, in_N=ModelConstants.LEAD_MHP_N, out_N=ModelConstants.LEAD_MHP_SELECTION,
                    out_shape=(ModelConstants.LEAD_TRAJ_LEN,ModelConstants.LEAD_WIDTH))
+    single_mdns = {
+      'lane_lines': (ModelConstants.NUM_LANE_LINES,ModelConstants.IDX_N,ModelConstants.LANE_LINES_WIDTH),
+      'road_edges': (ModelConstants.NUM_ROAD_EDGES,ModelConstants.IDX_N,ModelConstants.LANE_LINES_WIDTH),
+      'pose': (ModelConstants.POSE_WIDTH,),
+      'road_transform': (ModelConstants.POSE_WIDTH,),
+      'wide_from_device_euler': (ModelConstants.WIDE_FROM_DEVICE_WIDTH,),
+    }
     if 'lat_planner_solution' in outs:
-      self.parse_mdn('lat_planner_solution', outs, in_N=0, out_N=0, out_shape=(ModelConstants.IDX_N,ModelConstants.LAT_PLANNER_SOLUTION_WIDTH))
+      single_mdns['lat_planner_solution'] = (ModelConstants.IDX_N,ModelConstants.LAT_PLANNER_SOLUTION_WIDTH)
     if 'desired_curvature' in outs:
-      self.parse_mdn('desired_curvature', outs, in_N=0, out_N=0, out_shape=(ModelConstants.DESIRED_CURV_WIDTH,))
-    for k in ['lead_prob', 'lane_lines_prob', 'meta']:
-      self.parse_binary_crossentropy(k, outs)
+      single_mdns['desired_curvature'] = (ModelConstants.DESIRED_CURV_WIDTH,)
+    self.parse_single_mdns(single_mdns, outs)
+    self.parse_binary_crossentropies(['lead_prob', 'lane_lines_prob', 'meta'], outs)
     self.parse_categorical_crossentropy('desire_state', outs, out_shape=(ModelConstants.DESIRE_PRED_WIDTH,))
     self.parse_categorical_crossentropy('desire_pred', outs, out_shape=(ModelConstants.DESIRE_PRED_LEN,ModelConstants.DESIRE_PRED_WIDTH))
     return outs
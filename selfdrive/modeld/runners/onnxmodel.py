@@ -1,12 +1,19 @@
 import onnx
+import hashlib
 import itertools
 import os
+import platform
 import sys
 import numpy as np
 from typing import Any
 
+from openpilot.common.file_helpers import atomic_write_in_dir
+from openpilot.system.hardware.hw import Paths
 from openpilot.selfdrive.modeld.runners.runmodel_pyx import RunModel
 
+# bump to invalidate cached models when the conversion changes
+MODEL_CACHE_VERSION = 1
+
 ORT_TYPES_TO_NP_TYPES = {'tensor(float16)': np.float16, 'tensor(float)': np.float32, 'tensor(uint8)': np.uint8}
 
 def attributeproto_fp16_to_fp32(attr):
@@ -35,30 +42,117 @@ def convert_fp16_to_fp32(onnx_path_or_bytes):
           attributeproto_fp16_to_fp32(a.t)
   return model.SerializeToString()
 
-def create_ort_session(path, fp16_to_fp32):
+def model_cache_key(model_data, *extra):
+  h = hashlib.sha256(model_data)
+  for e in (MODEL_CACHE_VERSION, *extra):
+    h.update(str(e).encode())
+  return h.hexdigest()[:32]
+
+def write_model_cache(path, data):
+  try:
+    with atomic_write_in_dir(path, mode='wb', overwrite=True) as f:
+      f.write(data)
+  except OSError as e:
+    print(f"Failed to write model cache {path}: {e}", file=sys.stderr)
+
+def get_cpu_flags():
+  # optimized graphs can use kernels for the instruction sets of the CPU they were built on, ex: AVX2 vs AVX512
+  try:
+    with open('/proc/cpuinfo') as f:
+      for line in f:
+        if line.startswith(('flags', 'Features')):
+          return ' '.join(sorted(set(line.split(':', 1)[1].split())))
+  except OSError:
+    pass
+  return platform.processor()
+
+def get_session_options(provider):
+  import onnxruntime as ort
+  options = ort.SessionOptions()
+  options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+  if provider != 'OpenVINOExecutionProvider':
+    options.intra_op_num_threads = 2
+  if provider == 'CPUExecutionProvider':
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+  return options
+
+def get_model_cache_paths(path, model_data, fp16_to_fp32, provider, cache_dir):
+  import onnxruntime as ort
+  name = os.path.splitext(os.path.basename(path))[0]
+  converted_path = os.path.join(cache_dir, f"{name}_{model_cache_key(model_data, fp16_to_fp32)}.onnx")
+  # graph optimizations depend on the runtime, provider and CPU
+  optimized_key = model_cache_key(model_data, fp16_to_fp32, ort.__version__, provider, platform.machine(), get_cpu_flags())
+  optimized_path = os.path.join(cache_dir, f"{name}_{optimized_key}.ort.onnx")
+  return converted_path, optimized_path
+
+def create_ort_session(path, fp16_to_fp32, cache_dir=None):
   os.environ["OMP_NUM_THREADS"] = "4"
   os.environ["OMP_WAIT_POLICY"] = "PASSIVE"
 
   import onnxruntime as ort
   print("Onnx available providers: ", ort.get_available_providers(), file=sys.stderr)
-  options = ort.SessionOptions()
-  options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
 
   provider: str | tuple[str, dict[Any, Any]]
   if 'OpenVINOExecutionProvider' in ort.get_available_providers() and 'ONNXCPU' not in os.environ:
     provider = 'OpenVINOExecutionProvider'
   elif 'CUDAExecutionProvider' in ort.get_available_providers() and 'ONNXCPU' not in os.environ:
-    options.intra_op_num_threads = 2
     provider = ('CUDAExecutionProvider', {'cudnn_conv_algo_search': 'DEFAULT'})
   else:
-    options.intra_op_num_threads = 2
-    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
-    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
     provider = 'CPUExecutionProvider'
-
-  model_data = convert_fp16_to_fp32(path) if fp16_to_fp32 else path
+  provider_name = provider if isinstance(provider, str) else provider[0]
+  options = get_session_options(provider_name)
   print("Onnx selected provider: ", [provider], file=sys.stderr)
-  ort_session = ort.InferenceSession(model_data, options, providers=[provider])
+
+  # converting and optimizing the model is slow, so both are cached on disk keyed by the model's content
+  with open(path, 'rb') as f:
+    source_data = f.read()
+  cache_dir = cache_dir or Paths.model_cache_root()
+  converted_path, optimized_path = get_model_cache_paths(path, source_data, fp16_to_fp32, provider_name, cache_dir)
+  try:
+    os.makedirs(cache_dir, exist_ok=True)
+  except OSError as e:
+    print(f"Failed to create model cache {cache_dir}: {e}", file=sys.stderr)
+
+  ort_session = None
+  if provider_name == 'CPUExecutionProvider' and os.path.isfile(optimized_path):
+    cached_options = get_session_options(provider_name)
+    cached_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    try:
+      ort_session = ort.InferenceSession(optimized_path, cached_options, providers=[provider])
+    except Exception as e:
+      print(f"Failed to load cached model {optimized_path}, rebuilding: {e}", file=sys.stderr)
+
+  # only CPU graph optimizations are saved, other providers optimize at load time
+  optimized_tmp_path = None
+  if ort_session is None and provider_name == 'CPUExecutionProvider' and os.path.isdir(cache_dir) and os.access(cache_dir, os.W_OK):
+    optimized_tmp_path = f"{optimized_path}.{os.getpid()}.tmp"
+    options.optimized_model_filepath = optimized_tmp_path
+
+  try:
+    if ort_session is None and os.path.isfile(converted_path):
+      try:
+        ort_session = ort.InferenceSession(converted_path, options, providers=[provider])
+      except Exception as e:
+        print(f"Failed to load cached model {converted_path}, rebuilding: {e}", file=sys.stderr)
+
+    if ort_session is None:
+      model_data = source_data
+      if fp16_to_fp32:
+        model_data = convert_fp16_to_fp32(source_data)
+        write_model_cache(converted_path, model_data)
+      ort_session = ort.InferenceSession(model_data, options, providers=[provider])
+
+    if optimized_tmp_path is not None:
+      try:
+        os.replace(optimized_tmp_path, optimized_path)
+      except OSError as e:
+        print(f"Failed to write model cache {optimized_path}: {e}", file=sys.stderr)
+  finally:
+    # left behind when the session or the rename failed
+    if optimized_tmp_path is not None and os.path.exists(optimized_tmp_path):
+      os.unlink(optimized_tmp_path)
+
   print("Onnx using ", ort_session.get_providers(), file=sys.stderr)
   return ort_session
 
@@ -73,6 +167,22 @@ class ONNXModel(RunModel):
     self.input_shapes = {x.name: [1, *x.shape[1:]] for x in self.session.get_inputs()}
     self.input_dtypes = {x.name: ORT_TYPES_TO_NP_TYPES[x.type] for x in self.session.get_inputs()}
 
+    # only used when an input buffer can't be bound in place
+    self.staging = {k: np.zeros(self.input_shapes[k], dtype=self.input_dtypes[k]) for k in self.input_names}
+
+    # outputs are written by ORT straight into the output buffer when the layout matches
+    self.binding = self.session.io_binding()
+    model_output = self.session.get_outputs()[0]
+    assert len(self.session.get_outputs()) == 1, "Only single model outputs are supported"
+    self.output_name = model_output.name
+    output_shape = [1, *model_output.shape[1:]]
+    self.bind_output = ORT_TYPES_TO_NP_TYPES[model_output.type] == output.dtype and output.flags.c_contiguous and \
+                       all(isinstance(d, int) for d in output_shape) and np.prod(output_shape) == output.size
+    if self.bind_output:
+      self.binding.bind_output(self.output_name, 'cpu', 0, output.dtype, output_shape, output.ctypes.data)
+    else:
+      self.binding.bind_output(self.output_name, 'cpu')
+
     # run once to initialize CUDA provider
     if "CUDAExecutionProvider" in self.session.get_providers():
       self.session.run(None, {k: np.zeros(self.input_shapes[k], dtype=self.input_dtypes[k]) for k in self.input_names})
@@ -89,10 +199,18 @@ class ONNXModel(RunModel):
   def getCLBuffer(self, name):
     return None
 
+  def stage_input(self, name, buffer):
+    # buffers are raw memory in the model's input dtype, reinterpret them in place and only copy if not contiguous
+    if buffer.flags.c_contiguous:
+      return buffer.view(self.input_dtypes[name]).reshape(self.input_shapes[name])
+    staging = self.staging[name]
+    np.copyto(staging, np.ascontiguousarray(buffer).view(staging.dtype).reshape(staging.shape))
+    return staging
+
   def execute(self):
-    inputs = {k: v.view(self.input_dtypes[k]) for k,v in self.inputs.items()}
-    inputs = {k: v.reshape(self.input_shapes[k]).astype(self.input_dtypes[k]) for k,v in inputs.items()}
-    outputs = self.session.run(None, inputs)
-    assert len(outputs) == 1, "Only single model outputs are supported"
-    self.output[:] = outputs[0]
+    for k, v in self.inputs.items():
+      self.binding.bind_cpu_input(k, self.stage_input(k, v))
+    self.session.run_with_iobinding(self.binding)
+    if not self.bind_output:
+      self.output[:] = self.binding.copy_outputs_to_cpu()[0]
     return self.output
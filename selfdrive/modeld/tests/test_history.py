@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from openpilot.selfdrive.modeld.constants import ModelConstants
+from openpilot.selfdrive.modeld.history import HistoryBuffer
+
+
+class TestHistoryBuffer:
+  @pytest.mark.parametrize("n,width,stride,lag", [(24, 512, 4, 3), (100, 8, 1, 0), (5, 3, 3, 0), (5, 3, 3, 2), (1, 2, 2, 1)])
+  def test_matches_shift(self, n, width, stride, lag):
+    # reference: shift the whole history every frame and read every stride'th row
+    full = np.zeros((n * stride, width), dtype=np.float32)
+    idxs = np.arange(-1 - lag, -1 - lag - n * stride, -stride)[::-1]
+    hist = HistoryBuffer(n, width, stride, lag)
+
+    np.testing.assert_array_equal(hist.view, full[idxs])
+    for _ in range(5 * n * stride + 3):
+      row = np.random.rand(width).astype(np.float32)
+      full[:-1] = full[1:]
+      full[-1] = row
+      hist.push(row)
+
+      view = hist.view
+      assert view.flags.c_contiguous
+      assert view.shape == (n, width)
+      np.testing.assert_array_equal(view, full[idxs])
+
+  def test_modeld_features(self):
+    # same indexing modeld used with a FULL_HISTORY_BUFFER_LEN shift buffer
+    full = np.zeros((ModelConstants.FULL_HISTORY_BUFFER_LEN, ModelConstants.FEATURE_LEN), dtype=np.float32)
+    idxs = np.arange(-4, -100, -4)[::-1]
+    hist = HistoryBuffer(ModelConstants.HISTORY_BUFFER_LEN, ModelConstants.FEATURE_LEN, stride=4, lag=3)
+    for _ in range(300):
+      row = np.random.rand(ModelConstants.FEATURE_LEN).astype(np.float32)
+      full[:-1] = full[1:]
+      full[-1] = row
+      hist.push(row)
+      np.testing.assert_array_equal(hist.view.reshape(-1), full[idxs].flatten())
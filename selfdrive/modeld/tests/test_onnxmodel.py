@@ -0,0 +1,27 @@
+import numpy as np
+
+from openpilot.selfdrive.modeld.runners.onnxmodel import ONNXModel
+
+
+class TestStageInput:
+  def setup_method(self):
+    # only the input metadata stage_input reads, no session
+    self.model = ONNXModel.__new__(ONNXModel)
+    self.model.input_shapes = {'x': [1, 4]}
+    self.model.input_dtypes = {'x': np.float32}
+    self.model.staging = {'x': np.zeros((1, 4), dtype=np.float32)}
+
+  def test_layout_independent(self):
+    # raw bytes in a uint8 buffer are reinterpreted, whether or not the buffer is contiguous
+    values = np.arange(4, dtype=np.float32)
+    contiguous = values.view(np.uint8)
+    strided = np.zeros(32, dtype=np.uint8)
+    strided[::2] = contiguous
+    assert not strided[::2].flags.c_contiguous
+
+    np.testing.assert_array_equal(self.model.stage_input('x', contiguous), values[None])
+    np.testing.assert_array_equal(self.model.stage_input('x', strided[::2]), values[None])
+
+  def test_strided_float(self):
+    buffer = np.arange(8, dtype=np.float32)[::2]
+    np.testing.assert_array_equal(self.model.stage_input('x', buffer), [[0., 2., 4., 6.]])
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import onnx
+import onnxruntime as ort
+import pytest
+from onnx import TensorProto, helper, numpy_helper
+
+from openpilot.selfdrive.modeld.runners import onnxmodel
+from openpilot.selfdrive.modeld.runners.onnxmodel import create_ort_session
+
+
+def make_model(path, weight):
+  w = numpy_helper.from_array(np.full((4, 4), weight, dtype=np.float16), 'w')
+  graph = helper.make_graph([helper.make_node('MatMul', ['x', 'w'], ['y'])], 'cache_test',
+                            [helper.make_tensor_value_info('x', TensorProto.FLOAT16, (1, 4))],
+                            [helper.make_tensor_value_info('y', TensorProto.FLOAT16, (1, 4))], [w])
+  onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)], ir_version=8), path)
+
+
+def run(session):
+  return session.run(None, {'x': np.ones((1, 4), dtype=np.float32)})[0]
+
+
+class TestModelCache:
+  @pytest.fixture(autouse=True)
+  def setup(self, tmp_path, monkeypatch):
+    monkeypatch.setenv('ONNXCPU', '1')
+    self.model_path = str(tmp_path / 'model.onnx')
+    self.cache_dir = str(tmp_path / 'cache')
+    make_model(self.model_path, 1.)
+
+  def test_cached(self, mocker):
+    np.testing.assert_allclose(run(create_ort_session(self.model_path, True, cache_dir=self.cache_dir)), 4.)
+    files = sorted(os.listdir(self.cache_dir))
+    assert len(files) == 2
+    assert any(f.endswith('.ort.onnx') for f in files)
+
+    convert = mocker.spy(onnxmodel, 'convert_fp16_to_fp32')
+    np.testing.assert_allclose(run(create_ort_session(self.model_path, True, cache_dir=self.cache_dir)), 4.)
+    assert convert.call_count == 0
+    assert sorted(os.listdir(self.cache_dir)) == files
+
+  def test_model_changed(self, mocker):
+    create_ort_session(self.model_path, True, cache_dir=self.cache_dir)
+    files = set(os.listdir(self.cache_dir))
+
+    make_model(self.model_path, 2.)
+    convert = mocker.spy(onnxmodel, 'convert_fp16_to_fp32')
+    np.testing.assert_allclose(run(create_ort_session(self.model_path, True, cache_dir=self.cache_dir)), 8.)
+    assert convert.call_count == 1
+    assert len(set(os.listdir(self.cache_dir)) - files) == 2
+
+  def test_corrupt_cache(self):
+    create_ort_session(self.model_path, True, cache_dir=self.cache_dir)
+    for f in os.listdir(self.cache_dir):
+      with open(os.path.join(self.cache_dir, f), 'wb') as fh:
+        fh.write(b'garbage')
+    np.testing.assert_allclose(run(create_ort_session(self.model_path, True, cache_dir=self.cache_dir)), 4.)
+
+  def test_unwritable_cache(self, tmp_path):
+    cache_file = tmp_path / 'not_a_dir'
+    cache_file.write_bytes(b'')
+    np.testing.assert_allclose(run(create_ort_session(self.model_path, True, cache_dir=str(cache_file))), 4.)
+
+  def test_cpu_flags_in_key(self, mocker):
+    create_ort_session(self.model_path, True, cache_dir=self.cache_dir)
+    mocker.patch.object(onnxmodel, 'get_cpu_flags', return_value='other cpu')
+    create_ort_session(self.model_path, True, cache_dir=self.cache_dir)
+    assert len([f for f in os.listdir(self.cache_dir) if f.endswith('.ort.onnx')]) == 2
+
+  def test_no_tmp_left_on_failure(self, mocker):
+    inference_session = ort.InferenceSession
+    def failing_session(*args, **kwargs):
+      inference_session(*args, **kwargs)
+      raise RuntimeError("session failed")
+    mocker.patch.object(ort, 'InferenceSession', side_effect=failing_session)
+    with pytest.raises(RuntimeError):
+      create_ort_session(self.model_path, True, cache_dir=self.cache_dir)
+    assert not [f for f in os.listdir(self.cache_dir) if f.endswith('.tmp')]
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from openpilot.selfdrive.modeld.constants import ModelConstants
+from openpilot.selfdrive.modeld.parse_model_outputs import Parser, safe_exp, sigmoid, softmax
+
+MC = ModelConstants
+PLAN_SIZE = MC.PLAN_MHP_N * (2 * MC.IDX_N * MC.PLAN_WIDTH + MC.PLAN_MHP_SELECTION)
+LEAD_SIZE = MC.LEAD_MHP_N * (2 * MC.LEAD_TRAJ_LEN * MC.LEAD_WIDTH + MC.LEAD_MHP_SELECTION)
+OUTPUT_SIZES = {
+  'plan': PLAN_SIZE,
+  'lane_lines': 2 * MC.NUM_LANE_LINES * MC.IDX_N * MC.LANE_LINES_WIDTH,
+  'lane_lines_prob': 2 * MC.NUM_LANE_LINES,
+  'road_edges': 2 * MC.NUM_ROAD_EDGES * MC.IDX_N * MC.LANE_LINES_WIDTH,
+  'lead': LEAD_SIZE,
+  'lead_prob': MC.LEAD_MHP_SELECTION,
+  'desire_state': MC.DESIRE_PRED_WIDTH,
+  'meta': 55,
+  'desire_pred': MC.DESIRE_PRED_LEN * MC.DESIRE_PRED_WIDTH,
+  'pose': 2 * MC.POSE_WIDTH,
+  'wide_from_device_euler': 2 * MC.WIDE_FROM_DEVICE_WIDTH,
+  'road_transform': 2 * MC.POSE_WIDTH,
+  'desired_curvature': 2 * MC.DESIRED_CURV_WIDTH,
+  'hidden_state': MC.FEATURE_LEN,
+}
+
+
+class LoopParser(Parser):
+  """Per frame reference implementation, what modeld used before the parser was vectorized"""
+
+  def parse_mdn(self, name, outs, in_N=0, out_N=1, out_shape=None):
+    if self.check_missing(outs, name):
+      return
+    raw = outs[name]
+    raw = raw.reshape((raw.shape[0], max(in_N, 1), -1))
+
+    n_values = (raw.shape[2] - out_N)//2
+    pred_mu = raw[:,:,:n_values]
+    pred_std = safe_exp(raw[:,:,n_values: 2*n_values])
+
+    if in_N > 1:
+      weights = np.zeros((raw.shape[0], in_N, out_N), dtype=raw.dtype)
+      for i in range(out_N):
+        weights[:,:,i - out_N] = softmax(raw[:,:,i - out_N], axis=-1)
+
+      if out_N == 1:
+        for fidx in range(weights.shape[0]):
+          idxs = np.argsort(weights[fidx][:,0])[::-1]
+          weights[fidx] = weights[fidx][idxs]
+          pred_mu[fidx] = pred_mu[fidx][idxs]
+          pred_std[fidx] = pred_std[fidx][idxs]
+      full_shape = tuple([raw.shape[0], in_N] + list(out_shape))
+      outs[name + '_weights'] = weights
+      outs[name + '_hypotheses'] = pred_mu.reshape(full_shape)
+      outs[name + '_stds_hypotheses'] = pred_std.reshape(full_shape)
+
+      pred_mu_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
+      pred_std_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
+      for fidx in range(weights.shape[0]):
+        for hidx in range(out_N):
+          idxs = np.argsort(weights[fidx,:,hidx])[::-1]
+          pred_mu_final[fidx, hidx] = pred_mu[fidx, idxs[0]]
+          pred_std_final[fidx, hidx] = pred_std[fidx, idxs[0]]
+    else:
+      pred_mu_final = pred_mu
+      pred_std_final = pred_std
+
+    if out_N > 1:
+      final_shape = tuple([raw.shape[0], out_N] + list(out_shape))
+    else:
+      final_shape = tuple([raw.shape[0],] + list(out_shape))
+    outs[name] = pred_mu_final.reshape(final_shape)
+    outs[name + '_stds'] = pred_std_final.reshape(final_shape)
+
+  def parse_outputs(self, outs):
+    self.parse_mdn('plan', outs, in_N=MC.PLAN_MHP_N, out_N=MC.PLAN_MHP_SELECTION, out_shape=(MC.IDX_N,MC.PLAN_WIDTH))
+    self.parse_mdn('lane_lines', outs, in_N=0, out_N=0, out_shape=(MC.NUM_LANE_LINES,MC.IDX_N,MC.LANE_LINES_WIDTH))
+    self.parse_mdn('road_edges', outs, in_N=0, out_N=0, out_shape=(MC.NUM_ROAD_EDGES,MC.IDX_N,MC.LANE_LINES_WIDTH))
+    self.parse_mdn('pose', outs, in_N=0, out_N=0, out_shape=(MC.POSE_WIDTH,))
+    self.parse_mdn('road_transform', outs, in_N=0, out_N=0, out_shape=(MC.POSE_WIDTH,))
+    self.parse_mdn('wide_from_device_euler', outs, in_N=0, out_N=0, out_shape=(MC.WIDE_FROM_DEVICE_WIDTH,))
+    self.parse_mdn('lead', outs, in_N=MC.LEAD_MHP_N, out_N=MC.LEAD_MHP_SELECTION, out_shape=(MC.LEAD_TRAJ_LEN,MC.LEAD_WIDTH))
+    if 'desired_curvature' in outs:
+      self.parse_mdn('desired_curvature', outs, in_N=0, out_N=0, out_shape=(MC.DESIRED_CURV_WIDTH,))
+    for k in ['lead_prob', 'lane_lines_prob', 'meta']:
+      outs[k] = sigmoid(outs[k])
+    self.parse_categorical_crossentropy('desire_state', outs, out_shape=(MC.DESIRE_PRED_WIDTH,))
+    self.parse_categorical_crossentropy('desire_pred', outs, out_shape=(MC.DESIRE_PRED_LEN,MC.DESIRE_PRED_WIDTH))
+    return outs
+
+
+def random_outputs(batch, scale=3.):
+  raw = (np.random.randn(batch, sum(OUTPUT_SIZES.values())) * scale).astype(np.float32)
+  offsets = np.cumsum([0, *OUTPUT_SIZES.values()])
+  return {k: raw[:, offsets[i]:offsets[i + 1]] for i, k in enumerate(OUTPUT_SIZES)}
+
+
+def assert_outputs_equal(expected, actual):
+  assert expected.keys() == actual.keys()
+  for k in expected:
+    assert expected[k].shape == actual[k].shape, k
+    assert expected[k].dtype == actual[k].dtype, k
+    np.testing.assert_allclose(actual[k], expected[k], rtol=1e-6, err_msg=k)
+
+
+class TestParseModelOutputs:
+  @pytest.mark.parametrize("batch", [1, 2, 100])
+  def test_parity(self, batch):
+    for _ in range(10):
+      outs = random_outputs(batch)
+      expected = LoopParser().parse_outputs({k: v.copy() for k, v in outs.items()})
+      actual = Parser().parse_outputs({k: v.copy() for k, v in outs.items()})
+      assert_outputs_equal(expected, actual)
+
+  def test_batch_matches_single_frames(self):
+    outs = random_outputs(50)
+    batched = Parser().parse_outputs({k: v.copy() for k, v in outs.items()})
+    for i in range(50):
+      single = Parser().parse_outputs({k: v[i:i+1].copy() for k, v in outs.items()})
+      assert_outputs_equal(single, {k: v[i:i+1] for k, v in batched.items()})
+
+  def test_tied_weights(self):
+    # equal hypothesis weights have to select the same hypothesis as before
+    outs = random_outputs(20)
+    outs['plan'][:] = 0.
+    outs['lead'][:] = np.round(outs['lead'])
+    expected = LoopParser().parse_outputs({k: v.copy() for k, v in outs.items()})
+    actual = Parser().parse_outputs({k: v.copy() for k, v in outs.items()})
+    assert_outputs_equal(expected, actual)
+
+  def test_missing(self):
+    outs = random_outputs(1)
+    del outs['pose'], outs['meta']
+    with pytest.raises(ValueError):
+      Parser().parse_outputs(outs)
+
+    outs = random_outputs(1)
+    del outs['pose'], outs['meta']
+    parsed = Parser(ignore_missing=True).parse_outputs(outs)
+    assert 'pose' not in parsed and 'pose_stds' not in parsed and 'meta' not in parsed
+    assert parsed['road_transform_stds'].shape == (1, MC.POSE_WIDTH)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# type: ignore
+# Per-frame python overhead of modeld input staging on CPU, outside of model inference.
+# Runs against a tiny ONNX model with supercombo's inputs, so the model itself costs ~nothing.
+
+import os
+import tempfile
+import time
+import numpy as np
+import onnx
+from onnx import TensorProto, helper
+
+os.environ['ONNXCPU'] = '1'
+
+from openpilot.selfdrive.modeld.constants import ModelConstants
+from openpilot.selfdrive.modeld.history import HistoryBuffer
+from openpilot.selfdrive.modeld.runners.onnxmodel import ONNXModel, create_ort_session
+
+N = int(os.getenv("N", "2000"))
+IMG_SHAPE = (1, 12, 128, 256)
+INPUTS = {
+  'input_imgs': (IMG_SHAPE, TensorProto.UINT8),
+  'big_input_imgs': (IMG_SHAPE, TensorProto.UINT8),
+  'desire': ((1, ModelConstants.HISTORY_BUFFER_LEN+1, ModelConstants.DESIRE_LEN), TensorProto.FLOAT),
+  'traffic_convention': ((1, ModelConstants.TRAFFIC_CONVENTION_LEN), TensorProto.FLOAT),
+  'lateral_control_params': ((1, ModelConstants.LATERAL_CONTROL_PARAMS_LEN), TensorProto.FLOAT),
+  'prev_desired_curv': ((1, ModelConstants.HISTORY_BUFFER_LEN+1, ModelConstants.PREV_DESIRED_CURV_LEN), TensorProto.FLOAT),
+  'features_buffer': ((1, ModelConstants.HISTORY_BUFFER_LEN, ModelConstants.FEATURE_LEN), TensorProto.FLOAT),
+}
+HIDDEN_STATE = np.random.rand(ModelConstants.FEATURE_LEN).astype(np.float32)
+
+
+def make_model(path):
+  # output is one value per input, so every input has to be bound and read
+  nodes, sums = [], []
+  for name, (_, dtype) in INPUTS.items():
+    x = name
+    if dtype != TensorProto.FLOAT:
+      nodes.append(helper.make_node('Cast', [name], [f'{name}_f'], to=TensorProto.FLOAT))
+      x = f'{name}_f'
+    nodes.append(helper.make_node('ReduceMax', [x], [f'{name}_max'], keepdims=0))
+    nodes.append(helper.make_node('Unsqueeze', [f'{name}_max', 'axes'], [f'{name}_sum']))
+    sums.append(f'{name}_sum')
+  nodes.append(helper.make_node('Concat', sums, ['outputs_flat'], axis=0))
+  nodes.append(helper.make_node('Unsqueeze', ['outputs_flat', 'axes'], ['outputs']))
+  graph = helper.make_graph(nodes, 'staging_bench',
+                            [helper.make_tensor_value_info(k, dtype, shape) for k, (shape, dtype) in INPUTS.items()],
+                            [helper.make_tensor_value_info('outputs', TensorProto.FLOAT, (1, len(INPUTS)))],
+                            [helper.make_tensor('axes', TensorProto.INT64, (1,), [0])])
+  onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)], ir_version=8), path)
+
+
+def run_old(path, imgs):
+  # ModelState and ONNXModel before ring buffers and IO binding
+  session = create_ort_session(path, fp16_to_fp32=True)
+  shapes = {x.name: [1, *x.shape[1:]] for x in session.get_inputs()}
+  dtypes = {x.name: np.uint8 if x.type == 'tensor(uint8)' else np.float32 for x in session.get_inputs()}
+  full_features_20Hz = np.zeros((ModelConstants.FULL_HISTORY_BUFFER_LEN, ModelConstants.FEATURE_LEN), dtype=np.float32)
+  desire_20Hz = np.zeros((ModelConstants.FULL_HISTORY_BUFFER_LEN + 1, ModelConstants.DESIRE_LEN), dtype=np.float32)
+  inputs = {k: np.zeros(np.prod(shape), dtype=np.float32) for k, (shape, _) in INPUTS.items() if k not in imgs}
+  inputs.update(imgs)
+  output = np.zeros(len(INPUTS), dtype=np.float32)
+
+  def step():
+    desire_20Hz[:-1] = desire_20Hz[1:]
+    desire_20Hz[-1] = 0
+    inputs['desire'][:] = desire_20Hz.reshape((25,4,-1)).max(axis=1).flatten()
+    feeds = {k: v.view(dtypes[k]) for k, v in inputs.items()}
+    feeds = {k: v.reshape(shapes[k]).astype(dtypes[k]) for k, v in feeds.items()}
+    output[:] = session.run(None, feeds)[0]
+    full_features_20Hz[:-1] = full_features_20Hz[1:]
+    full_features_20Hz[-1] = HIDDEN_STATE
+    inputs['features_buffer'][:] = full_features_20Hz[np.arange(-4,-100,-4)[::-1]].flatten()
+  return step, session
+
+
+def run_new(path, imgs):
+  output = np.zeros(len(INPUTS), dtype=np.float32)
+  model = ONNXModel(path, output, None, False, None)
+  features_20Hz = HistoryBuffer(ModelConstants.HISTORY_BUFFER_LEN, ModelConstants.FEATURE_LEN, stride=4, lag=3)
+  desire_20Hz = HistoryBuffer(ModelConstants.FULL_HISTORY_BUFFER_LEN + 1, ModelConstants.DESIRE_LEN)
+  inputs = {k: np.zeros(np.prod(shape), dtype=np.float32) for k, (shape, _) in INPUTS.items() if k not in imgs}
+  inputs['features_buffer'] = features_20Hz.view.reshape(-1)
+  for k, v in {**inputs, **imgs}.items():
+    model.addInput(k, v)
+
+  def step():
+    desire_20Hz.push(0)
+    np.max(desire_20Hz.view.reshape((25, 4, -1)), axis=1, out=inputs['desire'].reshape((25, -1)))
+    model.execute()
+    features_20Hz.push(HIDDEN_STATE)
+    model.setInputBuffer('features_buffer', features_20Hz.view.reshape(-1))
+  return step, model.session
+
+
+def bench(step):
+  for _ in range(10):
+    step()
+  ts = []
+  for _ in range(N):
+    st = time.perf_counter_ns()
+    step()
+    ts.append(time.perf_counter_ns() - st)
+  return np.array(ts) / 1e3
+
+
+if __name__ == "__main__":
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'staging_bench.onnx')
+    make_model(path)
+    imgs = {k: np.random.randint(0, 255, np.prod(IMG_SHAPE), dtype=np.uint8) for k in ('input_imgs', 'big_input_imgs')}
+
+    results = {}
+    for name, setup in (("before", run_old), ("after", run_new)):
+      step, session = setup(path, imgs)
+      results[name] = bench(step)
+
+    # the model itself, to subtract from the per-frame time
+    feeds = {k: np.zeros(shape, dtype=np.uint8 if dtype == TensorProto.UINT8 else np.float32) for k, (shape, dtype) in INPUTS.items()}
+    inference = bench(lambda: session.run(None, feeds))
+
+  print(f"{N} frames, tiny model inference {np.mean(inference):.1f} us")
+  for name, us in results.items():
+    overhead = np.mean(us) - np.mean(inference)
+    print(f"{name:7} {np.mean(us):8.1f} mean us/frame, {np.percentile(us, 99):8.1f} p99 us/frame, {overhead:8.1f} us/frame overhead")
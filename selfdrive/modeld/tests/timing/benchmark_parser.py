@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# type: ignore
+# Model output parsing throughput, per frame like modeld and batched like offline tools
+
+import os
+import time
+import numpy as np
+
+from openpilot.selfdrive.modeld.parse_model_outputs import Parser
+from openpilot.selfdrive.modeld.tests.test_parse_model_outputs import LoopParser, random_outputs
+
+N = int(os.getenv("N", "1000"))
+BATCH = int(os.getenv("BATCH", "10000"))
+
+
+def bench(parser, batch, n):
+  outs = random_outputs(batch)
+  ts = []
+  for _ in range(n):
+    frame = {k: v.copy() for k, v in outs.items()}
+    st = time.perf_counter_ns()
+    parser.parse_outputs(frame)
+    ts.append(time.perf_counter_ns() - st)
+  return np.array(ts) / 1e3
+
+
+if __name__ == "__main__":
+  for name, parser in (("loop", LoopParser()), ("vectorized", Parser())):
+    single = bench(parser, 1, N)
+    batched = bench(parser, BATCH, 3)
+    print(f"{name:10} single frame {np.mean(single):7.1f} mean us, {np.percentile(single, 99):7.1f} p99 us | " +
+          f"batch of {BATCH} {BATCH / np.mean(batched) * 1e6:9.0f} frames/s")
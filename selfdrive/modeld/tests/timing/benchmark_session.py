@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# type: ignore
+# modeld startup: ONNX session creation with a cold and a warm model cache
+
+import os
+import sys
+import tempfile
+import time
+
+from openpilot.selfdrive.modeld.runners.onnxmodel import create_ort_session
+
+MODEL_PATH = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), '../../models/supercombo.onnx')
+N = int(os.getenv("N", "3"))
+
+
+def timed(cache_dir):
+  st = time.monotonic()
+  create_ort_session(MODEL_PATH, fp16_to_fp32=True, cache_dir=cache_dir)
+  return time.monotonic() - st
+
+
+if __name__ == "__main__":
+  cold, warm = [], []
+  for _ in range(N):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      cold.append(timed(cache_dir))
+      warm.append(timed(cache_dir))
+
+  print(f"{os.path.basename(MODEL_PATH)}, {N} runs")
+  print(f"cold cache {min(cold):6.2f}s min {max(cold):6.2f}s max")
+  print(f"warm cache {min(warm):6.2f}s min {max(warm):6.2f}s max")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import numpy as np
+
+from openpilot.selfdrive.monitoring.helpers import DRIVER_MONITOR_SETTINGS, DriverMonitoring
+from openpilot.selfdrive.selfdrived.events import EVENT_NAME
+
+# dmonitoringd steps on every driverStateV2, with the latest of the others
+SERVICES = ['driverStateV2', 'liveCalibration', 'carState', 'selfdriveState', 'modelV2']
+DRIVER_PROBS = ('faceProb', 'leftEyeProb', 'rightEyeProb', 'leftBlinkProb', 'rightBlinkProb', 'sunglassesProb')
+
+
+@dataclass
+class DriverData:
+  face_orientation: np.ndarray  # (n, 3)
+  face_position: np.ndarray  # (n, 2)
+  face_orientation_std: np.ndarray  # (n, 2) pitch and yaw
+  ready_prob: np.ndarray
+  not_ready_prob: np.ndarray
+  # steps where the model output every list dmonitoringd needs
+  complete: np.ndarray
+  probs: dict[str, np.ndarray]
+
+
+@dataclass
+class DMInputs:
+  """Everything DriverMonitoring.run_step reads, one row per driverStateV2 of a route"""
+  log_mono_time: np.ndarray
+  frame_id: np.ndarray
+  # the SubMaster checks of a replay: every service seen and valid
+  valid: np.ndarray
+  v_ego: np.ndarray
+  steering_pressed: np.ndarray
+  gas_pressed: np.ndarray
+  standstill: np.ndarray
+  gear_shifter: np.ndarray
+  op_engaged: np.ndarray
+  # the first of brakeDisengageProbs, NaN where the list is empty
+  brake_disengage_prob: np.ndarray
+  has_brake_disengage_prob: np.ndarray
+  rpy_calib: np.ndarray  # (n, 3)
+  wheel_on_right_prob: np.ndarray
+  left: DriverData
+  right: DriverData
+
+  def __len__(self):
+    return len(self.log_mono_time)
+
+  @classmethod
+  def from_logs(cls, lr):
+    rows = []
+    latest = dict.fromkeys(SERVICES)
+    valid = dict.fromkeys(SERVICES, False)
+    for msg in lr:
+      s = msg.which()
+      if s not in latest:
+        continue
+      latest[s] = getattr(msg, s)
+      valid[s] = msg.valid
+      if s != 'driverStateV2':
+        continue
+
+      ds, cs, ss = latest['driverStateV2'], latest['carState'], latest['selfdriveState']
+      seen = all(latest[s] is not None for s in SERVICES)
+      brake_probs = latest['modelV2'].meta.disengagePredictions.brakeDisengageProbs if seen else []
+      row = {
+        'log_mono_time': msg.logMonoTime, 'frame_id': ds.frameId, 'valid': seen and all(valid.values()),
+        'v_ego': cs.vEgo if cs is not None else 0., 'steering_pressed': cs is not None and cs.steeringPressed,
+        'gas_pressed': cs is not None and cs.gasPressed, 'standstill': cs is not None and cs.standstill,
+        'gear_shifter': cs.gearShifter.raw if cs is not None else 0, 'op_engaged': ss is not None and ss.enabled,
+        'brake_disengage_prob': brake_probs[0] if len(brake_probs) else np.nan, 'has_brake_disengage_prob': len(brake_probs) > 0,
+        'rpy_calib': list(latest['liveCalibration'].rpyCalib) if latest['liveCalibration'] is not None else [],
+        'wheel_on_right_prob': ds.wheelOnRightProb,
+      }
+      for side, dd in (('left', ds.leftDriverData), ('right', ds.rightDriverData)):
+        lists = (dd.faceOrientation, dd.facePosition, dd.faceOrientationStd, dd.facePositionStd, dd.readyProb, dd.notReadyProb)
+        complete = all(len(x) > 0 for x in lists)
+        row[side] = (complete, list(dd.faceOrientation) if complete else [0.] * 3, list(dd.facePosition) if complete else [0.] * 2,
+                     [dd.faceOrientationStd[0], dd.faceOrientationStd[1]] if complete else [0.] * 2, dd.readyProb[0] if complete else 0.,
+                     dd.notReadyProb[0] if complete else 0., [getattr(dd, p) for p in DRIVER_PROBS])
+      rows.append(row)
+
+    def col(name, dtype):
+      return np.array([r[name] for r in rows], dtype=dtype)
+
+    def driver(side):
+      d = [r[side] for r in rows]
+      probs = np.array([x[6] for x in d], dtype=np.float64).reshape(-1, len(DRIVER_PROBS))
+      return DriverData(
+        face_orientation=np.array([x[1][:3] for x in d], dtype=np.float64).reshape(-1, 3),
+        face_position=np.array([x[2][:2] for x in d], dtype=np.float64).reshape(-1, 2),
+        face_orientation_std=np.array([x[3] for x in d], dtype=np.float64).reshape(-1, 2),
+        ready_prob=np.array([x[4] for x in d], dtype=np.float64),
+        not_ready_prob=np.array([x[5] for x in d], dtype=np.float64),
+        complete=np.array([x[0] for x in d], dtype=bool),
+        probs={p: probs[:, i] for i, p in enumerate(DRIVER_PROBS)},
+      )
+
+    # steps before liveCalibration is seen are not valid and never run, any calibration does
+    rpy_calib = np.array([r['rpy_calib'] if len(r['rpy_calib']) == 3 else [0.] * 3 for r in rows], dtype=np.float64).reshape(-1, 3)
+    return cls(
+      log_mono_time=col('log_mono_time', np.int64), frame_id=col('frame_id', np.int64), valid=col('valid', bool),
+      v_ego=col('v_ego', np.float64), steering_pressed=col('steering_pressed', bool), gas_pressed=col('gas_pressed', bool),
+      standstill=col('standstill', bool), gear_shifter=col('gear_shifter', np.int64), op_engaged=col('op_engaged', bool),
+      brake_disengage_prob=col('brake_disengage_prob', np.float64), has_brake_disengage_prob=col('has_brake_disengage_prob', bool),
+      rpy_calib=rpy_calib, wheel_on_right_prob=col('wheel_on_right_prob', np.float64), left=driver('left'), right=driver('right'),
+    )
+
+  def steps(self):
+    """(valid, sm) of each step, sm holding the messages DriverMonitoring.run_step reads, built once and shared by every variant"""
+    def driver_data(d, i):
+      if not d.complete[i]:
+        return SimpleNamespace(faceOrientation=[], facePosition=[], faceOrientationStd=[], facePositionStd=[], readyProb=[], notReadyProb=[],
+                               **{p: float(d.probs[p][i]) for p in DRIVER_PROBS})
+      return SimpleNamespace(faceOrientation=d.face_orientation[i].tolist(), facePosition=d.face_position[i].tolist(),
+                             faceOrientationStd=d.face_orientation_std[i].tolist(), facePositionStd=[0.],
+                             readyProb=[float(d.ready_prob[i])], notReadyProb=[float(d.not_ready_prob[i])],
+                             **{p: float(d.probs[p][i]) for p in DRIVER_PROBS})
+
+    cols = (self.valid.tolist(), self.v_ego.tolist(), self.steering_pressed.tolist(), self.gas_pressed.tolist(), self.standstill.tolist(),
+            self.gear_shifter.tolist(), self.op_engaged.tolist(), self.brake_disengage_prob.tolist(), self.has_brake_disengage_prob.tolist(),
+            self.rpy_calib.tolist(), self.wheel_on_right_prob.tolist())
+    steps = []
+    for i, (valid, v_ego, steering_pressed, gas_pressed, standstill, gear_shifter, op_engaged, brake_prob, has_brake_prob, rpy_calib,
+            wheel_on_right_prob) in enumerate(zip(*cols, strict=True)):
+      # an empty brakeDisengageProbs stays empty, run_step fails on it like dmonitoringd does
+      brake_probs = [brake_prob] if has_brake_prob else []
+      sm = {
+        'modelV2': SimpleNamespace(meta=SimpleNamespace(disengagePredictions=SimpleNamespace(brakeDisengageProbs=brake_probs))),
+        'carState': SimpleNamespace(vEgo=v_ego, steeringPressed=steering_pressed, gasPressed=gas_pressed, standstill=standstill,
+                                    gearShifter=gear_shifter),
+        'driverStateV2': SimpleNamespace(wheelOnRightProb=wheel_on_right_prob, leftDriverData=driver_data(self.left, i),
+                                         rightDriverData=driver_data(self.right, i)),
+        'liveCalibration': SimpleNamespace(rpyCalib=rpy_calib),
+        'selfdriveState': SimpleNamespace(enabled=op_engaged),
+      }
+      steps.append((valid, sm))
+    return steps
+
+
+@dataclass
+class DMResult:
+  settings: dict
+  # events and awareness as published after each step
+  events: list[tuple[int, ...]] = field(repr=False)
+  awareness: np.ndarray = field(repr=False)
+
+  def timeline(self, log_mono_time=None):
+    """(step or logMonoTime, event names) whenever the published events change"""
+    out, prev = [], ()
+    for i, e in enumerate(self.events):
+      if e != prev:
+        out.append((i if log_mono_time is None else int(log_mono_time[i]), [EVENT_NAME[n] for n in e]))
+        prev = e
+    return out
+
+  def onsets(self):
+    """Number of times each event started"""
+    counts = {}
+    prev = ()
+    for e in self.events:
+      for n in set(e) - set(prev):
+        counts[EVENT_NAME[n]] = counts.get(EVENT_NAME[n], 0) + 1
+      prev = e
+    return counts
+
+
+def make_settings(overrides=None):
+  settings = DRIVER_MONITOR_SETTINGS()
+  for k, v in (overrides or {}).items():
+    assert hasattr(settings, k), f"unknown driver monitoring setting {k}"
+    setattr(settings, k, v)
+  return settings
+
+
+def run_variants(steps, variants, rhd_saved=False, always_on=False):
+  """Steps one DriverMonitoring per settings variant in lockstep over the same inputs, like dmonitoringd does"""
+  dms = [DriverMonitoring(rhd_saved=rhd_saved, settings=make_settings(v), always_on=always_on) for v in variants]
+  events = [[] for _ in dms]
+  awareness = [np.empty(len(steps)) for _ in dms]
+  for i, (valid, sm) in enumerate(steps):
+    for dm, ev, aw in zip(dms, events, awareness, strict=True):
+      if valid:
+        dm.run_step(sm)
+      ev.append(tuple(dm.current_events.names))
+      aw[i] = dm.awareness
+  return [DMResult(settings=dict(v or {}), events=e, awareness=a) for v, e, a in zip(variants, events, awareness, strict=True)]
+
+
+def _run_chunk(args):
+  inputs, variants, rhd_saved, always_on = args
+  return run_variants(inputs.steps(), variants, rhd_saved, always_on)
+
+
+def evaluate(inputs, variants=None, rhd_saved=False, always_on=False, jobs=1):
+  """
+  Runs the driver monitoring state machine over a whole route once per settings variant.
+  variants are dicts of DRIVER_MONITOR_SETTINGS attributes to override, None is the defaults.
+  With jobs > 1 the variants are split over processes, each building the step inputs once.
+  """
+  variants = list(variants) if variants is not None else [None]
+  jobs = max(1, min(jobs, len(variants)))
+  if jobs == 1:
+    return run_variants(inputs.steps(), variants, rhd_saved, always_on)
+  chunks = [variants[i::jobs] for i in range(jobs)]
+  with ProcessPoolExecutor(max_workers=jobs) as pool:
+    results = list(pool.map(_run_chunk, [(inputs, c, rhd_saved, always_on) for c in chunks]))
+  # undo the round robin split
+  out = [None] * len(variants)
+  for j, res in enumerate(results):
+    out[j::jobs] = res
+  return out
+
+
+if __name__ == "__main__":
+  from openpilot.tools.lib.logreader import LogReader
+
+  parser = argparse.ArgumentParser(description="Run driver monitoring over a route offline, optionally with changed settings")
+  parser.add_argument("route", help="route or segment name")
+  parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2,...",
+                      help="evaluate each value of a setting, ex: _DISTRACTED_TIME=9,11,13")
+  parser.add_argument("--rhd", action="store_true", help="saved right hand drive")
+  parser.add_argument("--always-on", action="store_true", help="always on driver monitoring")
+  parser.add_argument("--jobs", type=int, default=os.cpu_count())
+  args = parser.parse_args()
+
+  variants = [None]
+  for s in args.set:
+    name, values = s.split("=")
+    variants += [{name: float(v)} for v in values.split(",")]
+
+  inputs = DMInputs.from_logs(LogReader(args.route, sort_by_time=True))
+  for res in evaluate(inputs, variants, rhd_saved=args.rhd, always_on=args.always_on, jobs=args.jobs):
+    print(res.settings or "defaults", res.onsets())
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from cereal import log
+import cereal.messaging as messaging
+from openpilot.common.realtime import DT_DMON
+from openpilot.selfdrive.monitoring.evaluate import DMInputs, evaluate
+from openpilot.selfdrive.test.process_replay.process_replay import replay_process_with_name
+
+EventName = log.OnroadEvent.EventName
+
+
+def make_route(seconds=200, seed=0):
+  """dmonitoringd inputs at their log rates: a driver who looks away, hides and comes back, engaging and disengaging"""
+  rng = np.random.default_rng(seed)
+  msgs = []
+  n = int(seconds / DT_DMON)
+  for i in range(n):
+    t = int(1e9 + i * DT_DMON * 1e9)
+    phase = (i * DT_DMON) % 60
+
+    cs = messaging.new_message('carState', valid=True, logMonoTime=t)
+    cs.carState.vEgo = 25. if phase > 5 else 0.
+    cs.carState.standstill = phase <= 5
+    cs.carState.steeringPressed = bool(rng.random() < 0.01)
+    ss = messaging.new_message('selfdriveState', valid=True, logMonoTime=t + 1)
+    ss.selfdriveState.enabled = 3 < (i * DT_DMON) % 100 < 90
+    mdl = messaging.new_message('modelV2', valid=True, logMonoTime=t + 2)
+    mdl.modelV2.meta.disengagePredictions.brakeDisengageProbs = [float(rng.random() * 0.3)] * 6
+    cal = messaging.new_message('liveCalibration', valid=True, logMonoTime=t + 3)
+    cal.liveCalibration.rpyCalib = [0., 0.02, -0.01]
+
+    ds = messaging.new_message('driverStateV2', valid=i % 500 != 7, logMonoTime=t + 4)
+    ds.driverStateV2.frameId = i
+    ds.driverStateV2.wheelOnRightProb = 0.1
+    for dd in (ds.driverStateV2.leftDriverData, ds.driverStateV2.rightDriverData):
+      dd.faceProb = 0. if 20 < phase < 35 else 0.95
+      dd.faceOrientation = [float(-0.6 if 40 < phase < 55 else rng.normal(0., 0.05)), float(rng.normal(0., 0.05)), 0.]
+      dd.facePosition = [float(rng.normal(0., 0.02)), float(rng.normal(0., 0.02))]
+      dd.faceOrientationStd = [0.1, 0.1, 0.1]
+      dd.facePositionStd = [0.1, 0.1]
+      dd.leftEyeProb = dd.rightEyeProb = 1.
+      dd.leftBlinkProb = dd.rightBlinkProb = float(rng.random() * 0.5)
+      dd.readyProb = [0.9, 0., 0., 0.]
+      dd.notReadyProb = [float(rng.random() * 0.2), 0.]
+    msgs += [cs, ss, mdl, cal, ds]
+  return [m.as_reader() for m in msgs]
+
+
+class TestEvaluate:
+  def test_matches_replay(self):
+    msgs = make_route()
+    out = [m for m in replay_process_with_name("dmonitoringd", msgs) if m.which() == 'driverMonitoringState']
+    expected = [tuple(e.name.raw for e in m.driverMonitoringState.events) for m in out]
+    expected_awareness = [m.driverMonitoringState.awarenessStatus for m in out]
+
+    inputs = DMInputs.from_logs(msgs)
+    assert len(inputs) == len(expected)
+    res, = evaluate(inputs)
+    assert res.events == expected
+    np.testing.assert_allclose(res.awareness, expected_awareness, rtol=1e-6)
+    assert {'preDriverDistracted', 'promptDriverDistracted'} <= set(res.onsets())
+
+  def test_variants(self):
+    inputs = DMInputs.from_logs(make_route())
+    variants = [None, {'_DISTRACTED_TIME': 7.}, {'_DISTRACTED_TIME': 15.}, {'_AWARENESS_TIME': 10.}]
+    results = evaluate(inputs, variants)
+    assert results[0].events == evaluate(inputs)[0].events
+    assert [r.events for r in evaluate(inputs, variants, jobs=2)] == [r.events for r in results]
+
+    first_alert = [next(i for i, e in enumerate(r.events) if EventName.preDriverDistracted in e) for r in results[:3]]
+    assert first_alert[1] < first_alert[0] < first_alert[2]
+    assert results[3].onsets() != results[0].onsets()
+
+  def test_missing_brake_disengage_probs(self):
+    # dmonitoringd fails on an empty brakeDisengageProbs, so does the evaluation
+    msgs = [m.as_builder() for m in make_route(10)]
+    for m in msgs:
+      if m.which() == 'modelV2':
+        m.modelV2.meta.disengagePredictions.brakeDisengageProbs = []
+    inputs = DMInputs.from_logs([m.as_reader() for m in msgs])
+    assert not inputs.has_brake_disengage_prob.any()
+    with pytest.raises(IndexError):
+      evaluate(inputs)
@@ -954,6 +954,101 @@ EVENTS: dict[int, dict[str, Alert | AlertCallbackType]] = {
 }
 
 
+# ********** bitset events **********
+
+# per event type, the events that have an alert of that type
+ET_MASKS: dict[str, int] = {et: sum(1 << e for e, alerts in EVENTS.items() if et in alerts) for alerts in EVENTS.values() for et in alerts}
+ONROAD_EVENT_FIELDS = {e: dict.fromkeys(alerts, True) for e, alerts in EVENTS.items()}
+
+
+def iter_bits(mask: int):
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask ^= low
+
+
+class BitsetEvents:
+  """
+  Events with the active set kept as a bitset over EventName. Checking for an event type is a mask test,
+  and creating alerts and messages only visits the active events. Adding an event twice is rare, those
+  repeats are counted separately so names, len and the created alerts match Events exactly.
+  """
+  def __init__(self):
+    self.mask = 0
+    self.repeats: dict[int, int] = {}
+    self.static_mask = 0
+    self.static_repeats: dict[int, int] = {}
+    # consecutive clears each active event has survived
+    self.counters: dict[int, int] = {}
+
+  def _iter(self, mask: int):
+    for e in iter_bits(mask):
+      yield e
+      for _ in range(self.repeats.get(e, 0)):
+        yield e
+
+  @property
+  def names(self) -> list[int]:
+    return list(self._iter(self.mask))
+
+  @property
+  def event_counters(self) -> dict[int, int]:
+    return {k: self.counters.get(k, 0) for k in EVENTS}
+
+  def __len__(self) -> int:
+    return self.mask.bit_count() + sum(self.repeats.values())
+
+  def add(self, event_name: int, static: bool=False) -> None:
+    bit = 1 << event_name
+    if static:
+      if self.static_mask & bit:
+        self.static_repeats[event_name] = self.static_repeats.get(event_name, 0) + 1
+      self.static_mask |= bit
+    if self.mask & bit:
+      self.repeats[event_name] = self.repeats.get(event_name, 0) + 1
+    self.mask |= bit
+
+  def clear(self) -> None:
+    self.counters = {e: self.counters.get(e, 0) + 1 for e in iter_bits(self.mask) if e in EVENTS}
+    self.mask = self.static_mask
+    self.repeats = self.static_repeats.copy()
+
+  def contains(self, event_type: str) -> bool:
+    return bool(self.mask & ET_MASKS.get(event_type, 0))
+
+  def create_alerts(self, event_types: list[str], callback_args=None):
+    if callback_args is None:
+      callback_args = []
+
+    mask = 0
+    for et in event_types:
+      mask |= ET_MASKS.get(et, 0)
+
+    ret = []
+    for e in self._iter(self.mask & mask):
+      alerts = EVENTS[e]
+      for et in event_types:
+        alert = alerts.get(et)
+        if alert is None:
+          continue
+        if not isinstance(alert, Alert):
+          alert = alert(*callback_args)
+
+        if DT_CTRL * (self.counters.get(e, 0) + 1) >= alert.creation_delay:
+          alert.alert_type = f"{EVENT_NAME[e]}/{et}"
+          alert.event_type = et
+          ret.append(alert)
+    return ret
+
+  def add_from_msg(self, events):
+    for e in events:
+      self.add(e.name.raw)
+
+  def to_msg(self):
+    return [log.OnroadEvent.new_message(name=e, **ONROAD_EVENT_FIELDS.get(e, {})) for e in self._iter(self.mask)]
+
+
 if __name__ == '__main__':
   # print all alerts by type and priority
   from cereal.services import SERVICE_LIST
@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 import os
-import time
-import threading
 
 import cereal.messaging as messaging
 
@@ -11,12 +9,13 @@ from panda import ALTERNATIVE_EXPERIENCE
 
 
 from openpilot.common.params import Params
+from openpilot.common.params_cache import ParamsCache
 from openpilot.common.realtime import config_realtime_process, Priority, Ratekeeper, DT_CTRL
 from openpilot.common.swaglog import cloudlog
 from openpilot.common.gps import get_gps_location_service
 
 from openpilot.selfdrive.car.car_specific import CarSpecificEvents
-from openpilot.selfdrive.selfdrived.events import Events, ET
+from openpilot.selfdrive.selfdrived.events import BitsetEvents, ET
 from openpilot.selfdrive.selfdrived.state import StateMachine
 from openpilot.selfdrive.selfdrived.alertmanager import AlertManager, set_offroad_alert
 from openpilot.selfdrive.controls.lib.latcontrol import MIN_LATERAL_CONTROL_SPEED
@@ -97,7 +96,7 @@ class SelfdriveD:
 
     self.CS_prev = car.CarState.new_message()
     self.AM = AlertManager()
-    self.events = Events()
+    self.events = BitsetEvents()
 
     self.initialized = False
     self.enabled = False
@@ -467,24 +466,21 @@ class SelfdriveD:
     except (ValueError, TypeError):
       return log.LongitudinalPersonality.standard
 
-  def params_thread(self, evt):
-    while not evt.is_set():
-      self.is_metric = self.params.get_bool("IsMetric")
-      self.experimental_mode = self.params.get_bool("ExperimentalMode") and self.CP.openpilotLongitudinalControl
-      self.personality = self.read_personality_param()
-      time.sleep(0.1)
+  def params_callback(self, key: str = None) -> None:
+    self.is_metric = self.params_cache.get_bool("IsMetric")
+    self.experimental_mode = self.params_cache.get_bool("ExperimentalMode") and self.CP.openpilotLongitudinalControl
+    self.personality = self.read_personality_param()
 
   def run(self):
-    e = threading.Event()
-    t = threading.Thread(target=self.params_thread, args=(e, ))
+    self.params_cache = ParamsCache()
     try:
-      t.start()
+      self.params_cache.subscribe(["IsMetric", "ExperimentalMode", "LongitudinalPersonality"], self.params_callback)
+      self.params_callback()
       while True:
         self.step()
         self.rk.monitor_time()
     finally:
-      e.set()
-      t.join()
+      self.params_cache.close()
 
 
 def main():
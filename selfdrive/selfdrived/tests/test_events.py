@@ -0,0 +1,70 @@
+import random
+
+from cereal import car, log
+from cereal.messaging import SubMaster
+from openpilot.selfdrive.selfdrived.events import ET, EVENTS, BitsetEvents, Events
+from openpilot.selfdrive.test.process_replay.process_replay import CONFIGS
+
+ALL_ET = [v for k, v in vars(ET).items() if not k.startswith('_')]
+
+
+def alert_key(alert):
+  return alert.alert_type, alert.event_type, alert.alert_text_1, alert.alert_text_2, alert.priority, alert.creation_delay
+
+
+def msg_key(event):
+  return event.name.raw, tuple(getattr(event, et) for et in ALL_ET)
+
+
+class TestBitsetEvents:
+  @classmethod
+  def setup_class(cls):
+    cfg = [c for c in CONFIGS if c.proc_name == 'selfdrived'][0]
+    cls.callback_args = [car.CarParams.new_message(), car.CarState.new_message(), SubMaster(cfg.pubs), False, 100,
+                         log.LongitudinalPersonality.standard]
+
+  def check_equal(self, ref, ev, rng):
+    assert ev.names == ref.names
+    assert len(ev) == len(ref)
+    assert ev.event_counters == ref.event_counters
+    for et in ALL_ET:
+      assert ev.contains(et) == ref.contains(et)
+
+    event_types = rng.sample(ALL_ET, rng.randint(1, len(ALL_ET)))
+    assert [alert_key(a) for a in ev.create_alerts(event_types, self.callback_args)] == \
+           [alert_key(a) for a in ref.create_alerts(event_types, self.callback_args)]
+    assert [msg_key(e) for e in ev.to_msg()] == [msg_key(e) for e in ref.to_msg()]
+
+  def test_random_equivalence(self):
+    rng = random.Random(0)
+    names = list(EVENTS.keys())
+    for _ in range(20):
+      ref, ev = Events(), BitsetEvents()
+      for e in rng.sample(names, rng.randint(0, 2)) * rng.randint(1, 2):
+        ref.add(e, static=True)
+        ev.add(e, static=True)
+
+      # events that stay on for a while, so the creation delays and counters matter
+      sticky = rng.sample(names, 5)
+      for _ in range(200):
+        ref.clear()
+        ev.clear()
+        added = [e for e in sticky if rng.random() < 0.9] + rng.sample(names, rng.randint(0, 8))
+        # repeats, like an event coming from both carState and selfdrived
+        added += rng.sample(added, min(len(added), rng.randint(0, 2)))
+        for e in added:
+          ref.add(e)
+          ev.add(e)
+
+        other = Events()
+        for e in rng.sample(names, rng.randint(0, 3)):
+          other.add(e)
+        ref.add_from_msg(other.to_msg())
+        ev.add_from_msg(other.to_msg())
+        self.check_equal(ref, ev, rng)
+
+  def test_empty(self):
+    ev = BitsetEvents()
+    assert ev.names == [] and len(ev) == 0
+    assert not any(ev.contains(et) for et in ALL_ET)
+    assert ev.create_alerts(ALL_ET) == [] and ev.to_msg() == []
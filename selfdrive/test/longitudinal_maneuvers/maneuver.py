@@ -1,7 +1,38 @@
+import time
+from dataclasses import dataclass, field
 import numpy as np
 from openpilot.selfdrive.test.longitudinal_maneuvers.plant import Plant
 
 
+def solver_stats(solve_times) -> dict[str, float]:
+  t = np.asarray(solve_times, dtype=np.float64)
+  if not len(t):
+    return {'count': 0, 'mean': float('nan'), 'p50': float('nan'), 'p99': float('nan'), 'max': float('nan')}
+  return {'count': len(t), 'mean': float(np.mean(t)), 'p50': float(np.percentile(t, 50)),
+          'p99': float(np.percentile(t, 99)), 'max': float(np.max(t))}
+
+
+@dataclass
+class ManeuverResult:
+  title: str
+  valid: bool
+  failures: list[str]
+  steps: int
+  wall_time: float
+  min_d_rel: float
+  min_accel: float
+  max_accel: float
+  final_speed: float
+  fcw: bool
+  solve_times: np.ndarray
+  # time, distance, distance_lead, speed, speed_lead, acceleration per step
+  logs: np.ndarray = field(repr=False)
+
+  @property
+  def solver(self) -> dict[str, float]:
+    return solver_stats(self.solve_times)
+
+
 class Maneuver:
   def __init__(self, title, duration, **kwargs):
     # Was tempted to make a builder class
@@ -28,7 +59,9 @@ class Maneuver:
     self.duration = duration
     self.title = title
 
-  def evaluate(self):
+  def run(self, trace=False) -> ManeuverResult:
+    """Steps the plant as fast as the planner runs, trace builds the planner inputs as real messages"""
+    t0 = time.monotonic()
     plant = Plant(
       lead_relevancy=self.lead_relevancy,
       speed=self.speed,
@@ -39,10 +72,14 @@ class Maneuver:
       e2e=self.e2e,
       personality=self.personality,
       force_decel=self.force_decel,
+      trace=trace,
     )
 
-    valid = True
+    failures = []
     logs = []
+    solve_times = []
+    min_d_rel = float('inf')
+    fcw = False
     while plant.current_time < self.duration:
       speed_lead = np.interp(plant.current_time, self.breakpoints, self.speed_lead_values)
       prob_lead = np.interp(plant.current_time, self.breakpoints, self.prob_lead_values)
@@ -55,29 +92,47 @@ class Maneuver:
       v_rel = speed_lead - log['speed'] if self.lead_relevancy else 0.
       log['d_rel'] = d_rel
       log['v_rel'] = v_rel
-      logs.append(np.array([plant.current_time,
-                            log['distance'],
-                            log['distance_lead'],
-                            log['speed'],
-                            speed_lead,
-                            log['acceleration']]))
+      logs.append([plant.current_time,
+                   log['distance'],
+                   log['distance_lead'],
+                   log['speed'],
+                   speed_lead,
+                   log['acceleration']])
+      solve_times.append(log['solve_time'])
+      min_d_rel = min(min_d_rel, d_rel)
+      fcw = fcw or log['fcw']
 
-      if d_rel < .4 and (self.only_radar or prob_lead > 0.5):
-        print("Crashed!!!!")
-        valid = False
+      if d_rel < .4 and (self.only_radar or prob_lead > 0.5) and "Crashed!!!!" not in failures:
+        failures.append("Crashed!!!!")
 
-      if self.ensure_start and log['v_rel'] > 0 and log['speeds'][-1] <= 0.1:
-        print('LongitudinalPlanner not starting!')
-        valid = False
+      if self.ensure_start and log['v_rel'] > 0 and log['speeds'][-1] <= 0.1 and 'LongitudinalPlanner not starting!' not in failures:
+        failures.append('LongitudinalPlanner not starting!')
 
     if self.ensure_slowdown and log['speed'] > 5.5:
-      print('LongitudinalPlanner not slowing down!')
-      valid = False
+      failures.append('LongitudinalPlanner not slowing down!')
 
     if self.force_decel and log['speed'] > 1e-1 and log['acceleration'] > -0.04:
-      print('Not stopping with force decel')
-      valid = False
+      failures.append('Not stopping with force decel')
 
+    logs_arr = np.array(logs)
+    return ManeuverResult(
+      title=self.title,
+      valid=not failures,
+      failures=failures,
+      steps=len(logs),
+      wall_time=time.monotonic() - t0,
+      min_d_rel=min_d_rel,
+      min_accel=float(np.min(logs_arr[:, 5])),
+      max_accel=float(np.max(logs_arr[:, 5])),
+      final_speed=float(log['speed']),
+      fcw=fcw,
+      solve_times=np.array(solve_times),
+      logs=logs_arr,
+    )
 
-    print("maneuver end", valid)
-    return valid, np.array(logs)
+  def evaluate(self):
+    result = self.run()
+    for failure in result.failures:
+      print(failure)
+    print("maneuver end", result.valid)
+    return result.valid, result.logs
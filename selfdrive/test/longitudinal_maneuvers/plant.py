@@ -1,30 +1,30 @@
 #!/usr/bin/env python3
-import time
+from types import SimpleNamespace
 import numpy as np
 
 from cereal import log
 import cereal.messaging as messaging
-from openpilot.common.realtime import Ratekeeper, DT_MDL
+from openpilot.common.realtime import DT_MDL
 from openpilot.selfdrive.controls.lib.longcontrol import LongCtrlState
 from openpilot.selfdrive.modeld.constants import ModelConstants
 from openpilot.selfdrive.controls.lib.longitudinal_planner import LongitudinalPlanner
 from openpilot.selfdrive.controls.radard import _LEAD_ACCEL_TAU
 
 
-class Plant:
-  messaging_initialized = False
+def f32(x):
+  # what a value reads back as after a round trip through a Float32 message field
+  return float(np.float32(x))
+
+
+def new_lead():
+  return SimpleNamespace(dRel=0., yRel=0., vRel=0., aRel=0., vLead=0., vLeadK=0., aLeadK=0., aLeadTau=0., status=False, modelProb=0.)
 
+
+class Plant:
   def __init__(self, lead_relevancy=False, speed=0.0, distance_lead=2.0,
-               enabled=True, only_lead2=False, only_radar=False, e2e=False, personality=0, force_decel=False):
+               enabled=True, only_lead2=False, only_radar=False, e2e=False, personality=0, force_decel=False, trace=False):
     self.rate = 1. / DT_MDL
-
-    if not Plant.messaging_initialized:
-      Plant.radar = messaging.pub_sock('radarState')
-      Plant.controls_state = messaging.pub_sock('controlsState')
-      Plant.selfdrive_state = messaging.pub_sock('selfdriveState')
-      Plant.car_state = messaging.pub_sock('carState')
-      Plant.plan = messaging.sub_sock('longitudinalPlan')
-      Plant.messaging_initialized = True
+    self.frame = 0
 
     self.v_lead_prev = 0.0
 
@@ -43,10 +43,12 @@ class Plant:
     self.personality = personality
     self.force_decel = force_decel
 
-    self.rk = Ratekeeper(self.rate, print_delay_threshold=100.0)
+    # with trace the planner gets real messages, which are also returned from step.
+    # Otherwise it reads the same values from plain objects, which is much faster to fill in
+    self.trace = trace
     self.ts = 1. / self.rate
-    time.sleep(0.1)
-    self.sm = messaging.SubMaster(['longitudinalPlan'])
+    if not trace:
+      self.init_inputs()
 
     from opendbc.car.honda.values import CAR
     from opendbc.car.honda.interface import CarInterface
@@ -55,34 +57,57 @@ class Plant:
 
   @property
   def current_time(self):
-    return float(self.rk.frame) / self.rate
+    return float(self.frame) / self.rate
+
+  def init_inputs(self):
+    n = len(ModelConstants.T_IDXS)
+    self.lead = new_lead()
+    self.model = SimpleNamespace(
+      position=SimpleNamespace(x=np.zeros(n, dtype=np.float32)),
+      velocity=SimpleNamespace(x=np.zeros(n, dtype=np.float32)),
+      acceleration=SimpleNamespace(x=np.zeros(n, dtype=np.float32)),
+      temporalPose=SimpleNamespace(trans=[]),
+      meta=SimpleNamespace(disengagePredictions=SimpleNamespace(gasPressProbs=[1.] * 6)),
+    )
+    self.car_state = SimpleNamespace(vEgo=0., aEgo=0., standstill=False, vCruise=0., steeringAngleDeg=0.)
+    self.sm = {
+      'radarState': SimpleNamespace(leadOne=new_lead() if self.only_lead2 else self.lead, leadTwo=self.lead),
+      'carState': self.car_state,
+      'carControl': SimpleNamespace(orientationNED=[0., 0., 0.]),
+      'controlsState': SimpleNamespace(longControlState=LongCtrlState.pid if self.enabled else LongCtrlState.off, forceDecel=self.force_decel),
+      'selfdriveState': SimpleNamespace(experimentalMode=self.e2e, personality=self.personality, enabled=False),
+      'modelV2': self.model,
+    }
 
-  def step(self, v_lead=0.0, prob_lead=1.0, v_cruise=50., pitch=0.0, prob_throttle=1.0):
-    # ******** publish a fake model going straight and fake calibration ********
-    # note that this is worst case for MPC, since model will delay long mpc by one time step
+  def update_inputs(self, d_rel, v_rel, a_lead, v_lead, status, prob_lead, v_cruise, pitch, prob_throttle):
+    lead = self.lead
+    lead.dRel = f32(d_rel)
+    lead.vRel = f32(v_rel)
+    lead.aRel = f32(a_lead - self.acceleration)
+    lead.vLead = lead.vLeadK = f32(v_lead)
+    lead.aLeadK = f32(a_lead)
+    lead.aLeadTau = f32(_LEAD_ACCEL_TAU)
+    lead.status = status
+    lead.modelProb = f32(prob_lead)
+
+    np.multiply(self.speed + 0.5, ModelConstants.T_IDXS, out=self.model.position.x, casting='unsafe')
+    self.model.velocity.x[:] = self.speed + 0.5
+    self.model.velocity.x[0] = self.speed
+    self.model.meta.disengagePredictions.gasPressProbs = [f32(prob_throttle)] * 6
+
+    self.car_state.vEgo = f32(self.speed)
+    self.car_state.standstill = self.speed < 0.01
+    self.car_state.vCruise = f32(v_cruise * 3.6)
+    self.sm['carControl'].orientationNED = [0., f32(pitch), 0.]
+    return self.sm
+
+  def build_messages(self, d_rel, v_rel, a_lead, v_lead, status, prob_lead, v_cruise, pitch, prob_throttle):
     radar = messaging.new_message('radarState')
     control = messaging.new_message('controlsState')
     ss = messaging.new_message('selfdriveState')
     car_state = messaging.new_message('carState')
     car_control = messaging.new_message('carControl')
     model = messaging.new_message('modelV2')
-    a_lead = (v_lead - self.v_lead_prev)/self.ts
-    self.v_lead_prev = v_lead
-
-    if self.lead_relevancy:
-      d_rel = np.maximum(0., self.distance_lead - self.distance)
-      v_rel = v_lead - self.speed
-      if self.only_radar:
-        status = True
-      elif prob_lead > .5:
-        status = True
-      else:
-        status = False
-    else:
-      d_rel = 200.
-      v_rel = 0.
-      prob_lead = 0.0
-      status = False
 
     lead = log.RadarState.LeadData.new_message()
     lead.dRel = float(d_rel)
@@ -124,13 +149,31 @@ class Plant:
     car_state.carState.vCruise = float(v_cruise * 3.6)
     car_control.carControl.orientationNED = [0., float(pitch), 0.]
 
-    # ******** get controlsState messages for plotting ***
-    sm = {'radarState': radar.radarState,
-          'carState': car_state.carState,
-          'carControl': car_control.carControl,
-          'controlsState': control.controlsState,
-          'selfdriveState': ss.selfdriveState,
-          'modelV2': model.modelV2}
+    return {'radarState': radar.radarState,
+            'carState': car_state.carState,
+            'carControl': car_control.carControl,
+            'controlsState': control.controlsState,
+            'selfdriveState': ss.selfdriveState,
+            'modelV2': model.modelV2}
+
+  def step(self, v_lead=0.0, prob_lead=1.0, v_cruise=50., pitch=0.0, prob_throttle=1.0):
+    # ******** fake model going straight and fake calibration ********
+    # note that this is worst case for MPC, since model will delay long mpc by one time step
+    a_lead = (v_lead - self.v_lead_prev)/self.ts
+    self.v_lead_prev = v_lead
+
+    if self.lead_relevancy:
+      d_rel = max(0., self.distance_lead - self.distance)
+      v_rel = v_lead - self.speed
+      status = self.only_radar or prob_lead > .5
+    else:
+      d_rel = 200.
+      v_rel = 0.
+      prob_lead = 0.0
+      status = False
+
+    inputs = (d_rel, v_rel, a_lead, v_lead, status, prob_lead, v_cruise, pitch, prob_throttle)
+    sm = self.build_messages(*inputs) if self.trace else self.update_inputs(*inputs)
     self.planner.update(sm)
     self.speed = self.planner.v_desired_filter.x
     self.acceleration = self.planner.a_desired
@@ -139,37 +182,25 @@ class Plant:
     self.distance_lead = self.distance_lead + v_lead * self.ts
 
     # ******** run the car ********
-    #print(self.distance, speed)
     if self.speed <= 0:
       self.speed = 0
       self.acceleration = 0
     self.distance = self.distance + self.speed * self.ts
 
-    # *** radar model ***
-    if self.lead_relevancy:
-      d_rel = np.maximum(0., self.distance_lead - self.distance)
-      v_rel = v_lead - self.speed
-    else:
-      d_rel = 200.
-      v_rel = 0.
-
-    # print at 5hz
-    # if (self.rk.frame % (self.rate // 5)) == 0:
-    #   print("%2.2f sec   %6.2f m  %6.2f m/s  %6.2f m/s2   lead_rel: %6.2f m  %6.2f m/s"
-    #         % (self.current_time, self.distance, self.speed, self.acceleration, d_rel, v_rel))
-
-
-    # ******** update prevs ********
-    self.rk.monitor_time()
+    self.frame += 1
 
-    return {
+    out = {
       "distance": self.distance,
       "speed": self.speed,
       "acceleration": self.acceleration,
       "speeds": self.speeds,
       "distance_lead": self.distance_lead,
       "fcw": fcw,
+      "solve_time": self.planner.mpc.solve_time,
     }
+    if self.trace:
+      out["msgs"] = sm
+    return out
 
 # simple engage in standalone mode
 def plant_thread():
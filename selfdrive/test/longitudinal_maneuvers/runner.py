@@ -0,0 +1,34 @@
+import concurrent.futures
+import os
+
+import numpy as np
+
+from openpilot.selfdrive.test.longitudinal_maneuvers.maneuver import Maneuver, ManeuverResult, solver_stats
+
+
+def run_maneuver(maneuver: Maneuver, trace: bool = False) -> ManeuverResult:
+  return maneuver.run(trace=trace)
+
+
+def summarize(results: list[ManeuverResult]) -> dict:
+  return {
+    'maneuvers': len(results),
+    'failed': [r.title for r in results if not r.valid],
+    'steps': sum(r.steps for r in results),
+    'wall_time': sum(r.wall_time for r in results),
+    'solver': solver_stats(np.concatenate([r.solve_times for r in results]) if results else []),
+  }
+
+
+def run_maneuvers(maneuvers: list[Maneuver], jobs: int | None = None, trace: bool = False) -> tuple[list[ManeuverResult], dict]:
+  """
+  Runs maneuvers in a process pool, each one faster than real time. Returns per maneuver results,
+  in the order given, and a summary with aggregate solver times.
+  """
+  jobs = jobs or os.cpu_count() or 1
+  if jobs == 1 or len(maneuvers) == 1:
+    results = [run_maneuver(m, trace) for m in maneuvers]
+  else:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(maneuvers))) as pool:
+      results = list(pool.map(run_maneuver, maneuvers, [trace] * len(maneuvers)))
+  return results, summarize(results)
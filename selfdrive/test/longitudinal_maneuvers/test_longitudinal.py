@@ -1,8 +1,10 @@
 import itertools
+import numpy as np
 from parameterized import parameterized_class
 
 from openpilot.selfdrive.controls.lib.longitudinal_mpc_lib.long_mpc import STOP_DISTANCE
 from openpilot.selfdrive.test.longitudinal_maneuvers.maneuver import Maneuver
+from openpilot.selfdrive.test.longitudinal_maneuvers.runner import run_maneuvers
 
 
 # TODO: make new FCW tests
@@ -185,8 +187,17 @@ class TestLongitudinalControl:
   force_decel: bool
 
   def test_maneuver(self, subtests):
-    for maneuver in create_maneuvers({"e2e": self.e2e, "force_decel": self.force_decel}):
+    maneuvers = create_maneuvers({"e2e": self.e2e, "force_decel": self.force_decel})
+    results, _ = run_maneuvers(maneuvers)
+    for maneuver, result in zip(maneuvers, results, strict=True):
       with subtests.test(title=maneuver.title, e2e=maneuver.e2e, force_decel=maneuver.force_decel):
-        print(maneuver.title, f'in {"e2e" if maneuver.e2e else "acc"} mode')
-        valid, _ = maneuver.evaluate()
-        assert valid
+        print(maneuver.title, f'in {"e2e" if maneuver.e2e else "acc"} mode', result.failures)
+        assert result.valid, result.failures
+
+
+def test_trace_matches_headless():
+  # the planner has to see the same inputs whether or not messages are built
+  for maneuver in create_maneuvers({"e2e": True, "force_decel": False})[5:7]:
+    headless, traced = maneuver.run(), maneuver.run(trace=True)
+    assert headless.steps == traced.steps
+    np.testing.assert_allclose(headless.logs, traced.logs, rtol=1e-6, atol=1e-6)
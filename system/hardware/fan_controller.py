@@ -2,10 +2,12 @@
 from abc import ABC, abstractmethod
 
 from openpilot.common.realtime import DT_HW
-from openpilot.common.numpy_fast import interp
+from openpilot.common.numpy_fast import Interpolator
 from openpilot.common.swaglog import cloudlog
 from openpilot.common.pid import PIDController
 
+FEEDFORWARD = Interpolator([60.0, 100.0], [0, -100])
+
 class BaseFanController(ABC):
   @abstractmethod
   def update(self, cur_temp: float, ignition: bool) -> int:
@@ -30,7 +32,7 @@ class TiciFanController(BaseFanController):
     error = 70 - cur_temp
     fan_pwr_out = -int(self.controller.update(
                       error=error,
-                      feedforward=interp(cur_temp, [60.0, 100.0], [0, -100])
+                      feedforward=FEEDFORWARD(cur_temp)
                     ))
 
     self.last_ignition = ignition
@@ -22,6 +22,7 @@ from openpilot.system.loggerd.config import get_available_percent
 from openpilot.system.statsd import statlog
 from openpilot.common.swaglog import cloudlog
 from openpilot.system.hardware.power_monitoring import PowerMonitoring
+from openpilot.system.hardware.sysfs import SysfsSampler
 from openpilot.system.hardware.fan_controller import TiciFanController
 from openpilot.system.version import terms_version, training_version
 
@@ -51,38 +52,59 @@ OFFROAD_DANGER_TEMP = 75
 
 prev_offroad_states: dict[str, tuple[bool, str | None]] = {}
 
-tz_by_type: dict[str, int] | None = None
-def populate_tz_by_type():
-  global tz_by_type
-  tz_by_type = {}
-  for n in os.listdir("/sys/devices/virtual/thermal"):
-    if not n.startswith("thermal_zone"):
-      continue
-    with open(os.path.join("/sys/devices/virtual/thermal", n, "type")) as f:
-      tz_by_type[f.read().strip()] = int(n.removeprefix("thermal_zone"))
-
-def read_tz(x):
-  if x is None:
-    return 0
-
-  if isinstance(x, str):
-    if tz_by_type is None:
-      populate_tz_by_type()
-    x = tz_by_type[x]
-
-  try:
-    with open(f"/sys/devices/virtual/thermal/thermal_zone{x}/temp") as f:
-      return int(f.read())
-  except FileNotFoundError:
-    return 0
-
-
-def read_thermal(thermal_config):
+THERMAL_FIELDS = ('cpu', 'gpu', 'mem', 'pmic')
+
+
+class ThermalZones:
+  """The thermal zones of a ThermalConfig, kept open and all read in one pass per update"""
+  def __init__(self, thermal_config, root: str = "/sys"):
+    self.thermal_config = thermal_config
+    thermal_dir = os.path.join(root, "devices/virtual/thermal")
+
+    tz_by_type = {}
+    if any(isinstance(z, str) for f in THERMAL_FIELDS for z in self._zones(f)):
+      for n in os.listdir(thermal_dir):
+        if not n.startswith("thermal_zone"):
+          continue
+        with open(os.path.join(thermal_dir, n, "type")) as f:
+          tz_by_type[f.read().strip()] = int(n.removeprefix("thermal_zone"))
+
+    # zones that are None, or missing, read as 0
+    paths = []
+    self.index = {}
+    for field in THERMAL_FIELDS:
+      self.index[field] = []
+      for z in self._zones(field):
+        z = tz_by_type.get(z) if isinstance(z, str) else z
+        self.index[field].append(None if z is None else len(paths))
+        if z is not None:
+          paths.append(f"devices/virtual/thermal/thermal_zone{z}/temp")
+    self.sampler = SysfsSampler(paths, root=root)
+
+  def _zones(self, field):
+    zones = getattr(self.thermal_config, field)[0]
+    return [zones] if field == 'mem' else list(zones)
+
+  def read(self) -> dict[str, list[float]]:
+    """Temperatures of each field, in degrees C"""
+    temps = self.sampler.sample_ints()
+    out = {}
+    for field in THERMAL_FIELDS:
+      divisor = getattr(self.thermal_config, field)[1]
+      out[field] = [(temps[i] if i is not None else 0) / divisor for i in self.index[field]]
+    return out
+
+  def close(self):
+    self.sampler.close()
+
+
+def read_thermal(thermal_zones):
+  temps = thermal_zones.read()
   dat = messaging.new_message('deviceState', valid=True)
-  dat.deviceState.cpuTempC = [read_tz(z) / thermal_config.cpu[1] for z in thermal_config.cpu[0]]
-  dat.deviceState.gpuTempC = [read_tz(z) / thermal_config.gpu[1] for z in thermal_config.gpu[0]]
-  dat.deviceState.memoryTempC = read_tz(thermal_config.mem[0]) / thermal_config.mem[1]
-  dat.deviceState.pmicTempC = [read_tz(z) / thermal_config.pmic[1] for z in thermal_config.pmic[0]]
+  dat.deviceState.cpuTempC = temps['cpu']
+  dat.deviceState.gpuTempC = temps['gpu']
+  dat.deviceState.memoryTempC = temps['mem'][0]
+  dat.deviceState.pmicTempC = temps['pmic']
   return dat
 
 
@@ -200,7 +222,7 @@ def hardware_thread(end_event, hw_queue) -> None:
   power_monitor = PowerMonitoring()
 
   HARDWARE.initialize_hardware()
-  thermal_config = HARDWARE.get_thermal_config()
+  thermal_zones = ThermalZones(HARDWARE.get_thermal_config())
 
   fan_controller = None
 
@@ -235,7 +257,7 @@ def hardware_thread(end_event, hw_queue) -> None:
     if (sm.frame % round(SERVICE_LIST['pandaStates'].frequency * DT_HW) != 0) and not ign_edge:
       continue
 
-    msg = read_thermal(thermal_config)
+    msg = read_thermal(thermal_zones)
     msg.deviceState.deviceType = HARDWARE.get_device_type()
 
     try:
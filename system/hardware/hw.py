@@ -36,6 +36,17 @@ class Paths:
       return os.environ['COMMA_CACHE'] + "/"
     return DEFAULT_DOWNLOAD_CACHE_ROOT + os.environ.get("OPENPILOT_PREFIX", "") + "/"
 
+  @staticmethod
+  def model_cache_root() -> str:
+    if os.environ.get('MODEL_CACHE', False):
+      return os.environ['MODEL_CACHE']
+    return os.path.join(Paths.comma_home(), "model_cache")
+
+  @staticmethod
+  def loop_stats_root() -> str:
+    shm = "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp"
+    return os.path.join(shm, os.environ.get("OPENPILOT_PREFIX", ""), "loop_stats")
+
   @staticmethod
   def persist_root() -> str:
     if PC:
@@ -0,0 +1,43 @@
+import os
+
+from openpilot.system.hardware.base import ThermalConfig
+from openpilot.system.hardware.sysfs import SysfsSampler
+
+
+def write_node(root, path, value):
+  path = os.path.join(root, path)
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  # in place, like sysfs, so open descriptors see the new value
+  with open(path, 'w') as f:
+    f.write(f"{value}\n")
+
+
+def make_thermal_tree(root, zones):
+  for i, (zone_type, temp) in enumerate(zones.items()):
+    write_node(root, f"devices/virtual/thermal/thermal_zone{i}/type", zone_type)
+    write_node(root, f"devices/virtual/thermal/thermal_zone{i}/temp", temp)
+
+
+class TestSysfsSampler:
+  def test_rereads_open_nodes(self, tmp_path):
+    write_node(tmp_path, "a/value", 1)
+    write_node(tmp_path, "b/value", "not a number")
+    with SysfsSampler(["a/value", "b/value", "missing/value"], root=str(tmp_path)) as s:
+      assert s.sample() == [b"1\n", b"not a number\n", None]
+      assert s.sample_ints(default=-1) == [1, -1, -1]
+
+      write_node(tmp_path, "a/value", 42000)
+      assert s.sample_ints() == [42000, 0, 0]
+    assert s.sample() == [None, None, None]
+
+  def test_thermal_zones(self, tmp_path):
+    from openpilot.system.hardware.hardwared import ThermalZones
+
+    make_thermal_tree(tmp_path, {"cpu0": 40000, "cpu1": 41000, "gpu": 50000, "ddr": 30000, "pmic": 35000})
+    config = ThermalConfig(cpu=(["cpu0", "cpu1", "cpu2"], 1000), gpu=(("gpu", None), 1000), mem=("ddr", 1000), bat=(None, 1), pmic=((4,), 1000))
+    zones = ThermalZones(config, root=str(tmp_path))
+    assert zones.read() == {'cpu': [40., 41., 0.], 'gpu': [50., 0.], 'mem': [30.], 'pmic': [35.]}
+
+    write_node(tmp_path, "devices/virtual/thermal/thermal_zone0/temp", 45000)
+    assert zones.read()['cpu'] == [45., 41., 0.]
+    zones.close()
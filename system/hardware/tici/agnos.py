@@ -3,10 +3,13 @@ import hashlib
 import json
 import lzma
 import os
+import queue
 import struct
 import subprocess
+import threading
 import time
-from collections.abc import Generator
+from collections.abc import Callable, Generator
+from functools import partial
 
 import requests
 
@@ -17,21 +20,65 @@ CAIBX_URL = "https://commadist.azureedge.net/agnosupdate/"
 
 AGNOS_MANIFEST_FILE = "system/hardware/tici/agnos.json"
 
+# largest piece of an image in memory at once, the largest observed raw sparse chunk is 252 MB
+CHUNK_SIZE = 4 * 1024 * 1024
+# chunks waiting for a hash thread, bounds the memory when hashing falls behind
+HASH_QUEUE_SIZE = 8
 
-class StreamingDecompressor:
-  def __init__(self, url: str) -> None:
-    self.buf = b""
 
-    self.req = requests.get(url, stream=True, headers={'Accept-Encoding': None}, timeout=60)
-    self.it = self.req.iter_content(chunk_size=1024 * 1024)
+class HashThread:
+  """A hashlib hash updated on a worker thread, hashlib releases the GIL so hashing overlaps with writing"""
+  def __init__(self, name: str = "sha256") -> None:
+    self.hash = hashlib.new(name)
+    self.queue: queue.Queue[bytes | None] = queue.Queue(HASH_QUEUE_SIZE)
+    self.thread = threading.Thread(target=self._run, daemon=True)
+    self.thread.start()
+
+  def _run(self) -> None:
+    while (data := self.queue.get()) is not None:
+      self.hash.update(data)
+
+  def update(self, data: bytes) -> None:
+    self.queue.put(data)
+
+  def close(self) -> None:
+    if self.thread.is_alive():
+      self.queue.put(None)
+      self.thread.join()
+
+  def hexdigest(self) -> str:
+    self.close()
+    return self.hash.hexdigest()
+
+
+class StreamingDecompressor:
+  def __init__(self, url: str, sha256: HashThread | None = None) -> None:
+    self.buf = bytearray()
+
+    # a local image for testing, or a download
+    if os.path.isfile(url):
+      self.req = None
+      self.file = open(url, 'rb')
+      self.it = iter(partial(self.file.read, 1024 * 1024), b'')
+    else:
+      self.file = None
+      self.req = requests.get(url, stream=True, headers={'Accept-Encoding': None}, timeout=60)
+      self.it = self.req.iter_content(chunk_size=1024 * 1024)
     self.decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_AUTO)
     self.eof = False
-    self.sha256 = hashlib.sha256()
+    self.sha256 = sha256 if sha256 is not None else hashlib.sha256()
+
+  def close(self) -> None:
+    if isinstance(self.sha256, HashThread):
+      self.sha256.close()
+    if self.file is not None:
+      self.file.close()
 
   def read(self, length: int) -> bytes:
     while len(self.buf) < length and not self.eof:
       if self.decompressor.needs_input:
-        self.req.raise_for_status()
+        if self.req is not None:
+          self.req.raise_for_status()
 
         try:
           compressed = next(self.it)
@@ -41,20 +88,22 @@ class StreamingDecompressor:
       else:
         compressed = b''
 
-      self.buf += self.decompressor.decompress(compressed, max_length=length)
+      self.buf += self.decompressor.decompress(compressed, max_length=length - len(self.buf))
 
       if self.decompressor.eof:
         self.eof = True
         break
 
-    result = self.buf[:length]
-    self.buf = self.buf[length:]
+    # appending to and deleting from the front of a bytearray are amortized O(1), only the result is copied
+    with memoryview(self.buf) as buf:
+      result = bytes(buf[:length])
+    del self.buf[:length]
 
     self.sha256.update(result)
     return result
 
 
-def unsparsify(f: StreamingDecompressor) -> Generator[bytes, None, None]:
+def unsparsify(f: StreamingDecompressor, chunk_size: int = CHUNK_SIZE) -> Generator[bytes, None, None]:
   # https://source.android.com/devices/bootloader/images#sparse-format
   magic = struct.unpack("I", f.read(4))[0]
   assert(magic == 0xed26ff3a)
@@ -76,12 +125,18 @@ def unsparsify(f: StreamingDecompressor) -> Generator[bytes, None, None]:
     chunk_type, out_blocks = SPARSE_CHUNK_FMT.unpack(f.read(12))
 
     if chunk_type == 0xcac1:  # Raw
-      # TODO: yield in smaller chunks. Yielding only block_sz is too slow. Largest observed data chunk is 252 MB.
-      yield f.read(out_blocks * block_sz)
+      remaining = out_blocks * block_sz
+      while remaining > 0:
+        chunk = f.read(min(chunk_size, remaining))
+        if not len(chunk):
+          raise Exception("Truncated sparse image")
+        remaining -= len(chunk)
+        yield chunk
     elif chunk_type == 0xcac2:  # Fill
-      filler = f.read(4) * (block_sz // 4)
-      for _ in range(out_blocks):
-        yield filler
+      fill_blocks = max(1, chunk_size // block_sz)
+      filler = f.read(4) * (block_sz // 4 * min(fill_blocks, out_blocks))
+      for i in range(0, out_blocks, fill_blocks):
+        yield filler if out_blocks - i >= fill_blocks else filler[:(out_blocks - i) * block_sz]
     elif chunk_type == 0xcac3:  # Don't care
       yield b""
     else:
@@ -89,11 +144,29 @@ def unsparsify(f: StreamingDecompressor) -> Generator[bytes, None, None]:
 
 
 # noop wrapper with same API as unsparsify() for non sparse images
-def noop(f: StreamingDecompressor) -> Generator[bytes, None, None]:
-  while len(chunk := f.read(1024 * 1024)) > 0:
+def noop(f: StreamingDecompressor, chunk_size: int = CHUNK_SIZE) -> Generator[bytes, None, None]:
+  while len(chunk := f.read(chunk_size)) > 0:
     yield chunk
 
 
+def write_image(f: StreamingDecompressor, out, sparse: bool, progress: Callable[[int], None] | None = None, hash_thread: bool = True) -> str:
+  """
+  Decompresses, unsparsifies, writes and hashes an image in one pass, at most CHUNK_SIZE at a time.
+  Returns the raw hash of what was written, computed on a worker thread while writing with hash_thread.
+  """
+  raw_hash = HashThread() if hash_thread else hashlib.sha256()
+  try:
+    for chunk in (unsparsify if sparse else noop)(f):
+      raw_hash.update(chunk)
+      out.write(chunk)
+      if progress is not None:
+        progress(out.tell())
+    return raw_hash.hexdigest().lower()
+  finally:
+    if isinstance(raw_hash, HashThread):
+      raw_hash.close()
+
+
 def get_target_slot_number() -> int:
   current_slot = subprocess.check_output(["abctl", "--boot_slot"], encoding='utf-8').strip()
   return 1 if current_slot == "_a" else 0
@@ -158,33 +231,39 @@ def clear_partition_hash(target_slot_number: int, partition: dict) -> None:
     os.sync()
 
 
-def extract_compressed_image(target_slot_number: int, partition: dict, cloudlog):
+def partition_progress(partition: dict) -> Callable[[int], None]:
+  last_p = 0
+
+  def progress(cur):
+    nonlocal last_p
+    p = int(cur / partition['size'] * 100)
+    if p != last_p:
+      last_p = p
+      print(f"Installing {partition['name']}: {p}", flush=True)
+  return progress
+
+
+def extract_compressed_image(target_slot_number: int, partition: dict, cloudlog, hash_thread: bool = True):
   path = get_partition_path(target_slot_number, partition)
-  downloader = StreamingDecompressor(partition['url'])
+  downloader = StreamingDecompressor(partition['url'], HashThread() if hash_thread else None)
 
-  with open(path, 'wb+') as out:
-    # Flash partition
-    last_p = 0
-    raw_hash = hashlib.sha256()
-    f = unsparsify if partition['sparse'] else noop
-    for chunk in f(downloader):
-      raw_hash.update(chunk)
-      out.write(chunk)
-      p = int(out.tell() / partition['size'] * 100)
-      if p != last_p:
-        last_p = p
-        print(f"Installing {partition['name']}: {p}", flush=True)
+  try:
+    with open(path, 'wb+') as out:
+      # Flash partition, verifying the hashes of what was written without reading it back
+      raw_hash = write_image(downloader, out, partition['sparse'], partition_progress(partition), hash_thread)
 
-    if raw_hash.hexdigest().lower() != partition['hash_raw'].lower():
-      raise Exception(f"Raw hash mismatch '{raw_hash.hexdigest().lower()}'")
+      if raw_hash != partition['hash_raw'].lower():
+        raise Exception(f"Raw hash mismatch '{raw_hash}'")
 
-    if downloader.sha256.hexdigest().lower() != partition['hash'].lower():
-      raise Exception("Uncompressed hash mismatch")
+      if downloader.sha256.hexdigest().lower() != partition['hash'].lower():
+        raise Exception("Uncompressed hash mismatch")
 
-    if out.tell() != partition['size']:
-      raise Exception("Uncompressed size mismatch")
+      if out.tell() != partition['size']:
+        raise Exception("Uncompressed size mismatch")
 
-    os.sync()
+      os.sync()
+  finally:
+    downloader.close()
 
 
 def extract_casync_image(target_slot_number: int, partition: dict, cloudlog):
@@ -214,21 +293,21 @@ def extract_casync_image(target_slot_number: int, partition: dict, cloudlog):
   # Finally we add the remote source to download any missing chunks
   sources += [('remote', casync.RemoteChunkReader(partition['casync_store']), casync.build_chunk_dict(target))]
 
-  last_p = 0
-
-  def progress(cur):
-    nonlocal last_p
-    p = int(cur / partition['size'] * 100)
-    if p != last_p:
-      last_p = p
-      print(f"Installing {partition['name']}: {p}", flush=True)
-
-  stats = casync.extract(target, sources, path, progress)
-  cloudlog.error(f'casync done {json.dumps(stats)}')
-
-  os.sync()
-  if not verify_partition(target_slot_number, partition, force_full_check=True):
-    raise Exception(f"Raw hash mismatch '{partition['hash_raw'].lower()}'")
+  # casync writes the target chunks in order, so the raw hash is computed while extracting instead of reading the partition back
+  target_hash = HashThread()
+  try:
+    stats = casync.extract(target, sources, path, partition_progress(partition), target_hash.update)
+    cloudlog.error(f'casync done {json.dumps(stats)}')
+    os.sync()
+    hash_raw = target_hash.hexdigest().lower()
+  finally:
+    target_hash.close()
+
+  if sum(c.length for c in target) != partition['size']:
+    if not verify_partition(target_slot_number, partition, force_full_check=True):
+      raise Exception(f"Raw hash mismatch '{partition['hash_raw'].lower()}'")
+  elif hash_raw != partition['hash_raw'].lower():
+    raise Exception(f"Raw hash mismatch '{hash_raw}'")
 
 
 def flash_partition(target_slot_number: int, partition: dict, cloudlog, standalone=False):
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from openpilot.system.hardware.tici import agnos
+from openpilot.system.hardware.tici.tests.test_agnos_updater import BLOCK_SZ, make_sparse_image, write_xz
+
+# a raw chunk as large as the largest observed one, between fills
+RAW_MB = int(os.getenv("RAW_MB", "252"))
+FILL_MB = int(os.getenv("FILL_MB", "512"))
+
+
+class LegacyDecompressor(agnos.StreamingDecompressor):
+  # what read did before, growing and slicing bytes
+  def read(self, length):
+    buf = bytes(self.buf)
+    while len(buf) < length and not self.eof:
+      if self.decompressor.needs_input:
+        try:
+          compressed = next(self.it)
+        except StopIteration:
+          self.eof = True
+          break
+      else:
+        compressed = b''
+      buf += self.decompressor.decompress(compressed, max_length=length)
+      if self.decompressor.eof:
+        self.eof = True
+        break
+    result, self.buf = buf[:length], bytearray(buf[length:])
+    self.sha256.update(result)
+    return result
+
+
+def legacy_unsparsify(f):
+  # what unsparsify did before, a raw chunk in one piece and a fill block at a time
+  f.read(12)
+  block_sz, _, num_chunks, _ = struct.unpack("IIII", f.read(16))
+  for _ in range(num_chunks):
+    chunk_type, out_blocks = agnos.SPARSE_CHUNK_FMT.unpack(f.read(12))
+    if chunk_type == 0xcac1:
+      yield f.read(out_blocks * block_sz)
+    elif chunk_type == 0xcac2:
+      filler = f.read(4) * (block_sz // 4)
+      for _ in range(out_blocks):
+        yield filler
+
+
+def run(mode, fn, out_fn):
+  st = time.monotonic()
+  with open(out_fn, "wb") as out:
+    if mode == "legacy":
+      f = LegacyDecompressor(fn)
+      raw_hash = hashlib.sha256()
+      for chunk in legacy_unsparsify(f):
+        raw_hash.update(chunk)
+        out.write(chunk)
+      raw_hash = raw_hash.hexdigest()
+    else:
+      hash_thread = mode == "hash thread"
+      f = agnos.StreamingDecompressor(fn, agnos.HashThread() if hash_thread else None)
+      raw_hash = agnos.write_image(f, out, True, hash_thread=hash_thread)
+    f.sha256.hexdigest()
+    f.close()
+    size = out.tell()
+  dt = time.monotonic() - st
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+  print(f"{mode:12} {size / 1e6 / dt:8.1f} MB/s, peak RSS {peak:7.1f} MB, raw hash {raw_hash[:16]}")
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 3:
+    run(sys.argv[1], sys.argv[2], sys.argv[3])
+    sys.exit(0)
+
+  blocks_per_mb = 1024 * 1024 // BLOCK_SZ
+  with tempfile.TemporaryDirectory() as tmp:
+    sparse_dat, raw = make_sparse_image([(0xcac2, FILL_MB * blocks_per_mb // 2), (0xcac1, RAW_MB * blocks_per_mb), (0xcac2, FILL_MB * blocks_per_mb // 2)])
+    fn = write_xz(os.path.join(tmp, "img.xz"), sparse_dat)
+    print(f"{len(raw) / 1e6:.0f} MB image, {len(sparse_dat) / 1e6:.0f} MB sparse, {os.path.getsize(fn) / 1e6:.0f} MB compressed")
+    del sparse_dat, raw
+    # a fresh process per mode, so the peak memory is its own
+    for mode in ("legacy", "stream", "hash thread"):
+      subprocess.check_call([sys.executable, __file__, mode, fn, os.path.join(tmp, "out")])
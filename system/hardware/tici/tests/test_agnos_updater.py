@@ -1,9 +1,40 @@
+import hashlib
 import json
+import lzma
 import os
+import random
+import struct
 import requests
 
+import pytest
+
+from openpilot.system.hardware.tici import agnos
+
 TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
 MANIFEST = os.path.join(TEST_DIR, "../agnos.json")
+BLOCK_SZ = 4096
+
+
+def make_sparse_image(chunks):
+  """An android sparse image of (chunk type, blocks) and its unsparsified contents"""
+  body, raw = b"", b""
+  for i, (chunk_type, blocks) in enumerate(chunks):
+    if chunk_type == 0xcac1:
+      dat = random.Random(i).randbytes(blocks * BLOCK_SZ)
+      body += struct.pack("<HHII", chunk_type, 0, blocks, 12 + len(dat)) + dat
+      raw += dat
+    elif chunk_type == 0xcac2:
+      fill = struct.pack("<I", 0x01020300 + i)
+      body += struct.pack("<HHII", chunk_type, 0, blocks, 16) + fill
+      raw += fill * (blocks * BLOCK_SZ // 4)
+  header = struct.pack("<IHHHHIIII", 0xed26ff3a, 1, 0, 28, 12, BLOCK_SZ, len(raw) // BLOCK_SZ, len(chunks), 0)
+  return header + body, raw
+
+
+def write_xz(path, dat):
+  with open(path, "wb") as f:
+    f.write(lzma.compress(dat, preset=0))
+  return str(path)
 
 
 class TestAgnosUpdater:
@@ -18,3 +49,39 @@ class TestAgnosUpdater:
       assert r.headers['Content-Type'] == "application/x-xz"
       if not img['sparse']:
         assert img['hash'] == img['hash_raw']
+
+  @pytest.mark.parametrize("hash_thread", [True, False])
+  @pytest.mark.parametrize("sparse", [True, False])
+  def test_write_image(self, tmp_path, sparse, hash_thread):
+    sparse_dat, raw = make_sparse_image([(0xcac1, 700), (0xcac2, 3000), (0xcac1, 3), (0xcac2, 1)])
+    image = sparse_dat if sparse else raw
+    f = agnos.StreamingDecompressor(write_xz(tmp_path / "img.xz", image), agnos.HashThread() if hash_thread else None)
+    try:
+      with open(tmp_path / "out", "wb") as out:
+        raw_hash = agnos.write_image(f, out, sparse, hash_thread=hash_thread)
+      assert f.sha256.hexdigest() == hashlib.sha256(image).hexdigest()
+    finally:
+      f.close()
+    assert raw_hash == hashlib.sha256(raw).hexdigest()
+    with open(tmp_path / "out", "rb") as out:
+      assert out.read() == raw
+
+  def test_unsparsify_bounded_chunks(self, tmp_path):
+    sparse_dat, raw = make_sparse_image([(0xcac1, 1000), (0xcac2, 5000), (0xcac1, 1)])
+    f = agnos.StreamingDecompressor(write_xz(tmp_path / "img.xz", sparse_dat))
+    chunks = list(agnos.unsparsify(f, chunk_size=64 * BLOCK_SZ))
+    assert max(len(c) for c in chunks) == 64 * BLOCK_SZ
+    assert b"".join(chunks) == raw
+
+  def test_extract_compressed_image(self, tmp_path, mocker):
+    sparse_dat, raw = make_sparse_image([(0xcac1, 300), (0xcac2, 200)])
+    partition = {'name': 'test', 'url': write_xz(tmp_path / "img.xz", sparse_dat), 'sparse': True, 'size': len(raw),
+                 'hash': hashlib.sha256(sparse_dat).hexdigest(), 'hash_raw': hashlib.sha256(raw).hexdigest(), 'full_check': True}
+    mocker.patch("openpilot.system.hardware.tici.agnos.get_partition_path", return_value=str(tmp_path / "partition"))
+    mocker.patch("os.sync")
+
+    agnos.extract_compressed_image(0, partition, None)
+    assert agnos.verify_partition(0, partition)
+
+    with pytest.raises(Exception, match="Raw hash mismatch"):
+      agnos.extract_compressed_image(0, {**partition, 'hash_raw': '0' * 64}, None)
@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 import os
-import shutil
 import threading
+import time
 from openpilot.system.hardware.hw import Paths
 from openpilot.common.swaglog import cloudlog
-from openpilot.system.loggerd.config import get_available_bytes, get_available_percent
 from openpilot.system.loggerd.uploader import listdir_by_creation
 from openpilot.system.loggerd.xattr_cache import getxattr
 
@@ -17,14 +16,20 @@ PRESERVE_ATTR_NAME = 'user.preserve'
 PRESERVE_ATTR_VALUE = b'1'
 PRESERVE_COUNT = 5
 
+# deletes are throttled to this, so reclaiming doesn't starve loggerd of disk I/O
+DELETE_RATE = 256 * 1024 * 1024  # bytes per second
+# free space is a single statvfs, the index is only rebuilt when the log root changes or gets this old
+CHECK_INTERVAL = 5.
+INDEX_MAX_AGE = 30.
 
-def has_preserve_xattr(d: str) -> bool:
-  return getxattr(os.path.join(Paths.log_root(), d), PRESERVE_ATTR_NAME) == PRESERVE_ATTR_VALUE
 
+def has_preserve_xattr(d: str, root: str | None = None) -> bool:
+  return getxattr(os.path.join(root or Paths.log_root(), d), PRESERVE_ATTR_NAME) == PRESERVE_ATTR_VALUE
 
-def get_preserved_segments(dirs_by_creation: list[str]) -> list[str]:
+
+def get_preserved_segments(dirs_by_creation: list[str], root: str | None = None) -> list[str]:
   preserved = []
-  for n, d in enumerate(filter(has_preserve_xattr, reversed(dirs_by_creation))):
+  for n, d in enumerate(d for d in reversed(dirs_by_creation) if has_preserve_xattr(d, root)):
     if n == PRESERVE_COUNT:
       break
     date_str, _, seg_str = d.rpartition("--")
@@ -44,36 +49,114 @@ def get_preserved_segments(dirs_by_creation: list[str]) -> list[str]:
   return preserved
 
 
-def deleter_thread(exit_event):
+def get_deficit(root: str) -> int:
+  """Bytes to free until both MIN_BYTES and MIN_PERCENT are available"""
+  try:
+    st = os.statvfs(root)
+  except OSError:
+    return 0
+  available = st.f_bavail * st.f_frsize
+  return int(max(MIN_BYTES - available, MIN_PERCENT / 100. * st.f_blocks * st.f_frsize - available, 0))
+
+
+class Deleter:
+  """
+  Keeps the segments of the log root in deletion order, and frees space in batches sized to the
+  current deficit. The index is rebuilt when the log root changes, locks are checked right before
+  deleting. Files are unlinked one by one, throttled to rate bytes per second.
+  """
+  def __init__(self, root: str | None = None, rate: float | None = DELETE_RATE):
+    self.root = root or Paths.log_root()
+    self.rate = rate
+    self.index: list[str] = []
+    self.index_key = None
+    self.index_time = 0.
+    self.freed = 0
+    self.budget_start = 0.
+    self.budget_bytes = 0
+
+  def refresh(self, force: bool = False) -> None:
+    try:
+      # the link count changes with every segment directory, even within one mtime tick
+      st = os.stat(self.root)
+      key = (st.st_mtime_ns, st.st_nlink)
+    except OSError:
+      key = None
+    if not force and key == self.index_key and time.monotonic() - self.index_time < INDEX_MAX_AGE:
+      return
+
+    dirs = listdir_by_creation(self.root)
+    # skip deleting most recent N preserved segments (and their prior segment)
+    preserved = set(get_preserved_segments(dirs, self.root))
+    self.index = sorted(dirs, key=lambda d: (d in DELETE_LAST, d in preserved))
+    self.index_key = key
+    self.index_time = time.monotonic()
+
+  def _throttle(self, nbytes: int, exit_event: threading.Event) -> None:
+    self.budget_bytes += nbytes
+    if self.rate:
+      ahead = self.budget_bytes / self.rate - (time.monotonic() - self.budget_start)
+      if ahead > 0:
+        exit_event.wait(ahead)
+
+  def delete(self, d: str, exit_event: threading.Event) -> int | None:
+    """Deletes one directory of the log root, returns the bytes freed or None if it's locked"""
+    delete_path = os.path.join(self.root, d)
+    if os.path.isdir(delete_path) and any(name.endswith(".lock") for name in os.listdir(delete_path)):
+      return None
+
+    cloudlog.info(f"deleting {delete_path}")
+    freed = 0
+    if os.path.isfile(delete_path):
+      freed = os.stat(delete_path).st_blocks * 512
+      os.remove(delete_path)
+      self._throttle(freed, exit_event)
+      return freed
+
+    for dirpath, dirnames, filenames in os.walk(delete_path, topdown=False):
+      for fn in filenames:
+        path = os.path.join(dirpath, fn)
+        size = os.lstat(path).st_blocks * 512
+        os.remove(path)
+        freed += size
+        self._throttle(size, exit_event)
+      for dn in dirnames:
+        os.rmdir(os.path.join(dirpath, dn))
+    os.rmdir(delete_path)
+    return freed
+
+  def reclaim(self, deficit: int, exit_event: threading.Event) -> int:
+    """Deletes segments in order until deficit bytes are freed, returns the bytes freed"""
+    self.refresh()
+    self.budget_start, self.budget_bytes = time.monotonic(), 0
+    freed = 0
+    for d in list(self.index):
+      if freed >= deficit or exit_event.is_set():
+        break
+      try:
+        n = self.delete(d, exit_event)
+      except OSError:
+        cloudlog.exception(f"issue deleting {os.path.join(self.root, d)}")
+        # partially deleted or gone, look again next time
+        self.index_key = None
+        continue
+      if n is not None:
+        freed += n
+        self.index.remove(d)
+    self.freed += freed
+    return freed
+
+
+def deleter_thread(exit_event, rate: float | None = DELETE_RATE):
+  deleter = Deleter(rate=rate)
   while not exit_event.is_set():
-    out_of_bytes = get_available_bytes(default=MIN_BYTES + 1) < MIN_BYTES
-    out_of_percent = get_available_percent(default=MIN_PERCENT + 1) < MIN_PERCENT
-
-    if out_of_percent or out_of_bytes:
-      dirs = listdir_by_creation(Paths.log_root())
-
-      # skip deleting most recent N preserved segments (and their prior segment)
-      preserved_dirs = get_preserved_segments(dirs)
-
-      # remove the earliest directory we can
-      for delete_dir in sorted(dirs, key=lambda d: (d in DELETE_LAST, d in preserved_dirs)):
-        delete_path = os.path.join(Paths.log_root(), delete_dir)
-
-        if any(name.endswith(".lock") for name in os.listdir(delete_path)):
-          continue
-
-        try:
-          cloudlog.info(f"deleting {delete_path}")
-          if os.path.isfile(delete_path):
-            os.remove(delete_path)
-          else:
-            shutil.rmtree(delete_path)
-          break
-        except OSError:
-          cloudlog.exception(f"issue deleting {delete_path}")
-      exit_event.wait(.1)
+    deficit = get_deficit(deleter.root)
+    if deficit > 0:
+      # nothing deletable, wait for locks to be released
+      if deleter.reclaim(deficit, exit_event) == 0:
+        exit_event.wait(.1)
     else:
-      exit_event.wait(30)
+      exit_event.wait(CHECK_INTERVAL)
 
 
 def main():
@@ -5,7 +5,8 @@ from pathlib import Path
 from collections.abc import Sequence
 
 import openpilot.system.loggerd.deleter as deleter
-from openpilot.common.timeout import Timeout, TimeoutException
+from openpilot.common.timeout import Timeout
+from openpilot.system.hardware.hw import Paths
 from openpilot.system.loggerd.tests.loggerd_tests_common import UploaderTestCase
 
 Stats = namedtuple("Stats", ['f_bavail', 'f_blocks', 'f_frsize'])
@@ -43,36 +44,25 @@ class TestDeleter(UploaderTestCase):
     finally:
       self.join_thread()
 
-  def assertDeleteOrder(self, f_paths: Sequence[Path], timeout: int = 5) -> None:
-    deleted_order = []
+  def assertReclaimOrder(self, f_paths: Sequence[Path]) -> None:
+    d = deleter.Deleter(rate=None)
+    d.refresh()
+    assert d.index == [f.parent.name for f in f_paths]
 
-    self.start_thread()
-    try:
-      with Timeout(timeout, "Timeout waiting for files to be deleted"):
-        while True:
-          for f in f_paths:
-            if not f.exists() and f not in deleted_order:
-              deleted_order.append(f)
-          if len(deleted_order) == len(f_paths):
-            break
-          time.sleep(0.01)
-    except TimeoutException:
-      print("Not deleted:", [f for f in f_paths if f not in deleted_order])
-      raise
-    finally:
-      self.join_thread()
-
-    assert deleted_order == f_paths, "Files not deleted in expected order"
+    # a deficit smaller than any segment deletes exactly one, the next in order
+    for i in range(len(f_paths)):
+      assert d.reclaim(1, threading.Event()) > 0
+      assert [f.exists() for f in f_paths] == [False] * (i + 1) + [True] * (len(f_paths) - i - 1), "Files not deleted in expected order"
 
   def test_delete_order(self):
-    self.assertDeleteOrder([
+    self.assertReclaimOrder([
       self.make_file_with_data(self.seg_format.format(0), self.f_type),
       self.make_file_with_data(self.seg_format.format(1), self.f_type),
       self.make_file_with_data(self.seg_format2.format(0), self.f_type),
     ])
 
   def test_delete_many_preserved(self):
-    self.assertDeleteOrder([
+    self.assertReclaimOrder([
       self.make_file_with_data(self.seg_format.format(0), self.f_type),
       self.make_file_with_data(self.seg_format.format(1), self.f_type, preserve_xattr=deleter.PRESERVE_ATTR_VALUE),
       self.make_file_with_data(self.seg_format.format(2), self.f_type),
@@ -82,7 +72,7 @@ class TestDeleter(UploaderTestCase):
     ])
 
   def test_delete_last(self):
-    self.assertDeleteOrder([
+    self.assertReclaimOrder([
       self.make_file_with_data(self.seg_format.format(1), self.f_type),
       self.make_file_with_data(self.seg_format2.format(0), self.f_type),
       self.make_file_with_data(self.seg_format.format(0), self.f_type, preserve_xattr=deleter.PRESERVE_ATTR_VALUE),
@@ -115,3 +105,43 @@ class TestDeleter(UploaderTestCase):
     self.join_thread()
 
     assert f_path.exists(), "File deleted when locked"
+
+  def test_batch_sized_to_deficit(self):
+    f_paths = [self.make_file_with_data(self.seg_format.format(i), self.f_type, size_mb=1) for i in range(6)]
+    d = deleter.Deleter(rate=None)
+    freed = d.reclaim(int(2.5 * 1024 * 1024), threading.Event())
+
+    # whole segments, oldest first, until the deficit is covered
+    assert [f.exists() for f in f_paths] == [False] * 3 + [True] * 3
+    assert freed >= 2.5 * 1024 * 1024
+    assert d.index == [self.seg_format.format(i) for i in range(3, 6)]
+
+  def test_deficit(self):
+    block_size = 4096
+    self.fake_stats = Stats(f_bavail=deleter.MIN_BYTES // block_size - 10, f_blocks=deleter.MIN_BYTES // block_size, f_frsize=block_size)
+    assert deleter.get_deficit(Paths.log_root()) == 10 * block_size
+
+    # 10% of a big disk is more than MIN_BYTES
+    total_blocks = 100 * deleter.MIN_BYTES // block_size
+    self.fake_stats = Stats(f_bavail=total_blocks // 20, f_blocks=total_blocks, f_frsize=block_size)
+    assert deleter.get_deficit(Paths.log_root()) == (total_blocks // 10 - total_blocks // 20) * block_size
+
+  def test_rate_limit(self):
+    for i in range(4):
+      self.make_file_with_data(self.seg_format.format(i), self.f_type, size_mb=1)
+    rate = 8 * 1024 * 1024
+    d = deleter.Deleter(rate=rate)
+    st = time.monotonic()
+    freed = d.reclaim(deleter.MIN_BYTES, threading.Event())
+    assert freed >= 4 * 1024 * 1024
+    assert time.monotonic() - st >= 0.9 * freed / rate
+
+  def test_index_follows_log_root(self):
+    self.make_file_with_data(self.seg_format.format(0), self.f_type)
+    d = deleter.Deleter(rate=None)
+    d.refresh()
+    assert d.index == [self.seg_format.format(0)]
+
+    self.make_file_with_data(self.seg_format.format(1), self.f_type)
+    d.refresh()
+    assert d.index == [self.seg_format.format(0), self.seg_format.format(1)]
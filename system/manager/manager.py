@@ -9,6 +9,7 @@ from cereal import log
 import cereal.messaging as messaging
 import openpilot.system.sentry as sentry
 from openpilot.common.params import Params, ParamKeyType
+from openpilot.common.params_cache import ParamsCache
 from openpilot.common.text_window import TextWindow
 from openpilot.system.hardware import HARDWARE
 from openpilot.system.manager.helpers import unblock_stdout, write_onroad_params, save_bootlog
@@ -116,61 +117,65 @@ def manager_thread() -> None:
   cloudlog.info("manager start")
   cloudlog.info({"environ": os.environ})
 
-  params = Params()
+  # reads in the loop are served from memory, invalidated on change
+  params = ParamsCache()
 
-  ignore: list[str] = []
-  if params.get("DongleId", encoding='utf8') in (None, UNREGISTERED_DONGLE_ID):
-    ignore += ["manage_athenad", "uploader"]
-  if os.getenv("NOBOARD") is not None:
-    ignore.append("pandad")
-  ignore += [x for x in os.getenv("BLOCK", "").split(",") if len(x) > 0]
+  try:
+    ignore: list[str] = []
+    if params.get("DongleId", encoding='utf8') in (None, UNREGISTERED_DONGLE_ID):
+      ignore += ["manage_athenad", "uploader"]
+    if os.getenv("NOBOARD") is not None:
+      ignore.append("pandad")
+    ignore += [x for x in os.getenv("BLOCK", "").split(",") if len(x) > 0]
 
-  sm = messaging.SubMaster(['deviceState', 'carParams'], poll='deviceState')
-  pm = messaging.PubMaster(['managerState'])
+    sm = messaging.SubMaster(['deviceState', 'carParams'], poll='deviceState')
+    pm = messaging.PubMaster(['managerState'])
 
-  write_onroad_params(False, params)
-  ensure_running(managed_processes.values(), False, params=params, CP=sm['carParams'], not_run=ignore)
+    write_onroad_params(False, params)
+    ensure_running(managed_processes.values(), False, params=params, CP=sm['carParams'], not_run=ignore)
 
-  started_prev = False
+    started_prev = False
 
-  while True:
-    sm.update(1000)
+    while True:
+      sm.update(1000)
 
-    started = sm['deviceState'].started
+      started = sm['deviceState'].started
 
-    if started and not started_prev:
-      params.clear_all(ParamKeyType.CLEAR_ON_ONROAD_TRANSITION)
-    elif not started and started_prev:
-      params.clear_all(ParamKeyType.CLEAR_ON_OFFROAD_TRANSITION)
+      if started and not started_prev:
+        params.clear_all(ParamKeyType.CLEAR_ON_ONROAD_TRANSITION)
+      elif not started and started_prev:
+        params.clear_all(ParamKeyType.CLEAR_ON_OFFROAD_TRANSITION)
 
-    # update onroad params, which drives pandad's safety setter thread
-    if started != started_prev:
-      write_onroad_params(started, params)
+      # update onroad params, which drives pandad's safety setter thread
+      if started != started_prev:
+        write_onroad_params(started, params)
 
-    started_prev = started
+      started_prev = started
 
-    ensure_running(managed_processes.values(), started, params=params, CP=sm['carParams'], not_run=ignore)
+      ensure_running(managed_processes.values(), started, params=params, CP=sm['carParams'], not_run=ignore)
 
-    running = ' '.join("{}{}\u001b[0m".format("\u001b[32m" if p.proc.is_alive() else "\u001b[31m", p.name)
-                       for p in managed_processes.values() if p.proc)
-    print(running)
-    cloudlog.debug(running)
+      running = ' '.join("{}{}\u001b[0m".format("\u001b[32m" if p.proc.is_alive() else "\u001b[31m", p.name)
+                         for p in managed_processes.values() if p.proc)
+      print(running)
+      cloudlog.debug(running)
 
-    # send managerState
-    msg = messaging.new_message('managerState', valid=True)
-    msg.managerState.processes = [p.get_process_state_msg() for p in managed_processes.values()]
-    pm.send('managerState', msg)
+      # send managerState
+      msg = messaging.new_message('managerState', valid=True)
+      msg.managerState.processes = [p.get_process_state_msg() for p in managed_processes.values()]
+      pm.send('managerState', msg)
 
-    # Exit main loop when uninstall/shutdown/reboot is needed
-    shutdown = False
-    for param in ("DoUninstall", "DoShutdown", "DoReboot"):
-      if params.get_bool(param):
-        shutdown = True
-        params.put("LastManagerExitReason", f"{param} {datetime.datetime.now()}")
-        cloudlog.warning(f"Shutting down manager - {param} set")
+      # Exit main loop when uninstall/shutdown/reboot is needed
+      shutdown = False
+      for param in ("DoUninstall", "DoShutdown", "DoReboot"):
+        if params.get_bool(param):
+          shutdown = True
+          params.put("LastManagerExitReason", f"{param} {datetime.datetime.now()}")
+          cloudlog.warning(f"Shutting down manager - {param} set")
 
-    if shutdown:
-      break
+      if shutdown:
+        break
+  finally:
+    params.close()
 
 
 def main() -> None:
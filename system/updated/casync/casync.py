@@ -168,7 +168,9 @@ def build_chunk_dict(chunks: list[Chunk]) -> ChunkDict:
 def extract(target: list[Chunk],
             sources: list[tuple[str, ChunkReader, ChunkDict]],
             out_path: str,
-            progress: Callable[[int], None] = None):
+            progress: Callable[[int], None] = None,
+            on_write: Callable[[bytes], None] = None):
+  """on_write gets the bytes of every chunk after writing them, in target order"""
   stats: dict[str, int] = defaultdict(int)
 
   mode = 'rb+' if os.path.exists(out_path) else 'wb'
@@ -191,6 +193,8 @@ def extract(target: list[Chunk],
           # Write to output
           out.seek(cur_chunk.offset)
           out.write(bts)
+          if on_write is not None:
+            on_write(bts)
 
           stats[name] += cur_chunk.length
 
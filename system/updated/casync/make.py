@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Builds a casync blob index (.caibx) and chunk store without the casync binary, readable by parse_caibx and RemoteChunkReader.
+
+Chunks are content defined, so unchanged parts of an image keep their chunks between builds: a gear hash of the 64 bytes
+before each position marks the places a chunk can end, and a chunk ends at the first of those after the minimum size, or at
+the maximum size. Finding those places and hashing and xz compressing the chunks is done in worker processes.
+"""
+import argparse
+import hashlib
+import lzma
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+from Crypto.Hash import SHA512
+
+import openpilot.system.updated.casync.casync as casync
+
+# like CASYNC_ARGS, the minimum and maximum are a quarter and four times the average like casync's defaults
+CHUNK_SIZE_AVG = 16 * 1024 * 1024
+XZ_PRESET = 6
+WINDOW = 64
+# bytes scanned for chunk ends per task, the hash takes 8 bytes of memory per byte
+SCAN_BLOCK = 4 * 1024 * 1024
+
+# h = (h << 1) + GEAR[byte], after 64 bytes a byte no longer affects h
+GEAR = np.array([int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'little') for i in range(256)], dtype=np.uint64)
+
+
+def chunk_limits(chunk_size: int) -> tuple[int, int]:
+  return chunk_size // 4, chunk_size * 4
+
+
+def gear_hash(dat: np.ndarray) -> np.ndarray:
+  """The gear hash of the WINDOW bytes up to each position, built in log2(WINDOW) doublings instead of a byte at a time"""
+  h = GEAR[dat]
+  m = 1
+  while m < WINDOW:
+    h[m:] += h[:-m] << np.uint64(m)
+    m *= 2
+  return h
+
+
+def chunk_end_threshold(chunk_size: int) -> np.uint64:
+  # ends are this likely past the minimum size, so chunks are about chunk_size long on average
+  min_size, _ = chunk_limits(chunk_size)
+  return np.uint64((1 << 64) // max(chunk_size - min_size, 1))
+
+
+def find_chunk_ends(path: str, start: int, end: int, threshold: np.uint64) -> np.ndarray:
+  """The offsets in [start, end) a chunk can end after, from the hash of the bytes before them"""
+  lead = min(start, WINDOW - 1)
+  with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+    dat = np.frombuffer(m, dtype=np.uint8, count=end - start + lead, offset=start - lead)
+    h = gear_hash(dat)[lead:]
+    del dat
+  return np.flatnonzero(h < threshold).astype(np.int64) + start + 1
+
+
+def cut_chunks(ends: np.ndarray, size: int, chunk_size: int) -> list[tuple[int, int]]:
+  """(offset, length) of the chunks, ending at the first possible end past the minimum size or at the maximum size"""
+  min_size, max_size = chunk_limits(chunk_size)
+  chunks = []
+  offset = 0
+  while offset < size:
+    i = np.searchsorted(ends, offset + min_size)
+    end = int(ends[i]) if i < len(ends) and ends[i] <= offset + max_size else offset + max_size
+    end = min(end, size)
+    chunks.append((offset, end - offset))
+    offset = end
+  return chunks
+
+
+def chunk_path(store: str, sha: bytes) -> str:
+  sha_hex = sha.hex()
+  return os.path.join(store, sha_hex[:4], sha_hex + ".cacnk")
+
+
+def store_chunk(path: str, store: str, offset: int, length: int, preset: int) -> bytes:
+  """Hashes a chunk and writes it xz compressed to the store, unless the store already has it"""
+  with open(path, 'rb') as f:
+    dat = os.pread(f.fileno(), length, offset)
+  sha = SHA512.new(dat, truncate="256").digest()
+
+  fn = chunk_path(store, sha)
+  if not os.path.isfile(fn):
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmp_fn = f"{fn}.{os.getpid()}.tmp"
+    with open(tmp_fn, 'wb') as f:
+      f.write(lzma.compress(dat, format=lzma.FORMAT_XZ, preset=preset))
+    os.replace(tmp_fn, fn)
+  return sha
+
+
+def write_caibx(caibx_path: str, chunks: list[casync.Chunk], chunk_size: int) -> None:
+  min_size, max_size = chunk_limits(chunk_size)
+  table_len = casync.CA_TABLE_HEADER_LEN + (len(chunks) + 1) * casync.CA_TABLE_ENTRY_LEN
+  with open(caibx_path, 'wb') as f:
+    f.write(struct.pack("<QQQQQQ", casync.CA_HEADER_LEN, casync.CA_FORMAT_INDEX, casync.FLAGS, min_size, chunk_size, max_size))
+    f.write(struct.pack("<QQ", 0xFFFFFFFFFFFFFFFF, casync.CA_FORMAT_TABLE))
+    for c in chunks:
+      f.write(struct.pack("<Q32s", c.offset + c.length, c.sha))
+    f.write(struct.pack("<QQQQQ", 0, 0, casync.CA_HEADER_LEN, table_len, casync.CA_FORMAT_TABLE_TAIL_MARKER))
+
+
+def make(path: str, caibx_path: str, store: str, chunk_size: int = CHUNK_SIZE_AVG, jobs: int | None = None,
+         preset: int = XZ_PRESET) -> list[casync.Chunk]:
+  """Splits a file into content defined chunks, stores the new ones and writes the index, like casync make"""
+  size = os.path.getsize(path)
+  with ProcessPoolExecutor(jobs) as pool:
+    starts = range(0, size, SCAN_BLOCK)
+    ends = [min(s + SCAN_BLOCK, size) for s in starts]
+    chunk_ends = np.concatenate([np.empty(0, dtype=np.int64), *pool.map(find_chunk_ends, repeat(path), starts, ends,
+                                                                          repeat(chunk_end_threshold(chunk_size)))])
+    offsets, lengths = zip(*cut_chunks(chunk_ends, size, chunk_size), strict=True) if size else ((), ())
+    shas = pool.map(store_chunk, repeat(path), repeat(store), offsets, lengths, repeat(preset))
+    chunks = [casync.Chunk(sha, offset, length) for sha, offset, length in zip(shas, offsets, lengths, strict=True)]
+
+  write_caibx(caibx_path, chunks, chunk_size)
+  return chunks
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Build a casync index and chunk store of a file")
+  parser.add_argument("file")
+  parser.add_argument("caibx")
+  parser.add_argument("store")
+  parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE_AVG, help="average chunk size in bytes")
+  parser.add_argument("--jobs", type=int, default=os.cpu_count())
+  args = parser.parse_args()
+
+  st = time.monotonic()
+  chunks = make(args.file, args.caibx, args.store, args.chunk_size, args.jobs)
+  dt = time.monotonic() - st
+  size = sum(c.length for c in chunks)
+  print(f"{len(chunks)} chunks, {len(casync.build_chunk_dict(chunks))} unique, {size / 1e6:.1f} MB in {dt:.1f} s, {size / 1e6 / dt:.1f} MB/s")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+from openpilot.system.updated.casync import make
+
+SIZE_MB = int(os.getenv("SIZE_MB", "512"))
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", str(make.CHUNK_SIZE_AVG)))
+
+
+def make_image(fn):
+  # half incompressible, half zeroes, like a partition image with free space
+  rand = random.Random(0)
+  with open(fn, "wb") as f:
+    for i in range(SIZE_MB):
+      f.write(rand.randbytes(1024 * 1024) if i % 2 == 0 else bytes(1024 * 1024))
+
+
+def run(name, fn, cmd):
+  store = tempfile.mkdtemp(dir=os.path.dirname(fn))
+  st = time.monotonic()
+  cmd(fn, os.path.join(store, "img.caibx"), os.path.join(store, "store"))
+  dt = time.monotonic() - st
+  shutil.rmtree(store)
+  print(f"{name:12} {SIZE_MB / dt:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+  with tempfile.TemporaryDirectory() as tmp:
+    fn = os.path.join(tmp, "img.bin")
+    make_image(fn)
+    print(f"{SIZE_MB} MB image, {CHUNK_SIZE / 1024 / 1024:.0f} MB average chunks")
+
+    jobs = 1
+    while True:
+      run(f"{jobs} jobs", fn, lambda fn, caibx, store, jobs=jobs: make.make(fn, caibx, store, CHUNK_SIZE, jobs))
+      if jobs >= os.cpu_count():
+        break
+      jobs = min(jobs * 2, os.cpu_count())
+
+    if shutil.which("casync"):
+      run("casync make", fn, lambda fn, caibx, store: subprocess.check_call(["casync", "make", "--compression=xz", "--store", store, caibx, fn,
+                                                                              f"--chunk-size={CHUNK_SIZE}"], stdout=subprocess.DEVNULL))
@@ -1,10 +1,12 @@
 import pytest
 import os
 import pathlib
+import random
 import tempfile
 import subprocess
 
 from openpilot.system.updated.casync import casync
+from openpilot.system.updated.casync import make
 from openpilot.system.updated.casync import tar
 
 # dd if=/dev/zero of=/tmp/img.raw bs=1M count=2
@@ -151,6 +153,76 @@ class TestCasync:
     assert stats['remote'] < len(self.contents)
 
 
+class TestCasyncMake:
+  CHUNK_SIZE = 64 * 1024
+
+  @pytest.fixture(autouse=True)
+  def setup_method(self, tmp_path):
+    self.tmp_path = tmp_path
+    self.store = str(tmp_path / "store")
+    rand = random.Random(0)
+    self.contents = rand.randbytes(1024 * 1024) + bytes(256 * 1024) + rand.randbytes(512 * 1024)
+
+  def make(self, contents, name="img", **kwargs):
+    fn = str(self.tmp_path / f"{name}.bin")
+    with open(fn, 'wb') as f:
+      f.write(contents)
+    caibx = str(self.tmp_path / f"{name}.caibx")
+    chunks = make.make(fn, caibx, self.store, self.CHUNK_SIZE, **kwargs)
+    return fn, caibx, chunks
+
+  def extract(self, caibx, seed=None, seed_caibx=None):
+    target = casync.parse_caibx(caibx)
+    sources = [('seed', casync.FileChunkReader(seed), casync.build_chunk_dict(casync.parse_caibx(seed_caibx)))] if seed else []
+    sources += [('remote', casync.RemoteChunkReader(self.store), casync.build_chunk_dict(target))]
+    out = str(self.tmp_path / "out.bin")
+    stats = casync.extract(target, sources, out)
+    with open(out, 'rb') as f:
+      return f.read(), stats
+
+  def test_round_trip(self):
+    _, caibx, chunks = self.make(self.contents, jobs=2)
+    assert casync.parse_caibx(caibx) == chunks
+
+    min_size, max_size = make.chunk_limits(self.CHUNK_SIZE)
+    assert all(min_size <= c.length <= max_size for c in chunks[:-1])
+    assert sum(c.length for c in chunks) == len(self.contents)
+
+    dat, stats = self.extract(caibx)
+    assert dat == self.contents
+    assert stats['remote'] == len(self.contents)
+
+  def test_dedup(self):
+    # the zeroes are cut at the maximum size into identical chunks, stored once
+    _, _, chunks = self.make(bytes(2 * 1024 * 1024))
+    assert len(chunks) == 8
+    assert len(casync.build_chunk_dict(chunks)) == 1
+    assert len(list(pathlib.Path(self.store).rglob("*.cacnk"))) == 1
+
+  def test_jobs_and_scan_blocks(self, monkeypatch):
+    _, caibx, _ = self.make(self.contents, name="a", jobs=1)
+    monkeypatch.setattr(make, "SCAN_BLOCK", 100_003)
+    _, caibx_blocks, _ = self.make(self.contents, name="b", jobs=4)
+    assert pathlib.Path(caibx).read_bytes() == pathlib.Path(caibx_blocks).read_bytes()
+
+  def test_insertion(self):
+    _, _, chunks = self.make(self.contents, name="a")
+    _, caibx, new_chunks = self.make(b"inserted" + self.contents, name="b")
+
+    # only the chunks around the insertion change
+    shas = {c.sha for c in chunks}
+    assert sum(c.sha not in shas for c in new_chunks) <= 2
+
+    dat, stats = self.extract(caibx, seed=str(self.tmp_path / "a.bin"), seed_caibx=str(self.tmp_path / "a.caibx"))
+    assert dat == b"inserted" + self.contents
+    assert stats['remote'] < len(self.contents) // 4
+
+  def test_empty(self):
+    _, caibx, chunks = self.make(b"")
+    assert chunks == []
+    assert casync.parse_caibx(caibx) == []
+
+
 @pytest.mark.skip("not used yet")
 class TestCasyncDirectory:
   """Tests extracting a directory stored as a casync tar archive"""
@@ -587,6 +587,84 @@ cdef class AcadosOcpSolverCython:
                     self.nlp_solver, stage, field, <void *> value.data)
         return
 
+    def set_flat(self, str field_, value_):
+        """
+        Set a field for all stages in one call, instead of one `set` call per stage.
+
+            :param field: string in ['p', 'yref', 'x', 'u']
+            :param value: array with the values of all stages concatenated, stage 0 first.
+                          'p' and 'x' cover stages 0 to N, 'u' stages 0 to N-1, 'yref' stages 0 to N
+                          with the terminal stage using its own, possibly smaller, dimension.
+                          Parameters are split evenly across stages.
+        """
+        if not isinstance(value_, np.ndarray):
+            raise Exception(f"set_flat: value must be numpy array, got {type(value_)}.")
+
+        flat_fields = ['p', 'yref', 'x', 'u']
+        if field_ not in flat_fields:
+            raise Exception('AcadosOcpSolverCython.set_flat(): {} is not a valid argument.\
+                \nPossible values are {}.'.format(field_, flat_fields))
+
+        field = field_.encode('utf-8')
+        cdef cnp.ndarray[cnp.float64_t, ndim=1] value = np.ascontiguousarray(value_.reshape(-1), dtype=np.float64)
+        cdef double *data = <double *> value.data
+        cdef int last_stage = self.N - 1 if field_ == 'u' else self.N
+        cdef int stage, offset, dims
+
+        # parameters have the same dimension at every stage, the others are looked up per stage
+        cdef int np_ = value.shape[0] // (last_stage + 1)
+        offset = 0
+        for stage in range(last_stage + 1):
+            offset += np_ if field_ == 'p' else acados_solver_common.ocp_nlp_dims_get_from_attr(self.nlp_config,
+                self.nlp_dims, self.nlp_out, stage, field)
+        if offset != value.shape[0]:
+            raise Exception(f'AcadosOcpSolverCython.set_flat(): mismatching dimension for field "{field_}" ' +
+                f'with dimension {offset} (you have {value.shape[0]})')
+
+        offset = 0
+        for stage in range(last_stage + 1):
+            if field_ == 'p':
+                assert acados_solver.acados_update_params(self.capsule, stage, data + offset, np_) == 0
+                offset += np_
+                continue
+
+            dims = acados_solver_common.ocp_nlp_dims_get_from_attr(self.nlp_config,
+                self.nlp_dims, self.nlp_out, stage, field)
+            if field_ == 'yref':
+                acados_solver_common.ocp_nlp_cost_model_set(self.nlp_config,
+                    self.nlp_dims, self.nlp_in, stage, field, <void *> (data + offset))
+            else:
+                acados_solver_common.ocp_nlp_out_set(self.nlp_config,
+                    self.nlp_dims, self.nlp_out, stage, field, <void *> (data + offset))
+            offset += dims
+
+
+    def get_flat(self, str field_):
+        """
+        Get the last solution of a field for all stages in one call, concatenated, stage 0 first.
+
+            :param field: string in ['x', 'u']
+        """
+        if field_ not in ['x', 'u']:
+            raise Exception('AcadosOcpSolverCython.get_flat(): {} is an invalid argument.\
+                    \n Possible values are {}.'.format(field_, ['x', 'u']))
+
+        field = field_.encode('utf-8')
+        cdef int last_stage = self.N - 1 if field_ == 'u' else self.N
+        cdef int stage, offset, size = 0
+        for stage in range(last_stage + 1):
+            size += acados_solver_common.ocp_nlp_dims_get_from_attr(self.nlp_config, self.nlp_dims, self.nlp_out, stage, field)
+
+        cdef cnp.ndarray[cnp.float64_t, ndim=1] out = np.zeros((size,))
+        cdef double *data = <double *> out.data
+        offset = 0
+        for stage in range(last_stage + 1):
+            acados_solver_common.ocp_nlp_out_get(self.nlp_config, \
+                self.nlp_dims, self.nlp_out, stage, field, <void *> (data + offset))
+            offset += acados_solver_common.ocp_nlp_dims_get_from_attr(self.nlp_config, self.nlp_dims, self.nlp_out, stage, field)
+        return out
+
+
     def cost_set(self, int stage, str field_, value_):
         """
         Set numerical data in the cost module of the solver.
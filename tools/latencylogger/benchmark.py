@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# Cloudlog to frame assignment time against route length, bisect per cloudlog and indexed
+import copy
+import os
+import time
+
+from openpilot.tools.latencylogger.latency_logger import insert_cloudlogs
+from openpilot.tools.latencylogger.tests.test_latency_logger import bisect_insert_cloudlogs, synthetic_route
+
+# frames at 20Hz, a minute up to an hour of driving
+FRAMES = [int(f) for f in os.getenv("FRAMES", "1200,6000,12000,72000").split(",")]
+# skip the bisect once it takes longer than this
+BISECT_LIMIT = float(os.getenv("BISECT_LIMIT", "30"))
+
+
+def bench(fn, data, lr):
+  data = copy.deepcopy(data)
+  st = time.monotonic()
+  fn(lr, data['timestamp'], data['start'], data['end'])
+  return time.monotonic() - st
+
+
+if __name__ == "__main__":
+  bisect_time = 0.
+  for n_frames in FRAMES:
+    data, lr = synthetic_route(n_frames)
+    indexed_time = bench(insert_cloudlogs, data, lr)
+    if bisect_time < BISECT_LIMIT:
+      bisect_time = bench(bisect_insert_cloudlogs, data, lr)
+      bisect = f"{bisect_time:8.2f} s"
+    else:
+      bisect = "skipped".rjust(10)
+    print(f"{n_frames:6d} frames, {len(lr):7d} cloudlogs: bisect {bisect}, indexed {indexed_time:8.2f} s")
@@ -3,8 +3,8 @@ import argparse
 import json
 import matplotlib.patches as mpatches
 import matplotlib.pyplot as plt
+import numpy as np
 import sys
-from bisect import bisect_left, bisect_right
 from collections import defaultdict
 
 from openpilot.tools.lib.logreader import LogReader
@@ -88,22 +88,39 @@ def read_logs(lr):
     print("Warning, many frame mismatches", len(frame_mismatches))
   return (data, frame_mismatches)
 
-# This is not needed in 3.10 as a "key" parameter is added to bisect
-class KeyifyList:
-  def __init__(self, inner, key):
-    self.inner = inner
-    self.key = key
-  def __len__(self):
-    return len(self.inner)
-  def __getitem__(self, k):
-    return self.key(self.inner[k])
+INT64_MAX = np.iinfo(np.int64).max
+
+class FrameIndex:
+  """
+  Start and end times of every frame per service as sorted arrays, built once so that any
+  number of log times can be assigned to frames with one searchsorted per service.
+  Positions are in the order frames were first seen, the same order the dicts iterate in.
+  """
+  def __init__(self, start_times, end_times):
+    self.start_times = start_times
+    self.end_times = end_times
+    self._starts = {}
+    self._ends = {}
+
+  def _arrays(self, service):
+    if service not in self._starts:
+      # a frame missing the service starts with the next frame and ends with the previous one,
+      # which keeps the arrays sorted without pulling times into it
+      starts = np.array([s.get(service) or INT64_MAX for s in self.start_times.values()], dtype=np.int64)
+      ends = np.array([e.get(service) or -1 for e in self.end_times.values()], dtype=np.int64)
+      self._starts[service] = np.minimum.accumulate(starts[::-1])[::-1]
+      self._ends[service] = np.maximum.accumulate(ends)
+    return self._starts[service], self._ends[service]
+
+  def find_frame_ids(self, times, service):
+    """Positions of the last frame that started before and the first that ended at or after each time"""
+    starts, ends = self._arrays(service)
+    times = np.asarray(times, dtype=np.int64)
+    return np.searchsorted(starts, times, side='left') - 1, np.searchsorted(ends, times, side='right')
 
 def find_frame_id(time, service, start_times, end_times):
-  left = bisect_left(KeyifyList(list(start_times.items()),
-                     lambda x: x[1][service] if x[1][service] else -1), time) - 1
-  right = bisect_right(KeyifyList(list(end_times.items()),
-                      lambda x: x[1][service] if x[1][service] else float("inf")), time)
-  return left, right
+  left, right = FrameIndex(start_times, end_times).find_frame_ids([time], service)
+  return int(left[0]), int(right[0])
 
 def find_t0(start_times, frame_id=-1):
   frame_id = frame_id if frame_id > -1 else min(start_times.keys())
@@ -115,46 +132,79 @@ def find_t0(start_times, frame_id=-1):
     frame_id += 1
   raise Exception('No start time has been set')
 
-def insert_cloudlogs(lr, timestamps, start_times, end_times):
-  # at least one cloudlog must be made in controlsd
-
-  t0 = find_t0(start_times)
-  failed_inserts = 0
-  latest_controls_frameid = 0
+def read_cloudlogs(lr, t0):
+  """(service, event, time, frame_id or None) of every timestamp cloudlog from t0 on, in log order"""
+  cloudlogs = []
   for msg in lr:
     if msg.which() == "logMessage":
       jmsg = json.loads(msg.logMessage)
       if "timestamp" in jmsg['msg']:
         time = int(jmsg['msg']['timestamp']['time'])
-        service = jmsg['ctx']['daemon']
-        event = jmsg['msg']['timestamp']['event']
         if time < t0:
           # Filter out controlsd messages which arrive before the camera loop
           continue
+        frame_id = jmsg['msg']['timestamp'].get('frame_id')
+        cloudlogs.append((jmsg['ctx']['daemon'], jmsg['msg']['timestamp']['event'], time, None if frame_id is None else int(frame_id)))
+  return cloudlogs
 
-        if "frame_id" in jmsg['msg']['timestamp']:
-          timestamps[int(jmsg['msg']['timestamp']['frame_id'])][service].append((event, time))
-          continue
+def insert_cloudlogs(lr, timestamps, start_times, end_times):
+  # at least one cloudlog must be made in controlsd
+
+  cloudlogs = read_cloudlogs(lr, find_t0(start_times))
 
-        if service == "pandad":
-          timestamps[latest_controls_frameid][service].append((event, time))
-          end_times[latest_controls_frameid][service] = time
-        else:
-          frame_id = find_frame_id(time, service, start_times, end_times)
-          if frame_id:
-            if frame_id[0] != frame_id[1]:
-              event += " (warning: ambiguity)"
-            frame_id = frame_id[0]
-            if service == 'controlsd':
-              latest_controls_frameid = frame_id
-            timestamps[frame_id][service].append((event, time))
-          else:
-            failed_inserts += 1
+  # frames of all cloudlogs without an explicit frame_id, one lookup per service
+  index = FrameIndex(start_times, end_times)
+  to_find = defaultdict(list)
+  for i, (service, _, _, frame_id) in enumerate(cloudlogs):
+    if frame_id is None and service != "pandad":
+      to_find[service].append(i)
+  found = {}
+  for service, idxs in to_find.items():
+    left, right = index.find_frame_ids([cloudlogs[i][2] for i in idxs], service)
+    found.update(zip(idxs, zip(left.tolist(), right.tolist(), strict=True), strict=True))
+
+  latest_controls_frameid = 0
+  for i, (service, event, time, frame_id) in enumerate(cloudlogs):
+    if frame_id is not None:
+      timestamps[frame_id][service].append((event, time))
+    elif service == "pandad":
+      timestamps[latest_controls_frameid][service].append((event, time))
+      end_times[latest_controls_frameid][service] = time
+    else:
+      left, right = found[i]
+      if left != right:
+        event += " (warning: ambiguity)"
+      if service == 'controlsd':
+        latest_controls_frameid = left
+      timestamps[left][service].append((event, time))
 
   if latest_controls_frameid == 0:
     print("Warning: failed to bind pandad logs to a frame ID. Add a timestamp cloudlog in controlsd.")
-  elif failed_inserts > len(timestamps):
-    print(f"Warning: failed to bind {failed_inserts} cloudlog timestamps to a frame ID")
+
+def stage_latencies(start_times, end_times):
+  """Per frame milliseconds spent in each service, and from start of frame to the end of each service"""
+  frames = [f for f in start_times if start_times[f].get(SERVICES[0])]
+  sof = np.array([start_times[f][SERVICES[0]] for f in frames], dtype=np.float64)
+  stages, from_sof = {}, {}
+  for service in SERVICES:
+    start = np.array([start_times[f].get(service) or np.nan for f in frames], dtype=np.float64)
+    end = np.array([end_times[f].get(service) or np.nan for f in frames], dtype=np.float64)
+    stages[service] = (end - start) / 1e6
+    from_sof[service] = (end - sof) / 1e6
+  return stages, from_sof
+
+def print_latency_report(start_times, end_times):
+  stages, from_sof = stage_latencies(start_times, end_times)
+  print(f"{'ms':<12}{'frames':>8}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+  for title, latencies in (("in service", stages), ("from start of frame", from_sof)):
+    print(title)
+    for service in SERVICES:
+      t = latencies[service][~np.isnan(latencies[service])]
+      if not len(t):
+        print(f"  {service:<10}{0:8d}")
+        continue
+      p50, p90, p99 = np.percentile(t, [50, 90, 99])
+      print(f"  {service:<10}{len(t):8d}{np.mean(t):10.2f}{p50:10.2f}{p90:10.2f}{p99:10.2f}{np.max(t):10.2f}")
 
 def print_timestamps(timestamps, durations, start_times, relative):
   t0 = find_t0(start_times)
@@ -223,6 +273,7 @@ if __name__ == "__main__":
   parser.add_argument("--demo", action="store_true", help="Use the demo route instead of providing one")
   parser.add_argument("--plot", action="store_true", help="If a plot should be generated")
   parser.add_argument("--offset", action="store_true", help="Vertically offset service to better visualize overlap")
+  parser.add_argument("--report", action="store_true", help="Print latency distributions per service instead of every frame")
   parser.add_argument("route_or_segment_name", nargs='?', help="The route to print")
 
   if len(sys.argv) == 1:
@@ -234,6 +285,9 @@ if __name__ == "__main__":
   lr = LogReader(r, sort_by_time=True)
 
   data, _ = get_timestamps(lr)
+  if args.report:
+    print_latency_report(data['start'], data['end'])
+    sys.exit()
   print_timestamps(data['timestamp'], data['duration'], data['start'], args.relative)
   if args.plot:
     graph_timestamps(data['timestamp'], data['start'], data['end'], args.relative, offset_services=args.offset, title=r)
@@ -0,0 +1,129 @@
+import copy
+import json
+import random
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.latencylogger.latency_logger import DEMO_ROUTE, SERVICES, find_t0, get_timestamps, insert_cloudlogs, read_logs, stage_latencies
+
+FRAME_NS = 50_000_000
+
+
+# frame assignment as it was, one bisect over all frames per cloudlog
+class KeyifyList:
+  def __init__(self, inner, key):
+    self.inner = inner
+    self.key = key
+  def __len__(self):
+    return len(self.inner)
+  def __getitem__(self, k):
+    return self.key(self.inner[k])
+
+def bisect_find_frame_id(time, service, start_times, end_times):
+  left = bisect_left(KeyifyList(list(start_times.items()),
+                     lambda x: x[1][service] if x[1][service] else -1), time) - 1
+  right = bisect_right(KeyifyList(list(end_times.items()),
+                      lambda x: x[1][service] if x[1][service] else float("inf")), time)
+  return left, right
+
+def bisect_insert_cloudlogs(lr, timestamps, start_times, end_times):
+  t0 = find_t0(start_times)
+  latest_controls_frameid = 0
+  for msg in lr:
+    if msg.which() == "logMessage":
+      jmsg = json.loads(msg.logMessage)
+      if "timestamp" in jmsg['msg']:
+        time = int(jmsg['msg']['timestamp']['time'])
+        service = jmsg['ctx']['daemon']
+        event = jmsg['msg']['timestamp']['event']
+        if time < t0:
+          continue
+
+        if "frame_id" in jmsg['msg']['timestamp']:
+          timestamps[int(jmsg['msg']['timestamp']['frame_id'])][service].append((event, time))
+          continue
+
+        if service == "pandad":
+          timestamps[latest_controls_frameid][service].append((event, time))
+          end_times[latest_controls_frameid][service] = time
+        else:
+          frame_id = bisect_find_frame_id(time, service, start_times, end_times)
+          if frame_id[0] != frame_id[1]:
+            event += " (warning: ambiguity)"
+          if service == 'controlsd':
+            latest_controls_frameid = frame_id[0]
+          timestamps[frame_id[0]][service].append((event, time))
+
+
+def cloudlog(daemon, event, time, frame_id=None):
+  timestamp = {'event': event, 'time': time}
+  if frame_id is not None:
+    timestamp['frame_id'] = frame_id
+  msg = json.dumps({'ctx': {'daemon': daemon}, 'msg': {'timestamp': timestamp}})
+  return SimpleNamespace(which=lambda: "logMessage", logMessage=msg)
+
+def synthetic_route(n_frames, drop_every=0, seed=0):
+  """Start and end times per frame and service like read_logs builds them, and timestamp cloudlogs inside them"""
+  rng = random.Random(seed)
+  data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+  lr = []
+  for f in range(n_frames):
+    t = 1_000_000_000 + f * FRAME_NS
+    for service in SERVICES[:-1]:
+      if drop_every and f % drop_every == drop_every // 2 and service == 'plannerd':
+        continue  # dropped frame
+      start, end = t, t + rng.randint(1_000_000, 10_000_000)
+      data['start'][f][service] = start
+      data['end'][f][service] = end
+      lr.append(cloudlog(service, f"{service} step", rng.randint(start, end)))
+      t = end
+    lr.append(cloudlog('pandad', "pandad sendcan", t + 500_000))
+    if f % 10 == 0:
+      lr.append(cloudlog('modeld', "modeld tagged", t, frame_id=f))
+  return data, lr
+
+
+class TestLatencyLogger:
+  @pytest.mark.parametrize("n_frames", [1, 50, 500])
+  def test_insert_matches_bisect(self, n_frames):
+    data, lr = synthetic_route(n_frames)
+    expected = copy.deepcopy(data)
+    bisect_insert_cloudlogs(lr, expected['timestamp'], expected['start'], expected['end'])
+    insert_cloudlogs(lr, data['timestamp'], data['start'], data['end'])
+    assert data['timestamp'] == expected['timestamp']
+    assert {f: dict(e) for f, e in data['end'].items()} == {f: {s: t for s, t in e.items() if t} for f, e in expected['end'].items()}
+
+  def test_dropped_frames(self):
+    # frames missing a service used to throw off the bisect, every cloudlog belongs to the frame it was made in
+    data, lr = synthetic_route(500, drop_every=20)
+    insert_cloudlogs(lr, data['timestamp'], data['start'], data['end'])
+    for f in range(500):
+      for service in SERVICES[:-1]:
+        events = [e for e in data['timestamp'][f][service] if e[0].startswith(f"{service} step")]
+        if service in data['start'][f]:
+          assert len(events) == 1 and events[0][0] == f"{service} step"
+          assert data['start'][f][service] <= events[0][1] <= data['end'][f][service]
+        else:
+          assert len(events) == 0
+
+  def test_stage_latencies(self):
+    data, _ = synthetic_route(100, drop_every=20)
+    stages, from_sof = stage_latencies(data['start'], data['end'])
+    assert np.isnan(stages['plannerd']).sum() == 5
+    for service in SERVICES[:-1]:
+      valid = ~np.isnan(stages[service])
+      assert np.all((stages[service][valid] >= 1.) & (stages[service][valid] <= 10.))
+      assert np.all(from_sof[service][valid] >= stages[service][valid])
+    np.testing.assert_array_equal(stages['camerad'], from_sof['camerad'])
+
+  def test_demo_route(self):
+    lr = list(LogReader(DEMO_ROUTE, sort_by_time=True))
+    data, _ = get_timestamps(lr)
+    expected, _ = read_logs(lr)
+    bisect_insert_cloudlogs(lr, expected['timestamp'], expected['start'], expected['end'])
+    assert data['timestamp'] == expected['timestamp']
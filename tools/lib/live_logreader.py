@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+import numpy as np
 from cereal import log as capnp_log, messaging
 from cereal.services import SERVICE_LIST
 
@@ -28,3 +31,149 @@ def live_logreader(services: list[str] = ALL_SERVICES, addr: str = '127.0.0.1')
   for m in raw_live_logreader(services, addr):
     with capnp_log.Event.from_bytes(m) as evt:
       yield evt
+
+
+class EventRing:
+  """
+  Raw events in a preallocated, size-bounded byte ring. The oldest events are evicted to make room,
+  and the index of offsets, sizes, receive times and services is preallocated too.
+  Events are numbered in arrival order, seq - len(ring) is the oldest one still held.
+  """
+  def __init__(self, size: int, max_events: int, services: list[str]):
+    self.buf = bytearray(size)
+    self.offsets = np.zeros(max_events, dtype=np.int64)
+    self.sizes = np.zeros(max_events, dtype=np.int64)
+    self.times = np.zeros(max_events, dtype=np.int64)
+    self.services = np.zeros(max_events, dtype=np.int16)
+    self.service_names = services
+
+    self.seq = 0  # events ever pushed
+    self.count = 0  # events held
+    self.write_pos = 0
+    # with a reader, events evicted before being read count as dropped
+    self.read_seq: int | None = None
+    self.received = np.zeros(len(services), dtype=np.int64)
+    self.dropped = np.zeros(len(services), dtype=np.int64)
+
+  def __len__(self):
+    return self.count
+
+  def _evict(self):
+    i = (self.seq - self.count) % len(self.offsets)
+    if self.read_seq is not None and self.read_seq <= self.seq - self.count:
+      self.dropped[self.services[i]] += 1
+      self.read_seq += 1
+    self.count -= 1
+
+  def _oldest_offset(self):
+    return self.offsets[(self.seq - self.count) % len(self.offsets)]
+
+  def push(self, service: int, dat: bytes, t: int):
+    n = len(dat)
+    self.received[service] += 1
+    if n > len(self.buf):
+      self.dropped[service] += 1
+      return
+
+    if self.write_pos + n > len(self.buf):
+      # the end of the buffer is given up, events still there are the oldest
+      while self.count and self._oldest_offset() >= self.write_pos:
+        self._evict()
+      self.write_pos = 0
+    while self.count and (self.count == len(self.offsets) or self.write_pos <= self._oldest_offset() < self.write_pos + n):
+      self._evict()
+
+    i = self.seq % len(self.offsets)
+    self.buf[self.write_pos:self.write_pos + n] = dat
+    self.offsets[i], self.sizes[i], self.times[i], self.services[i] = self.write_pos, n, t, service
+    self.write_pos += n
+    self.seq += 1
+    self.count += 1
+
+  def events(self, start_seq: int):
+    """(seq, service, receive time, raw event) held from start_seq on, copied out"""
+    out = []
+    for seq in range(max(start_seq, self.seq - self.count), self.seq):
+      i = seq % len(self.offsets)
+      o = self.offsets[i]
+      out.append((seq, self.service_names[self.services[i]], int(self.times[i]), bytes(self.buf[o:o + self.sizes[i]])))
+    return out
+
+  def first_seq_since(self, t: int) -> int:
+    """First held event received at or after monotonic time t"""
+    oldest = self.seq - self.count
+    idx = np.arange(oldest, self.seq) % len(self.offsets)
+    return oldest + int(np.searchsorted(self.times[idx], t, side='left'))
+
+
+class LiveRecorder:
+  """
+  Records services on a background thread into an EventRing, draining every ready socket per poll.
+  Consumers read new events with read(), which copies them out of the ring, and the last seconds
+  can be written as an rlog at any time. Events evicted before a consumer read them count as dropped.
+  """
+  def __init__(self, services: list[str] = ALL_SERVICES, addr: str = '127.0.0.1', size: int = 256 * 1024 * 1024,
+               max_events: int = 1 << 20, poll_timeout: int = 10):
+    if addr != "127.0.0.1":
+      os.environ["ZMQ"] = "1"
+      messaging.reset_context()
+
+    self.services = list(services)
+    self.ring = EventRing(size, max_events, self.services)
+    self.lock = threading.Lock()
+    self.poll_timeout = poll_timeout
+
+    self.poller = messaging.Poller()
+    self.socks = {messaging.sub_sock(s, self.poller, addr=addr): i for i, s in enumerate(self.services)}
+    self.exit_event = threading.Event()
+    self.thread = threading.Thread(target=self._run, daemon=True)
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *args):
+    self.stop()
+
+  def start(self):
+    self.thread.start()
+
+  def stop(self):
+    self.exit_event.set()
+    self.thread.join()
+
+  def _run(self):
+    while not self.exit_event.is_set():
+      ready = self.poller.poll(self.poll_timeout)
+      if not ready:
+        continue
+      batches = [(self.socks[sock], messaging.drain_sock_raw(sock)) for sock in ready]
+      t = time.monotonic_ns()
+      with self.lock:
+        for service, msgs in batches:
+          for dat in msgs:
+            self.ring.push(service, dat, t)
+
+  def read(self) -> list[bytes]:
+    """Raw events received since the last read"""
+    with self.lock:
+      if self.ring.read_seq is None:
+        self.ring.read_seq = self.ring.seq - self.ring.count
+      events = self.ring.events(self.ring.read_seq)
+      self.ring.read_seq = self.ring.seq
+    return [e[3] for e in events]
+
+  def snapshot(self, path: str, seconds: float | None = None) -> int:
+    """Writes the held events of the last seconds, or all of them, to path as an rlog. Returns the number of events"""
+    with self.lock:
+      start = self.ring.seq - self.ring.count if seconds is None else self.ring.first_seq_since(time.monotonic_ns() - int(seconds * 1e9))
+      events = self.ring.events(start)
+    with open(path, 'wb') as f:
+      for e in events:
+        f.write(e[3])
+    return len(events)
+
+  @property
+  def stats(self) -> dict[str, dict[str, int]]:
+    with self.lock:
+      return {s: {'received': int(self.ring.received[i]), 'dropped': int(self.ring.dropped[i])} for i, s in enumerate(self.services)}
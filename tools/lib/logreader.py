@@ -1,18 +1,21 @@
 #!/usr/bin/env python3
 import bz2
-from functools import cache, partial
-import multiprocessing
+from functools import cache
 import capnp
 import enum
 import os
 import pathlib
 import sys
+import time
 import tqdm
 import urllib.parse
 import warnings
 import zstandard as zstd
 
 from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
 from urllib.parse import parse_qs, urlparse
 
 from cereal import log as capnp_log
@@ -21,6 +24,7 @@ from openpilot.tools.lib.comma_car_segments import get_url as get_comma_segments
 from openpilot.tools.lib.openpilotci import get_url
 from openpilot.tools.lib.filereader import FileReader, file_exists, internal_source_available
 from openpilot.tools.lib.route import Route, SegmentRange
+from openpilot.tools.lib.shared_arrays import share_arrays, take_arrays
 
 LogMessage = type[capnp._DynamicStructReader]
 LogIterable = Iterable[LogMessage]
@@ -241,6 +245,26 @@ def parse_direct(identifier: str):
   return None
 
 
+@dataclass
+class SegmentResult:
+  index: int
+  result: Any
+  # seconds spent reading the log, in func, and copying arrays out of shared memory
+  read_time: float
+  run_time: float
+  take_time: float
+  shared_bytes: int
+
+
+def _map_segment(func, fn, i, sort_by_time, only_union_types):
+  st = time.monotonic()
+  lr = _LogFileReader(fn, sort_by_time=sort_by_time, only_union_types=only_union_types)
+  read_time = time.monotonic() - st
+  st = time.monotonic()
+  ret = share_arrays(func(lr))
+  return i, ret, read_time, time.monotonic() - st
+
+
 class LogReader:
   def _parse_identifier(self, identifier: str) -> list[LogPath]:
     # useradmin, etc.
@@ -284,16 +308,60 @@ class LogReader:
     for i in range(len(self.logreader_identifiers)):
       yield from self._get_lr(i)
 
-  def _run_on_segment(self, func, i):
-    return func(self._get_lr(i))
+  def map_segments(self, func, num_processes=None, ordered=False, max_in_flight=None, desc=None, report=False) -> Iterator[SegmentResult]:
+    """
+    Runs func on every segment in worker processes, yielding a SegmentResult per segment as soon as it completes,
+    or in segment order. At most max_in_flight segments are running or waiting to be yielded. NumPy arrays in the
+    results come back through shared memory instead of being pickled. With report, each segment's timing is printed.
+    """
+    num_segs = len(self.logreader_identifiers)
+    num_processes = num_processes or os.cpu_count()
+    max_in_flight = max(max_in_flight or 2 * num_processes, 1)
+
+    pending: dict = {}
+    waiting: dict[int, SegmentResult] = {}
+    with ProcessPoolExecutor(num_processes) as pool, tqdm.tqdm(total=num_segs, desc=desc) as pbar:
+      try:
+        next_submit = next_yield = 0
+        while next_yield < num_segs:
+          while next_submit < num_segs and len(pending) + len(waiting) < max_in_flight:
+            fn = self.logreader_identifiers[next_submit]
+            pending[pool.submit(_map_segment, func, fn, next_submit, self.sort_by_time, self.only_union_types)] = next_submit
+            next_submit += 1
+
+          finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+          for f in finished:
+            del pending[f]
+            i, ret, read_time, run_time = f.result()
+            st = time.monotonic()
+            ret, shared_bytes = take_arrays(ret)
+            res = SegmentResult(i, ret, read_time, run_time, time.monotonic() - st, shared_bytes)
+            pbar.update(1)
+            if report:
+              pbar.write(f"segment {i}: read {read_time:.2f} s, func {run_time:.2f} s, {shared_bytes / 1e6:.1f} MB shared in {res.take_time:.3f} s")
+            if ordered:
+              waiting[i] = res
+            else:
+              next_yield += 1
+              yield res
+
+          while next_yield in waiting:
+            next_yield += 1
+            yield waiting.pop(next_yield - 1)
+      finally:
+        # stopped early, free what the workers already shared
+        for f in pending:
+          if not f.cancel():
+            try:
+              take_arrays(f.result()[1])
+            except Exception:
+              pass
 
   def run_across_segments(self, num_processes, func, desc=None):
-    with multiprocessing.Pool(num_processes) as pool:
-      ret = []
-      num_segs = len(self.logreader_identifiers)
-      for p in tqdm.tqdm(pool.imap(partial(self._run_on_segment, func), range(num_segs)), total=num_segs, desc=desc):
-        ret.extend(p)
-      return ret
+    ret = []
+    for res in self.map_segments(func, num_processes, ordered=True, desc=desc):
+      ret.extend(res.result)
+    return ret
 
   def reset(self):
     self.logreader_identifiers = []
@@ -1,10 +1,15 @@
+import hashlib
+import json
 import os
 import re
+import time
 from functools import cache
 from urllib.parse import urlparse
 from collections import defaultdict
 from itertools import chain
 
+from openpilot.common.file_helpers import atomic_write_in_dir
+from openpilot.system.hardware.hw import Paths
 from openpilot.tools.lib.auth_config import get_token
 from openpilot.tools.lib.api import CommaApi
 from openpilot.tools.lib.helpers import RE
@@ -17,14 +22,58 @@ DCAMERA_FILENAMES = ['dcamera.hevc']
 ECAMERA_FILENAMES = ['ecamera.hevc']
 
 
+# the files listed by the API are signed URLs, cached listings must expire well before them
+MAX_REMOTE_CACHE_TTL = 30 * 60
+# bump when the cached metadata changes
+ROUTE_CACHE_VERSION = 1
+
+EXPLORER_FILE_RE = re.compile(RE.EXPLORER_FILE)
+OP_SEGMENT_DIR_RE = re.compile(RE.OP_SEGMENT_DIR)
+SEGMENT_FILE_KINDS = {fn: kind for kind, fns in (('log_path', LOG_FILENAMES), ('qlog_path', QLOG_FILENAMES), ('camera_path', CAMERA_FILENAMES),
+                                                  ('dcamera_path', DCAMERA_FILENAMES), ('ecamera_path', ECAMERA_FILENAMES),
+                                                  ('qcamera_path', QCAMERA_FILENAMES)) for fn in fns}
+SEGMENT_PATH_KINDS = ('log_path', 'qlog_path', 'camera_path', 'dcamera_path', 'ecamera_path', 'qcamera_path')
+
+
+def route_cache_path(name: str, data_dir: str | None = None, token: str | None = None) -> str:
+  # remote listings depend on who listed them, the token is hashed so it isn't stored
+  source = os.path.abspath(data_dir) if data_dir is not None else hashlib.sha256((token or '').encode()).hexdigest()
+  key = hashlib.sha256(f"{ROUTE_CACHE_VERSION}:{name}:{source}".encode()).hexdigest()[:32]
+  return os.path.join(Paths.download_cache_root(), "route_metadata", f"{key}.json")
+
+
+def dir_fingerprint(mtimes: dict[str, int]) -> bool:
+  """Whether every directory a local listing read is unchanged, one stat each"""
+  try:
+    return all(os.stat(d).st_mtime_ns == t for d, t in mtimes.items())
+  except OSError:
+    return False
+
+
 class Route:
-  def __init__(self, name, data_dir=None):
+  """
+  The segments of a route, listed through the API or from a local data directory. Local listings are cached on disk
+  as long as the mtimes of the directories they read are unchanged. Remote ones only for cache_ttl seconds when it's
+  given, since segments can be uploaded at any time, and at most MAX_REMOTE_CACHE_TTL.
+  """
+  def __init__(self, name, data_dir=None, cache_ttl: float = 0., use_cache: bool = True):
     self._name = RouteName(name)
     self.files = None
-    if data_dir is not None:
-      self._segments = self._get_segments_local(data_dir)
-    else:
-      self._segments = self._get_segments_remote()
+    self._dir_mtimes: dict[str, int] = {}
+    self._paths: dict[str, list[str | None]] = {}
+
+    token = get_token() if data_dir is None else None
+    use_cache = use_cache and (data_dir is not None or cache_ttl > 0)
+    cache_path = route_cache_path(self.name.canonical_name, data_dir, token)
+    segments = self._read_cache(cache_path, data_dir, min(cache_ttl, MAX_REMOTE_CACHE_TTL)) if use_cache else None
+    if segments is None:
+      if data_dir is not None:
+        segments = self._get_segments_local(data_dir)
+      else:
+        segments = self._get_segments_remote(token)
+      if use_cache:
+        self._write_cache(cache_path, segments, data_dir)
+    self._segments = segments
     self.max_seg_number = self._segments[-1].name.segment_num
 
   @property
@@ -35,128 +84,123 @@ class Route:
   def segments(self):
     return self._segments
 
+  def _read_cache(self, path, data_dir, cache_ttl):
+    try:
+      with open(path) as f:
+        cached = json.load(f)
+      if data_dir is None:
+        if time.time() - cached['time'] > cache_ttl:
+          return None
+      elif not cached['dir_mtimes'] or not dir_fingerprint(cached['dir_mtimes']):
+        return None
+      self.files = cached['files']
+      self._dir_mtimes = cached['dir_mtimes']
+      return [Segment(*seg) for seg in cached['segments']]
+    except (OSError, ValueError, KeyError, TypeError):
+      return None
+
+  def _write_cache(self, path, segments, data_dir):
+    cached = {
+      'time': time.time(),
+      'files': self.files,
+      'dir_mtimes': self._dir_mtimes,
+      'segments': [[seg.name.canonical_name] + [getattr(seg, kind) for kind in SEGMENT_PATH_KINDS] for seg in segments],
+    }
+    try:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      with atomic_write_in_dir(path, mode='w', overwrite=True) as f:
+        json.dump(cached, f)
+    except OSError:
+      pass  # a read-only cache just means listing every time
+
+  def _seg_paths(self, kind):
+    if kind not in self._paths:
+      path_by_seg_num = {s.name.segment_num: getattr(s, kind) for s in self._segments}
+      self._paths[kind] = [path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return list(self._paths[kind])
+
   def log_paths(self):
-    log_path_by_seg_num = {s.name.segment_num: s.log_path for s in self._segments}
-    return [log_path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return self._seg_paths('log_path')
 
   def qlog_paths(self):
-    qlog_path_by_seg_num = {s.name.segment_num: s.qlog_path for s in self._segments}
-    return [qlog_path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return self._seg_paths('qlog_path')
 
   def camera_paths(self):
-    camera_path_by_seg_num = {s.name.segment_num: s.camera_path for s in self._segments}
-    return [camera_path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return self._seg_paths('camera_path')
 
   def dcamera_paths(self):
-    dcamera_path_by_seg_num = {s.name.segment_num: s.dcamera_path for s in self._segments}
-    return [dcamera_path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return self._seg_paths('dcamera_path')
 
   def ecamera_paths(self):
-    ecamera_path_by_seg_num = {s.name.segment_num: s.ecamera_path for s in self._segments}
-    return [ecamera_path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return self._seg_paths('ecamera_path')
 
   def qcamera_paths(self):
-    qcamera_path_by_seg_num = {s.name.segment_num: s.qcamera_path for s in self._segments}
-    return [qcamera_path_by_seg_num.get(i, None) for i in range(self.max_seg_number + 1)]
+    return self._seg_paths('qcamera_path')
 
-  # TODO: refactor this, it's super repetitive
-  def _get_segments_remote(self):
-    api = CommaApi(get_token())
+  def _get_segments_remote(self, token):
+    api = CommaApi(token)
     route_files = api.get('v1/route/' + self.name.canonical_name + '/files')
     self.files = list(chain.from_iterable(route_files.values()))
 
-    segments = {}
+    segment_paths: dict[str, dict[str, str]] = defaultdict(dict)
     for url in self.files:
       _, dongle_id, time_str, segment_num, fn = urlparse(url).path.rsplit('/', maxsplit=4)
-      segment_name = f'{dongle_id}|{time_str}--{segment_num}'
-      if segments.get(segment_name):
-        segments[segment_name] = Segment(
-          segment_name,
-          url if fn in LOG_FILENAMES else segments[segment_name].log_path,
-          url if fn in QLOG_FILENAMES else segments[segment_name].qlog_path,
-          url if fn in CAMERA_FILENAMES else segments[segment_name].camera_path,
-          url if fn in DCAMERA_FILENAMES else segments[segment_name].dcamera_path,
-          url if fn in ECAMERA_FILENAMES else segments[segment_name].ecamera_path,
-          url if fn in QCAMERA_FILENAMES else segments[segment_name].qcamera_path,
-        )
-      else:
-        segments[segment_name] = Segment(
-          segment_name,
-          url if fn in LOG_FILENAMES else None,
-          url if fn in QLOG_FILENAMES else None,
-          url if fn in CAMERA_FILENAMES else None,
-          url if fn in DCAMERA_FILENAMES else None,
-          url if fn in ECAMERA_FILENAMES else None,
-          url if fn in QCAMERA_FILENAMES else None,
-        )
-
-    return sorted(segments.values(), key=lambda seg: seg.name.segment_num)
+      paths = segment_paths[f'{dongle_id}|{time_str}--{segment_num}']
+      # the last listed file of each kind
+      if fn in SEGMENT_FILE_KINDS:
+        paths[SEGMENT_FILE_KINDS[fn]] = url
+    return self._make_segments(segment_paths)
 
   def _get_segments_local(self, data_dir):
-    files = os.listdir(data_dir)
-    segment_files = defaultdict(list)
-
-    for f in files:
-      fullpath = os.path.join(data_dir, f)
-      explorer_match = re.match(RE.EXPLORER_FILE, f)
-      op_match = re.match(RE.OP_SEGMENT_DIR, f)
-
-      if explorer_match:
-        segment_name = explorer_match.group('segment_name')
-        fn = explorer_match.group('file_name')
-        if segment_name.replace('_', '|').startswith(self.name.canonical_name):
-          segment_files[segment_name].append((fullpath, fn))
-      elif op_match and os.path.isdir(fullpath):
-        segment_name = op_match.group('segment_name')
-        if segment_name.startswith(self.name.canonical_name):
-          for seg_f in os.listdir(fullpath):
-            segment_files[segment_name].append((os.path.join(fullpath, seg_f), seg_f))
-      elif f == self.name.canonical_name:
-        for seg_num in os.listdir(fullpath):
-          if not seg_num.isdigit():
-            continue
-
-          segment_name = f'{self.name.canonical_name}--{seg_num}'
-          for seg_f in os.listdir(os.path.join(fullpath, seg_num)):
-            segment_files[segment_name].append((os.path.join(fullpath, seg_num, seg_f), seg_f))
-
-    segments = []
-    for segment, files in segment_files.items():
-
-      try:
-        log_path = next(path for path, filename in files if filename in LOG_FILENAMES)
-      except StopIteration:
-        log_path = None
-
-      try:
-        qlog_path = next(path for path, filename in files if filename in QLOG_FILENAMES)
-      except StopIteration:
-        qlog_path = None
-
-      try:
-        camera_path = next(path for path, filename in files if filename in CAMERA_FILENAMES)
-      except StopIteration:
-        camera_path = None
-
-      try:
-        dcamera_path = next(path for path, filename in files if filename in DCAMERA_FILENAMES)
-      except StopIteration:
-        dcamera_path = None
-
-      try:
-        ecamera_path = next(path for path, filename in files if filename in ECAMERA_FILENAMES)
-      except StopIteration:
-        ecamera_path = None
-
-      try:
-        qcamera_path = next(path for path, filename in files if filename in QCAMERA_FILENAMES)
-      except StopIteration:
-        qcamera_path = None
-
-      segments.append(Segment(segment, log_path, qlog_path, camera_path, dcamera_path, ecamera_path, qcamera_path))
-
+    """One pass over data_dir, only matching names that start with the dongle id against the segment patterns"""
+    canonical_name = self.name.canonical_name
+    segment_paths: dict[str, dict[str, str]] = defaultdict(dict)
+    self._dir_mtimes = {data_dir: os.stat(data_dir).st_mtime_ns}
+
+    def add_file(segment_name, path, fn):
+      # the first file of each kind
+      kind = SEGMENT_FILE_KINDS.get(fn)
+      paths = segment_paths[segment_name]
+      if kind is not None and kind not in paths:
+        paths[kind] = path
+
+    def add_dir(segment_name, path):
+      self._dir_mtimes[path] = os.stat(path).st_mtime_ns
+      with os.scandir(path) as it:
+        for seg_f in it:
+          add_file(segment_name, seg_f.path, seg_f.name)
+
+    with os.scandir(data_dir) as entries:
+      for entry in entries:
+        f = entry.name
+        if not f.startswith(self.name.dongle_id):
+          continue
+
+        explorer_match = EXPLORER_FILE_RE.match(f)
+        op_match = OP_SEGMENT_DIR_RE.match(f) if explorer_match is None else None
+        if explorer_match:
+          segment_name = explorer_match.group('segment_name')
+          if segment_name.replace('_', '|').startswith(canonical_name):
+            add_file(segment_name, entry.path, explorer_match.group('file_name'))
+        elif op_match and entry.is_dir():
+          segment_name = op_match.group('segment_name')
+          if segment_name.startswith(canonical_name):
+            add_dir(segment_name, entry.path)
+        elif f == canonical_name:
+          self._dir_mtimes[entry.path] = os.stat(entry.path).st_mtime_ns
+          with os.scandir(entry.path) as seg_dirs:
+            for seg_num in seg_dirs:
+              if seg_num.name.isdigit():
+                add_dir(f'{canonical_name}--{seg_num.name}', seg_num.path)
+
+    segments = self._make_segments(segment_paths)
     if len(segments) == 0:
-      raise ValueError(f'Could not find segments for route {self.name.canonical_name} in data directory {data_dir}')
+      raise ValueError(f'Could not find segments for route {canonical_name} in data directory {data_dir}')
+    return segments
+
+  @staticmethod
+  def _make_segments(segment_paths):
+    segments = [Segment(segment, *(paths.get(kind) for kind in SEGMENT_PATH_KINDS)) for segment, paths in segment_paths.items()]
     return sorted(segments, key=lambda seg: seg.name.segment_num)
 
 
@@ -0,0 +1,60 @@
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# smaller arrays are cheaper to pickle than to map
+SHARED_MIN_BYTES = 64 * 1024
+
+
+class SharedArray:
+  """An array a worker left in shared memory, pickled as just its name, shape and dtype"""
+  def __init__(self, arr: np.ndarray):
+    self.shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    self.name, self.shape, self.dtype = self.shm.name, arr.shape, arr.dtype
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=self.shm.buf)[...] = arr
+    self.shm.close()
+    # the reader frees it, not this process's resource tracker when the worker exits
+    resource_tracker.unregister(self.shm._name, "shared_memory")
+
+  def __getstate__(self):
+    return {'name': self.name, 'shape': self.shape, 'dtype': self.dtype}
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+
+  @property
+  def nbytes(self) -> int:
+    return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+  def take(self) -> np.ndarray:
+    """Copies the array out and frees the shared memory, can only be done once"""
+    shm = shared_memory.SharedMemory(name=self.name)
+    try:
+      return np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf).copy()
+    finally:
+      shm.close()
+      shm.unlink()
+
+
+def share_arrays(obj):
+  """Replaces the large arrays of a result, or of the dicts, lists and tuples in it, with SharedArrays"""
+  if isinstance(obj, np.ndarray):
+    return SharedArray(obj) if obj.nbytes >= SHARED_MIN_BYTES and not obj.dtype.hasobject else obj
+  if isinstance(obj, dict):
+    return {k: share_arrays(v) for k, v in obj.items()}
+  if isinstance(obj, (list, tuple)) and type(obj) in (list, tuple):
+    return type(obj)(share_arrays(v) for v in obj)
+  return obj
+
+
+def take_arrays(obj):
+  """The inverse of share_arrays, returns the result and the bytes that came through shared memory"""
+  if isinstance(obj, SharedArray):
+    return obj.take(), obj.nbytes
+  if isinstance(obj, dict):
+    items = {k: take_arrays(v) for k, v in obj.items()}
+    return {k: v for k, (v, _) in items.items()}, sum(n for _, n in items.values())
+  if isinstance(obj, (list, tuple)) and type(obj) in (list, tuple):
+    items = [take_arrays(v) for v in obj]
+    return type(obj)(v for v, _ in items), sum(n for _, n in items)
+  return obj, 0
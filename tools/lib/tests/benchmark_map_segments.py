@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from cereal import messaging
+from openpilot.tools.lib.logreader import LogReader, _LogFileReader
+
+N_SEGMENTS = int(os.getenv("N_SEGMENTS", "64"))
+N_MSGS = int(os.getenv("N_MSGS", "6000"))
+# per message, like extracting many signals at a high rate
+SIGNAL_WIDTH = int(os.getenv("SIGNAL_WIDTH", "200"))
+NUM_PROCESSES = int(os.getenv("NUM_PROCESSES", str(os.cpu_count())))
+
+
+def make_route(path):
+  paths = []
+  for i in range(N_SEGMENTS):
+    paths.append(os.path.join(path, str(i), "rlog"))
+    os.makedirs(os.path.dirname(paths[-1]))
+    msgs = []
+    for j in range(N_MSGS):
+      msg = messaging.new_message('carState')
+      msg.logMonoTime = (i * N_MSGS + j) * 10_000_000
+      msg.carState.vEgo = j
+      msgs.append(msg.to_bytes())
+    with open(paths[-1], "wb") as f:
+      f.write(b"".join(msgs))
+  return paths
+
+
+def extract(segment):
+  v = np.array([m.carState.vEgo for m in segment if m.which() == 'carState'], dtype=np.float64)
+  return np.repeat(v[:, None], SIGNAL_WIDTH, axis=1)
+
+
+def legacy_extract(fn):
+  # what run_across_segments did: ordered imap, results pickled through the pool
+  return extract(_LogFileReader(fn))
+
+
+def run(mode, paths):
+  st = time.monotonic()
+  total = 0
+  if mode == "legacy":
+    with multiprocessing.Pool(NUM_PROCESSES) as pool:
+      for arr in pool.imap(legacy_extract, paths):
+        total += arr.nbytes
+  else:
+    for res in LogReader(paths).map_segments(extract, NUM_PROCESSES, ordered=(mode == "ordered")):
+      total += res.result.nbytes
+  dt = time.monotonic() - st
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+  print(f"{mode:10} {len(paths) / dt:7.1f} segments/s, {total / 1e6 / dt:8.1f} MB/s of results, parent peak RSS {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 2:
+    run(sys.argv[1], sys.argv[2:])
+    sys.exit(0)
+
+  import subprocess
+  with tempfile.TemporaryDirectory() as tmp:
+    paths = make_route(tmp)
+    print(f"{N_SEGMENTS} segments of {N_MSGS} messages, {N_MSGS * SIGNAL_WIDTH * 8 / 1e6:.1f} MB of results each, {NUM_PROCESSES} processes")
+    # a fresh process per mode, so the peak memory is its own
+    for mode in ("legacy", "ordered", "unordered"):
+      subprocess.check_call([sys.executable, __file__, mode] + paths)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+
+from openpilot.tools.lib.helpers import RE
+from openpilot.tools.lib.route import SEGMENT_FILE_KINDS, SEGMENT_PATH_KINDS, Route, Segment
+
+DONGLE_ID = "a2a0ccea32023010"
+ROUTE = f"{DONGLE_ID}|2023-07-27--13-01-19"
+OTHER_ROUTES = 20
+FILES = ("rlog.zst", "qlog.zst", "fcamera.hevc", "ecamera.hevc", "dcamera.hevc", "qcamera.ts")
+
+
+def make_tree(data_dir, n_segments):
+  for route, n in [(ROUTE, n_segments)] + [(f"{DONGLE_ID}|2023-07-{i % 28 + 1:02d}--10-00-00", 100) for i in range(OTHER_ROUTES)]:
+    for i in range(n):
+      d = os.path.join(data_dir, f"{route}--{i}")
+      os.makedirs(d, exist_ok=True)
+      for fn in FILES:
+        open(os.path.join(d, fn), "w").close()
+
+
+def legacy_scan(data_dir, canonical_name):
+  # the listing Route did before: every name against both patterns, listdir and isdir per entry
+  segment_files = defaultdict(list)
+  for f in os.listdir(data_dir):
+    fullpath = os.path.join(data_dir, f)
+    explorer_match = re.match(RE.EXPLORER_FILE, f)
+    op_match = re.match(RE.OP_SEGMENT_DIR, f)
+    if explorer_match:
+      pass
+    elif op_match and os.path.isdir(fullpath):
+      segment_name = op_match.group('segment_name')
+      if segment_name.startswith(canonical_name):
+        for seg_f in os.listdir(fullpath):
+          segment_files[segment_name].append((os.path.join(fullpath, seg_f), seg_f))
+
+  # and a search through the files per kind and segment
+  segments = []
+  for segment, files in segment_files.items():
+    paths = [next((path for path, fn in files if SEGMENT_FILE_KINDS.get(fn) == kind), None) for kind in SEGMENT_PATH_KINDS]
+    segments.append(Segment(segment, *paths))
+  return sorted(segments, key=lambda seg: seg.name.segment_num)
+
+
+def timed(f, n=5):
+  st = time.perf_counter()
+  for _ in range(n):
+    f()
+  return (time.perf_counter() - st) / n * 1e3
+
+
+if __name__ == "__main__":
+  for n_segments in (10, 100, 1000, 5000):
+    with tempfile.TemporaryDirectory() as tmp:
+      os.environ["COMMA_CACHE"] = os.path.join(tmp, "cache")
+      data_dir = os.path.join(tmp, "realdata")
+      make_tree(data_dir, n_segments)
+
+      legacy = timed(lambda d=data_dir: legacy_scan(d, ROUTE))
+      scan = timed(lambda d=data_dir: Route(ROUTE, data_dir=d, use_cache=False).log_paths())
+      Route(ROUTE, data_dir=data_dir)
+      cached = timed(lambda d=data_dir: Route(ROUTE, data_dir=d).log_paths())
+      print(f"{n_segments:5d} segments, {OTHER_ROUTES * 100} other: legacy scan {legacy:8.2f} ms, single pass {scan:8.2f} ms, cached {cached:8.2f} ms")
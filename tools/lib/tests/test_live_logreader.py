@@ -0,0 +1,134 @@
+import random
+import time
+
+import cereal.messaging as messaging
+from openpilot.tools.lib.live_logreader import EventRing, LiveRecorder
+from openpilot.tools.lib.logreader import LogReader
+
+SERVICES = ['carState', 'controlsState']
+
+
+def check_ring(ring, pushed):
+  # the ring holds the newest events, byte for byte, in order
+  held = ring.events(0)
+  assert len(held) == len(ring)
+  assert [e[0] for e in held] == list(range(ring.seq - len(ring), ring.seq))
+  assert [(e[1], e[2], e[3]) for e in held] == pushed[ring.seq - len(ring):]
+
+
+def wait_for(cond, timeout=5.):
+  st = time.monotonic()
+  while not cond():
+    if time.monotonic() - st > timeout:
+      return False
+    time.sleep(0.01)
+  return True
+
+
+def publish(pm, n):
+  sent = []
+  for i in range(n):
+    for s in SERVICES:
+      msg = messaging.new_message(s)
+      msg.logMonoTime = i
+      sent.append(msg.to_bytes())
+      pm.send(s, sent[-1])
+  return sent
+
+
+class TestEventRing:
+  def test_wraps_and_evicts_oldest(self):
+    rng = random.Random(0)
+    ring = EventRing(1000, 64, ['a', 'b'])
+    pushed = []
+    for t in range(2000):
+      service = rng.randrange(2)
+      dat = bytes([t % 256]) * rng.randint(1, 120)
+      ring.push(service, dat, t)
+      pushed.append((ring.service_names[service], t, dat))
+      check_ring(ring, pushed)
+      assert sum(len(e[3]) for e in ring.events(0)) <= 1000
+    assert ring.received.sum() == 2000 and ring.dropped.sum() == 0
+
+  def test_index_bound(self):
+    ring = EventRing(1 << 16, 8, ['a'])
+    pushed = []
+    for t in range(20):
+      ring.push(0, b'x' * 10, t)
+      pushed.append(('a', t, b'x' * 10))
+    assert len(ring) == 8
+    check_ring(ring, pushed)
+
+  def test_dropped_only_when_unread(self):
+    ring = EventRing(100, 16, ['a', 'b'])
+    for t in range(10):
+      ring.push(t % 2, b'y' * 10, t)
+    assert ring.dropped.sum() == 0
+
+    # a reader that has read everything loses nothing to eviction
+    ring.read_seq = ring.seq
+    for t in range(10, 15):
+      ring.push(0, b'z' * 10, t)
+    assert ring.dropped.sum() == 0
+
+    # a reader that falls behind drops whatever is evicted before it reads
+    for t in range(15, 40):
+      ring.push(1, b'z' * 10, t)
+    assert ring.dropped.tolist() == [5, 15]
+    assert ring.read_seq == ring.seq - len(ring)
+
+    # events larger than the ring are dropped as they come in
+    ring.push(0, b'w' * 101, 40)
+    assert ring.dropped.tolist() == [6, 15] and ring.received.tolist() == [11, 30]
+
+  def test_first_seq_since(self):
+    ring = EventRing(1000, 64, ['a'])
+    for t in range(100):
+      ring.push(0, b'x' * 20, t * 10)
+    assert ring.seq - len(ring) == 50
+    assert ring.first_seq_since(0) == 50
+    assert ring.first_seq_since(905) == 91
+    assert ring.first_seq_since(10_000) == 100
+
+
+
+class TestLiveRecorder:
+  def test_record(self, tmp_path):
+    pm = messaging.PubMaster(SERVICES)
+    with LiveRecorder(SERVICES) as recorder:
+      for s in SERVICES:
+        assert pm.wait_for_readers_to_update(s, 5)
+      sent = publish(pm, 50)
+      assert wait_for(lambda: sum(st['received'] for st in recorder.stats.values()) == len(sent))
+
+      # everything once, each service in the order it was sent
+      read = recorder.read()
+      assert sorted(read) == sorted(sent)
+      for i in range(len(SERVICES)):
+        service_sent = sent[i::len(SERVICES)]
+        assert [dat for dat in read if dat in service_sent] == service_sent
+      assert recorder.read() == []
+      assert recorder.stats == {s: {'received': 50, 'dropped': 0} for s in SERVICES}
+
+      fn = str(tmp_path / "rlog")
+      assert recorder.snapshot(fn) == len(sent)
+
+    msgs = list(LogReader(fn))
+    for s in SERVICES:
+      assert [m.logMonoTime for m in msgs if m.which() == s] == list(range(50))
+
+  def test_dropped(self):
+    pm = messaging.PubMaster(SERVICES)
+    # room for a few events, a consumer that doesn't keep up loses the rest
+    with LiveRecorder(SERVICES, size=8 * 1024) as recorder:
+      for s in SERVICES:
+        assert pm.wait_for_readers_to_update(s, 5)
+      assert recorder.read() == []
+      sent = publish(pm, 200)
+      assert wait_for(lambda: sum(st['received'] for st in recorder.stats.values()) == len(sent))
+
+      read = recorder.read()
+      stats = recorder.stats
+      assert 0 < len(read) < len(sent)
+      assert all(st['received'] == 200 for st in stats.values())
+      assert sum(st['dropped'] for st in stats.values()) + len(read) == len(sent)
@@ -4,6 +4,7 @@ import io
 import shutil
 import tempfile
 import os
+import numpy as np
 import pytest
 import requests
 
@@ -24,6 +25,22 @@ def noop(segment: LogIterable):
   return segment
 
 
+def segment_signal(segment: LogIterable):
+  # big enough to go through shared memory, with a small array and a plain value next to it
+  t = np.array([m.logMonoTime for m in segment], dtype=np.int64)
+  return {'t': np.repeat(t, 1000), 'first': t[:1], 'n': len(t)}
+
+
+def make_local_route(path, n_segments, n_msgs=100):
+  paths = []
+  for i in range(n_segments):
+    paths.append(os.path.join(path, str(i), "rlog"))
+    os.makedirs(os.path.dirname(paths[-1]))
+    with open(paths[-1], "wb") as f:
+      f.write(b"".join(capnp_log.Event.new_message(logMonoTime=i * n_msgs + j).to_bytes() for j in range(n_msgs)))
+  return paths
+
+
 @contextlib.contextmanager
 def setup_source_scenario(mocker, is_internal=False):
   internal_source_mock = mocker.patch("openpilot.tools.lib.logreader.internal_source")
@@ -254,3 +271,23 @@ class TestLogReader:
       msgs = list(LogReader(qlog.name, only_union_types=True))
       assert len(msgs) == num_msgs
       [m.which() for m in msgs]
+
+  def test_map_segments(self, tmp_path):
+    paths = make_local_route(str(tmp_path), 8)
+    lr = LogReader(paths)
+
+    results = list(lr.map_segments(segment_signal, num_processes=4, max_in_flight=3))
+    assert sorted(r.index for r in results) == list(range(8))
+    for r in results:
+      assert r.result['n'] == 100 and r.result['first'][0] == r.index * 100
+      assert np.array_equal(r.result['t'], np.repeat(np.arange(r.index * 100, (r.index + 1) * 100), 1000))
+      assert r.shared_bytes == r.result['t'].nbytes
+
+    ordered = list(lr.map_segments(segment_signal, num_processes=4, ordered=True, max_in_flight=2))
+    assert [r.index for r in ordered] == list(range(8))
+
+    # stopping early doesn't hang or leak
+    for _ in lr.map_segments(segment_signal, num_processes=2):
+      break
+
+    assert len(lr.run_across_segments(4, noop)) == len(list(lr)) == 800
@@ -1,6 +1,8 @@
+import os
+import pytest
 from collections import namedtuple
 
-from openpilot.tools.lib.route import SegmentName
+from openpilot.tools.lib.route import MAX_REMOTE_CACHE_TTL, Route, SegmentName
 
 class TestRouteLibrary:
   def test_segment_name_formats(self):
@@ -25,3 +27,118 @@ class TestRouteLibrary:
 
     for case in cases:
       _validate(case)
+
+
+DONGLE_ID = "a2a0ccea32023010"
+LOG_ID = "2023-07-27--13-01-19"
+ROUTE = f"{DONGLE_ID}|{LOG_ID}"
+
+
+def touch(path):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, "w"):
+    pass
+
+
+def make_route_tree(data_dir, n_segments, skip=()):
+  # openpilot segment directories, plus another route and unrelated files that should be ignored
+  for i in range(n_segments):
+    if i not in skip:
+      for fn in ("rlog.zst", "qlog.zst", "fcamera.hevc", "qcamera.ts"):
+        touch(os.path.join(data_dir, f"{ROUTE}--{i}", fn))
+  touch(os.path.join(data_dir, f"{DONGLE_ID}|2023-07-28--10-00-00--0", "rlog.zst"))
+  touch(os.path.join(data_dir, "boot", "rlog.zst"))
+
+
+@pytest.fixture(autouse=True)
+def route_cache(tmp_path, monkeypatch):
+  monkeypatch.setenv("COMMA_CACHE", str(tmp_path / "cache"))
+
+
+class TestRoute:
+  def test_local_segments(self, tmp_path):
+    data_dir = str(tmp_path / "realdata")
+    make_route_tree(data_dir, 5, skip=(2,))
+    # explorer layout and a route directory with numbered segments
+    touch(os.path.join(data_dir, f"{ROUTE}--5--dcamera.hevc"))
+    touch(os.path.join(data_dir, ROUTE, "6", "qlog.bz2"))
+
+    route = Route(ROUTE, data_dir=data_dir, use_cache=False)
+    assert [s.name.segment_num for s in route.segments] == [0, 1, 3, 4, 5, 6]
+    assert route.max_seg_number == 6
+    assert route.log_paths() == [os.path.join(data_dir, f"{ROUTE}--{i}", "rlog.zst") for i in (0, 1)] + [None] + \
+                                [os.path.join(data_dir, f"{ROUTE}--{i}", "rlog.zst") for i in (3, 4)] + [None, None]
+    assert route.dcamera_paths()[5] == os.path.join(data_dir, f"{ROUTE}--5--dcamera.hevc")
+    assert route.qlog_paths()[6] == os.path.join(data_dir, ROUTE, "6", "qlog.bz2")
+    assert route.ecamera_paths() == [None] * 7
+
+    with pytest.raises(ValueError):
+      Route(f"{DONGLE_ID}|2023-07-29--10-00-00", data_dir=data_dir, use_cache=False)
+
+  def test_local_cache(self, tmp_path, mocker):
+    data_dir = str(tmp_path / "realdata")
+    make_route_tree(data_dir, 3)
+    expected = Route(ROUTE, data_dir=data_dir).log_paths()
+
+    scan = mocker.spy(Route, "_get_segments_local")
+    assert Route(ROUTE, data_dir=data_dir).log_paths() == expected
+    assert scan.call_count == 0
+
+    # a file added to a segment, and a new segment, are both noticed
+    os.utime(data_dir, ns=(0, 0))
+    touch(os.path.join(data_dir, f"{ROUTE}--3", "rlog.zst"))
+    assert len(Route(ROUTE, data_dir=data_dir).log_paths()) == 4
+    assert scan.call_count == 1
+
+    seg_dir = os.path.join(data_dir, f"{ROUTE}--0")
+    os.remove(os.path.join(seg_dir, "rlog.zst"))
+    os.utime(seg_dir, ns=(0, 0))
+    assert Route(ROUTE, data_dir=data_dir).log_paths()[0] is None
+    assert scan.call_count == 2
+
+  def test_remote_cache(self, mocker):
+    files = {"logs": [f"https://example.com/{DONGLE_ID}/{LOG_ID}/{i}/rlog.zst" for i in range(3)],
+             "qlogs": [f"https://example.com/{DONGLE_ID}/{LOG_ID}/{i}/qlog.zst" for i in range(2)]}
+    api = mocker.patch("openpilot.tools.lib.route.CommaApi")
+    api.return_value.get.return_value = files
+    token = mocker.patch("openpilot.tools.lib.route.get_token", return_value="token_a")
+
+    # not cached by default, segments can be uploaded at any time
+    Route(ROUTE)
+    Route(ROUTE)
+    assert api.return_value.get.call_count == 2
+
+    route = Route(ROUTE, cache_ttl=60)
+    assert route.log_paths() == files["logs"]
+    assert route.qlog_paths() == files["qlogs"] + [None]
+    assert api.return_value.get.call_count == 3
+
+    cached = Route(ROUTE, cache_ttl=60)
+    assert cached.log_paths() == route.log_paths() and cached.files == route.files
+    assert api.return_value.get.call_count == 3
+
+    # another account lists the route itself
+    token.return_value = "token_b"
+    Route(ROUTE, cache_ttl=60)
+    assert api.return_value.get.call_count == 4
+    api.assert_called_with("token_b")
+
+  def test_remote_cache_expires(self, mocker):
+    api = mocker.patch("openpilot.tools.lib.route.CommaApi")
+    api.return_value.get.return_value = {"logs": [f"https://example.com/{DONGLE_ID}/{LOG_ID}/0/rlog.zst"]}
+    mocker.patch("openpilot.tools.lib.route.get_token", return_value=None)
+    now = mocker.patch("openpilot.tools.lib.route.time.time", return_value=1000.)
+
+    Route(ROUTE, cache_ttl=60)
+    now.return_value = 1030.
+    Route(ROUTE, cache_ttl=60)
+    assert api.return_value.get.call_count == 1
+
+    now.return_value = 1061.
+    Route(ROUTE, cache_ttl=60)
+    assert api.return_value.get.call_count == 2
+
+    # never longer than the signed URLs are valid
+    now.return_value += MAX_REMOTE_CACHE_TTL + 1
+    Route(ROUTE, cache_ttl=1e9)
+    assert api.return_value.get.call_count == 3
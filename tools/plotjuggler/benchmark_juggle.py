@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+
+from cereal import messaging
+from openpilot.tools.lib.logreader import LogReader, save_log
+from openpilot.tools.plotjuggler.juggle import process, write_log
+
+N_SEGMENTS = int(os.getenv("N_SEGMENTS", "16"))
+N_MSGS = int(os.getenv("N_MSGS", "20000"))
+NUM_PROCESSES = int(os.getenv("NUM_PROCESSES", "24"))
+
+
+def make_route(path):
+  paths = []
+  for i in range(N_SEGMENTS):
+    msgs = []
+    for j in range(N_MSGS):
+      if j % 2:
+        msg = messaging.new_message('can', 20)
+        for k, c in enumerate(msg.can):
+          c.address, c.src, c.dat = k, 0, bytes(8)
+      else:
+        msg = messaging.new_message('modelV2')
+        msg.modelV2.position.x = [float(k) for k in range(33)]
+      msg.logMonoTime = (i * N_MSGS + j) * 1000
+      msgs.append(msg.to_bytes())
+    paths.append(os.path.join(path, str(i), "rlog"))
+    os.makedirs(os.path.dirname(paths[-1]))
+    with open(paths[-1], "wb") as f:
+      f.write(b"".join(msgs))
+  return paths
+
+
+def run(mode, paths):
+  # time to first plot is when PlotJuggler would be started
+  st = time.monotonic()
+  with tempfile.NamedTemporaryFile(suffix='.rlog') as tmp:
+    if mode == "legacy":
+      all_data = LogReader(paths).run_across_segments(NUM_PROCESSES, partial(process, False))
+      save_log(tmp.name, all_data, compress=False)
+      first = time.monotonic() - st
+    else:
+      first = None
+      for _ in write_log(LogReader(paths), tmp, False, compress=(mode == "stream"), num_processes=NUM_PROCESSES):
+        first = first or time.monotonic() - st
+    total = time.monotonic() - st
+    size = os.path.getsize(tmp.name)
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+  print(f"{mode:20} first plot {first:6.2f} s, all written {total:6.2f} s, {size / 1e6:7.1f} MB file, parent peak RSS {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 2:
+    run(sys.argv[1], sys.argv[2:])
+    sys.exit(0)
+
+  with tempfile.TemporaryDirectory() as tmp:
+    paths = make_route(tmp)
+    print(f"{N_SEGMENTS} segments of {N_MSGS} messages, {NUM_PROCESSES} processes")
+    # a fresh process per mode, so the peak memory is its own
+    for mode in ("legacy", "stream uncompressed", "stream"):
+      subprocess.check_call([sys.executable, __file__, mode] + paths)
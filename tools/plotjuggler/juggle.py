@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import platform
 import shutil
@@ -10,6 +11,10 @@ import requests
 import argparse
 from functools import partial
 
+import numpy as np
+import zstandard as zstd
+
+from cereal import log
 from opendbc.car.fingerprints import MIGRATION
 from openpilot.common.basedir import BASEDIR
 from openpilot.tools.lib.logreader import LogReader, ReadMode, save_log
@@ -24,6 +29,8 @@ INSTALL_DIR = os.path.join(juggle_dir, "bin")
 PLOTJUGGLER_BIN = os.path.join(juggle_dir, "bin/plotjuggler")
 MINIMUM_PLOTJUGGLER_VERSION = (3, 5, 2)
 MAX_STREAMING_BUFFER_SIZE = 1000
+# the log only lives while PlotJuggler has it open, fast beats small
+COMPRESSION_LEVEL = 3
 
 
 def install():
@@ -53,7 +60,7 @@ def get_plotjuggler_version():
   return tuple(map(int, version.split(".")))
 
 
-def start_juggler(fn=None, dbc=None, layout=None, route_or_segment_name=None):
+def start_juggler(fn=None, dbc=None, layout=None, route_or_segment_name=None, wait=True):
   env = os.environ.copy()
   env["BASEDIR"] = BASEDIR
   env["PATH"] = f"{INSTALL_DIR}:{os.getenv('PATH', '')}"
@@ -69,13 +76,62 @@ def start_juggler(fn=None, dbc=None, layout=None, route_or_segment_name=None):
     extra_args += f" --window_title \"{route_or_segment_name}\""
 
   cmd = f'{PLOTJUGGLER_BIN} --buffer_size {MAX_STREAMING_BUFFER_SIZE} --plugin_folders {INSTALL_DIR}{extra_args}'
-  subprocess.call(cmd, shell=True, env=env, cwd=juggle_dir)
+  if wait:
+    return subprocess.call(cmd, shell=True, env=env, cwd=juggle_dir)
+  return subprocess.Popen(cmd, shell=True, env=env, cwd=juggle_dir)
 
 
 def process(can, lr):
   return [d for d in lr if can or d.which() not in ['can', 'sendcan']]
 
 
+def get_dbc(cp):
+  try:
+    DBC = __import__(f"opendbc.car.{cp.carParams.carName}.values", fromlist=['DBC']).DBC
+    fingerprint = cp.carParams.carFingerprint
+    return DBC[MIGRATION.get(fingerprint, fingerprint)]['pt']
+  except Exception:
+    return None
+
+
+def layout_services(layout):
+  """The services a layout plots or uses in custom series, from their paths like /carState/vEgo"""
+  with open(os.path.join(juggle_dir, layout)) as f:
+    names = set(re.findall(r'(?<![\w./])/([A-Za-z]\w*)/', f.read()))
+  return names & set(log.Event.schema.union_fields)
+
+
+def encode_segment(can, services, compress, lr):
+  """
+  The messages of a segment PlotJuggler gets, serialized like save_log and compressed into one zstd frame,
+  and whether the segment has a carParams with the DBC inferred from the first one
+  """
+  dat = []
+  car_params, dbc = False, None
+  for msg in lr:
+    which = msg.which()
+    if which == 'carParams' and not car_params:
+      car_params, dbc = True, get_dbc(msg)
+    if (can or which not in ('can', 'sendcan')) and (services is None or which in services):
+      dat.append(msg.as_builder().to_bytes())
+  dat = b"".join(dat)
+  if compress:
+    dat = zstd.compress(dat, COMPRESSION_LEVEL)
+  return np.frombuffer(dat, dtype=np.uint8), car_params, dbc
+
+
+def write_log(lr, f, can, services=None, compress=True, num_processes=None):
+  """
+  Writes the log PlotJuggler reads to f segment by segment in route order, while the next segments decode in parallel.
+  Compressed, each segment is a zstd frame of its own. Yields whether each segment had a carParams and its DBC, once written.
+  """
+  for res in lr.map_segments(partial(encode_segment, can, services, compress), num_processes, ordered=True, desc="Writing log"):
+    dat, car_params, dbc = res.result
+    f.write(dat.data)
+    f.flush()
+    yield car_params, dbc
+
+
 def juggle_route(route_or_segment_name, can, layout, dbc=None):
   sr = LogReader(route_or_segment_name, default_mode=ReadMode.AUTO_INTERACTIVE)
 
@@ -84,12 +140,7 @@ def juggle_route(route_or_segment_name, can, layout, dbc=None):
   # Infer DBC name from logs
   if dbc is None:
     for cp in [m for m in all_data if m.which() == 'carParams']:
-      try:
-        DBC = __import__(f"opendbc.car.{cp.carParams.carName}.values", fromlist=['DBC']).DBC
-        fingerprint = cp.carParams.carFingerprint
-        dbc = DBC[MIGRATION.get(fingerprint, fingerprint)]['pt']
-      except Exception:
-        pass
+      dbc = get_dbc(cp)
       break
 
   with tempfile.NamedTemporaryFile(suffix='.rlog', dir=juggle_dir) as tmp:
@@ -98,6 +149,60 @@ def juggle_route(route_or_segment_name, can, layout, dbc=None):
     start_juggler(tmp.name, dbc, layout, route_or_segment_name)
 
 
+def publish_log(src, dst):
+  """Atomically replaces dst with a copy of what src has so far, a reader with dst open keeps the file it opened"""
+  tmp = dst + ".tmp"
+  shutil.copyfile(src, tmp)
+  os.replace(tmp, dst)
+
+
+def stream_route(route_or_segment_name, can, layout, dbc=None, all_services=False, compress=True):
+  """
+  Like juggle_route, without holding the route in memory: the log is written as segments decode and PlotJuggler
+  starts once the first segment is written. With a layout, only the services it uses are written.
+
+  PlotJuggler never gets the file that is being appended to, it opens a finished copy of the first segments,
+  and the whole log replaces it once written, for a reload.
+  """
+  sr = LogReader(route_or_segment_name, default_mode=ReadMode.AUTO_INTERACTIVE)
+  services = None
+  if layout is not None and not all_services:
+    services = layout_services(layout) or None
+    if services is not None and can:
+      services |= {'can', 'sendcan'}
+
+  pj = None
+  find_dbc = dbc is None
+  # PlotJuggler loads the DBC once, so CAN without --dbc waits for a carParams or the end of the route
+  wait_for_dbc = can and find_dbc
+  with tempfile.TemporaryDirectory(dir=juggle_dir) as tmp_dir:
+    fn = os.path.join(tmp_dir, 'route.rlog.zst' if compress else 'route.rlog')
+    part_fn = fn + '.part'
+    with open(part_fn, 'wb') as f:
+      segments = write_log(sr, f, can, services, compress, num_processes=24)
+      try:
+        for car_params, seg_dbc in segments:
+          if find_dbc and car_params:
+            dbc, find_dbc = seg_dbc, False
+          if pj is None:
+            if not (wait_for_dbc and find_dbc):
+              publish_log(part_fn, fn)
+              pj = start_juggler(fn, dbc, layout, route_or_segment_name, wait=False)
+          elif pj.poll() is not None:
+            break  # PlotJuggler was closed
+        else:
+          os.replace(part_fn, fn)
+          if pj is None:
+            print("No carParams found in the route, CAN is not decoded. Set the DBC with --dbc")
+            pj = start_juggler(fn, dbc, layout, route_or_segment_name, wait=False)
+          elif len(sr.logreader_identifiers) > 1:
+            print(f"All {len(sr.logreader_identifiers)} segments written, reload the data in PlotJuggler to plot the whole route")
+      finally:
+        segments.close()
+    if pj is not None:
+      pj.wait()
+
+
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description="A helper to run PlotJuggler on openpilot routes",
                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -105,6 +210,9 @@ if __name__ == "__main__":
   parser.add_argument("--demo", action="store_true", help="Use the demo route instead of providing one")
   parser.add_argument("--can", action="store_true", help="Parse CAN data")
   parser.add_argument("--stream", action="store_true", help="Start PlotJuggler in streaming mode")
+  parser.add_argument("--stream-log", action="store_true",
+                      help="Write the log as segments decode and start PlotJuggler once the first is written, with a layout only its services")
+  parser.add_argument("--all-services", action="store_true", help="With --stream-log and a layout, write every service")
   parser.add_argument("--layout", nargs='?', help="Run PlotJuggler with a pre-defined layout")
   parser.add_argument("--install", action="store_true", help="Install or update PlotJuggler + plugins")
   parser.add_argument("--dbc", help="Set the DBC name to load for parsing CAN data. If not set, the DBC will be automatically inferred from the logs.")
@@ -131,4 +239,7 @@ if __name__ == "__main__":
     start_juggler(layout=args.layout)
   else:
     route_or_segment_name = DEMO_ROUTE if args.demo else args.route_or_segment_name.strip()
-    juggle_route(route_or_segment_name, args.can, args.layout, args.dbc)
+    if args.stream_log:
+      stream_route(route_or_segment_name, args.can, args.layout, args.dbc, args.all_services)
+    else:
+      juggle_route(route_or_segment_name, args.can, args.layout, args.dbc)
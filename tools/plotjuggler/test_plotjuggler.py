@@ -4,32 +4,136 @@ import signal
 import subprocess
 import time
 
+import zstandard as zstd
+
+from cereal import messaging
 from openpilot.common.basedir import BASEDIR
 from openpilot.common.timeout import Timeout
-from openpilot.tools.plotjuggler.juggle import DEMO_ROUTE, install
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.plotjuggler import juggle
+from openpilot.tools.plotjuggler.juggle import DEMO_ROUTE, install, layout_services, process, write_log
 
 PJ_DIR = os.path.join(BASEDIR, "tools/plotjuggler")
 
+
+def make_route(path, n_segments=4, n_msgs=200):
+  paths = []
+  for i in range(n_segments):
+    msgs = []
+    for j in range(n_msgs):
+      service = ('carState', 'can', 'carParams', 'controlsState')[j % 4]
+      msg = messaging.new_message(service, 2) if service == 'can' else messaging.new_message(service)
+      msg.logMonoTime = i * n_msgs + j
+      msgs.append(msg.to_bytes())
+    paths.append(os.path.join(path, str(i), "rlog"))
+    os.makedirs(os.path.dirname(paths[-1]))
+    with open(paths[-1], "wb") as f:
+      f.write(b"".join(msgs))
+  return paths
+
+
+def read_log(fn, compress):
+  with open(fn, "rb") as f:
+    dat = f.read()
+  if compress:
+    dat = zstd.ZstdDecompressor().stream_reader(dat, read_across_frames=True).readall()
+  return dat
+
+
+def run_juggle(args):
+  pj = os.path.join(PJ_DIR, "juggle.py")
+  with subprocess.Popen(f'QT_QPA_PLATFORM=offscreen {pj} {args}',
+                         stderr=subprocess.PIPE, shell=True, start_new_session=True) as p:
+    # Wait for "Done reading Rlog data" signal from the plugin
+    output = "\n"
+    with Timeout(180, error_msg=output):
+      while output.splitlines()[-1] != "Done reading Rlog data":
+        output += p.stderr.readline().decode("utf-8")
+
+    # ensure plotjuggler didn't crash after exiting the plugin
+    time.sleep(2)
+    assert p.poll() is None
+    os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+
+    assert "Raw file read failed" not in output
+
+
 class TestPlotJuggler:
 
   def test_demo(self):
     install()
+    run_juggle(f'"{DEMO_ROUTE}/:2"')
+
+  def test_demo_stream_log(self):
+    # the compressed log, one zstd frame per segment
+    install()
+    run_juggle(f'--stream-log "{DEMO_ROUTE}/:2"')
+
+  def test_stream_log(self, tmp_path):
+    paths = make_route(str(tmp_path))
+    for can in (False, True):
+      for compress in (False, True):
+        # the same bytes save_log writes from the whole route in memory
+        expected = b"".join(m.as_builder().to_bytes() for m in process(can, LogReader(paths)))
+        fn = str(tmp_path / f"{can}_{compress}.rlog")
+        with open(fn, "wb") as f:
+          segments = list(write_log(LogReader(paths), f, can, compress=compress, num_processes=2))
+        assert segments == [(True, None)] * len(paths)
+        assert read_log(fn, compress) == expected
+
+  def test_stream_log_services(self, tmp_path):
+    paths = make_route(str(tmp_path))
+    expected = b"".join(m.as_builder().to_bytes() for m in LogReader(paths) if m.which() in ('carState', 'can'))
+    fn = str(tmp_path / "services.rlog")
+    with open(fn, "wb") as f:
+      list(write_log(LogReader(paths), f, True, services={'carState', 'can'}, num_processes=2))
+    assert read_log(fn, True) == expected
+
+  def test_stream_route_dbc(self, mocker):
+    # with CAN and no --dbc, PlotJuggler starts once a segment has a carParams, or at the end of the route
+    mocker.patch.object(juggle, "LogReader").return_value.logreader_identifiers = ["0", "1", "2"]
+    start = mocker.patch.object(juggle, "start_juggler")
+    start.return_value.poll.return_value = None
+    for can, segments, expected_dbc in ((True, [(False, None), (True, "dbc_a"), (True, "dbc_b")], "dbc_a"),
+                                        (True, [(False, None)] * 3, None),
+                                        (False, [(False, None), (True, "dbc_a")], None)):
+      start.reset_mock()
+      mocker.patch.object(juggle, "write_log", return_value=(seg for seg in segments))
+      juggle.stream_route("route", can, None)
+      assert start.call_count == 1
+      assert start.call_args.args[1] == expected_dbc
+
+  def test_stream_route_finished_file(self, mocker, tmp_path):
+    # PlotJuggler opens a file that isn't appended to, the whole log replaces it at the end
+    mocker.patch.object(juggle, "juggle_dir", str(tmp_path))
+    mocker.patch.object(juggle, "LogReader").return_value.logreader_identifiers = ["0", "1", "2"]
+    def fake_write_log(lr, f, *args, **kwargs):
+      for i in range(3):
+        f.write(f"segment {i};".encode())
+        f.flush()
+        yield True, None
+    mocker.patch.object(juggle, "write_log", side_effect=fake_write_log)
+
+    opened = {}
+    def fake_start_juggler(fn, *args, **kwargs):
+      opened['fn'], opened['f'] = fn, open(fn, "rb")
+      pj = mocker.MagicMock()
+      pj.poll.return_value = None
+      pj.wait.side_effect = lambda: opened.update(final=read_log(fn, False))
+      return pj
+    mocker.patch.object(juggle, "start_juggler", side_effect=fake_start_juggler)
+
+    juggle.stream_route("route", False, None)
+    with opened['f'] as f:
+      assert f.read() == b"segment 0;"
+    assert opened['final'] == b"segment 0;segment 1;segment 2;"
+    assert opened['fn'].endswith(".rlog.zst")
+    assert os.listdir(tmp_path) == []
 
-    pj = os.path.join(PJ_DIR, "juggle.py")
-    with subprocess.Popen(f'QT_QPA_PLATFORM=offscreen {pj} "{DEMO_ROUTE}/:2"',
-                           stderr=subprocess.PIPE, shell=True, start_new_session=True) as p:
-      # Wait for "Done reading Rlog data" signal from the plugin
-      output = "\n"
-      with Timeout(180, error_msg=output):
-        while output.splitlines()[-1] != "Done reading Rlog data":
-          output += p.stderr.readline().decode("utf-8")
-
-      # ensure plotjuggler didn't crash after exiting the plugin
-      time.sleep(2)
-      assert p.poll() is None
-      os.killpg(os.getpgid(p.pid), signal.SIGTERM)
-
-      assert "Raw file read failed" not in output
+  def test_layout_services(self):
+    assert layout_services("layouts/longitudinal.xml") >= {'carState', 'carControl', 'controlsState', 'longitudinalPlan'}
+    # custom series only reference their sources
+    assert 'gpsLocationExternal' in layout_services("layouts/gps_vs_llk.xml")
 
   # TODO: also test that layouts successfully load
   def test_layouts(self, subtests):
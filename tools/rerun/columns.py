@@ -0,0 +1,225 @@
+"""
+Turns log messages into the scalar series rerun plots, one column per entity path.
+
+The entity paths are the ones walking msg.to_dict() gives: every int, float and bool field, recursing into structs,
+groups and the active union member, and the numeric items of lists as <field>/<index>. Lists of structs are only
+walked when they are the message itself, like can or pandaStates. Enums, text and data are not plottable.
+
+Instead of building a dict per message, each struct schema is compiled once into an attrgetter of its scalar fields,
+its numeric lists and the structs to descend into. Values are collected per entity path and turned into arrays at the end.
+"""
+from operator import attrgetter
+
+import numpy as np
+
+NUMERIC_TYPES = {'bool', 'int8', 'int16', 'int32', 'int64', 'uint8', 'uint16', 'uint32', 'uint64', 'float32', 'float64'}
+
+SCALAR, LIST, STRUCT = range(3)
+
+
+def _field_kind(field):
+  """SCALAR, LIST of scalars, STRUCT or group, or None for what is never plotted"""
+  if field.proto.which() == 'group':
+    return STRUCT
+  t = field.proto.slot.type
+  which = t.which()
+  if which in NUMERIC_TYPES:
+    return SCALAR
+  if which == 'list' and t.list.elementType.which() in NUMERIC_TYPES:
+    return LIST
+  if which == 'struct':
+    return STRUCT
+  return None
+
+
+class StructPlan:
+  """The plottable fields of a struct schema"""
+  def __init__(self, schema):
+    self.schema = schema
+    self.scalars, self.lists, self.structs = [], [], []
+    for name in schema.non_union_fields:
+      field = schema.fields[name]
+      kind = _field_kind(field)
+      if kind == SCALAR:
+        self.scalars.append(name)
+      elif kind == LIST:
+        self.lists.append(name)
+      elif kind == STRUCT:
+        # null struct pointers are left out of to_dict, groups are always there
+        self.structs.append((name, field.proto.which() != 'group'))
+    self.get_scalars = attrgetter(*self.scalars) if len(self.scalars) > 1 else \
+                       (lambda r, name=self.scalars[0]: (getattr(r, name),)) if self.scalars else None
+
+    # the active union member is always in to_dict, even as a null pointer
+    self.union = {name: _field_kind(schema.fields[name]) for name in schema.union_fields}
+
+  def substruct(self, name):
+    return plan_for(self.schema.fields[name].schema)
+
+
+_plans: dict[int, StructPlan] = {}
+
+
+def plan_for(schema) -> StructPlan:
+  plan = _plans.get(schema.node.id)
+  if plan is None:
+    plan = _plans[schema.node.id] = StructPlan(schema)
+  return plan
+
+
+class _ListColumns:
+  """A numeric list field, its items are the series <path>/<index>"""
+  __slots__ = ('path', 'times', 'values')
+
+  def __init__(self, path):
+    self.path = path
+    self.times, self.values = [], []
+
+  def add(self, t, values):
+    if len(values):
+      self.times.append(t)
+      self.values.append(list(values))
+
+  def columns(self):
+    if not self.times:
+      return
+    times = np.array(self.times, dtype=np.int64)
+    lengths = np.fromiter(map(len, self.values), dtype=np.int64, count=len(self.values))
+    if (lengths == lengths[0]).all():
+      data = np.array(self.values, dtype=np.float64)
+      for i in range(data.shape[1]):
+        yield f"{self.path}/{i}", times, data[:, i]
+      return
+    for i in range(lengths.max()):
+      mask = lengths > i
+      yield f"{self.path}/{i}", times[mask], np.array([v[i] for v in self.values if len(v) > i], dtype=np.float64)
+
+
+class _StructColumns:
+  """The series of one struct at one entity path, the scalars of each message are one row"""
+  __slots__ = ('plan', 'path', 'times', 'rows', 'lists', 'structs', 'union')
+
+  def __init__(self, plan, path):
+    self.plan, self.path = plan, path
+    self.times, self.rows = [], []
+    self.lists = [_ListColumns(f"{path}/{name}") for name in plan.lists]
+    self.structs = {}
+    self.union = {}
+
+  def _child(self, name):
+    child = self.structs.get(name)
+    if child is None:
+      child = self.structs[name] = _StructColumns(self.plan.substruct(name), f"{self.path}/{name}")
+    return child
+
+  def add(self, t, reader):
+    plan = self.plan
+    if plan.get_scalars is not None:
+      self.times.append(t)
+      self.rows.append(plan.get_scalars(reader))
+    for lc, name in zip(self.lists, plan.lists, strict=True):
+      lc.add(t, getattr(reader, name))
+    for name, pointer in plan.structs:
+      if not pointer or reader._has(name):
+        self._child(name).add(t, getattr(reader, name))
+    if plan.union:
+      which = reader.which()
+      kind = plan.union[which]
+      if kind is not None:
+        self._union(which, kind).add(t, getattr(reader, which))
+
+  def _union(self, which, kind):
+    col = self.union.get(which)
+    if col is None:
+      path = f"{self.path}/{which}"
+      col = self.union[which] = _ScalarColumn(path) if kind == SCALAR else _ListColumns(path) if kind == LIST else \
+                                _StructColumns(self.plan.substruct(which), path)
+    return col
+
+  def columns(self):
+    if self.times:
+      times = np.array(self.times, dtype=np.int64)
+      data = np.array(self.rows, dtype=np.float64)
+      for i, name in enumerate(self.plan.scalars):
+        yield f"{self.path}/{name}", times, data[:, i]
+    for col in (*self.lists, *self.structs.values(), *self.union.values()):
+      yield from col.columns()
+
+
+class _ScalarColumn:
+  __slots__ = ('path', 'times', 'values')
+
+  def __init__(self, path):
+    self.path = path
+    self.times, self.values = [], []
+
+  def add(self, t, value):
+    self.times.append(t)
+    self.values.append(value)
+
+  def columns(self):
+    if self.times:
+      yield self.path, np.array(self.times, dtype=np.int64), np.array(self.values, dtype=np.float64)
+
+
+class _StructListColumns:
+  """A service that is a list of structs, like can, walked per item as <service>/<index>"""
+  __slots__ = ('plan', 'path', 'items')
+
+  def __init__(self, plan, path):
+    self.plan, self.path = plan, path
+    self.items = []
+
+  def add(self, t, readers):
+    for i, r in enumerate(readers):
+      if i == len(self.items):
+        self.items.append(_StructColumns(self.plan, f"{self.path}/{i}"))
+      self.items[i].add(t, r)
+
+  def columns(self):
+    for item in self.items:
+      yield from item.columns()
+
+
+class LogColumns:
+  """Collects the plottable fields of log messages into columns, per entity path"""
+  def __init__(self, skip=('thumbnail',)):
+    self.skip = set(skip)
+    self.services = {}
+    self.count = 0
+
+  def _service(self, msg, which):
+    field = msg.schema.fields[which]
+    col = None
+    if field.proto.which() == 'group':
+      col = _StructColumns(plan_for(field.schema), which)
+    else:
+      t = field.proto.slot.type
+      if t.which() == 'struct':
+        col = _StructColumns(plan_for(field.schema), which)
+      elif t.which() == 'list' and t.list.elementType.which() in NUMERIC_TYPES:
+        col = _ListColumns(which)
+      elif t.which() == 'list' and t.list.elementType.which() == 'struct':
+        col = _StructListColumns(plan_for(field.schema.elementType), which)
+    self.services[which] = col
+    return col
+
+  def add(self, msg):
+    which = msg.which()
+    if which in self.skip:
+      return
+    col = self.services[which] if which in self.services else self._service(msg, which)
+    if col is not None:
+      col.add(msg.logMonoTime, getattr(msg, which))
+    self.count += 1
+
+  def extend(self, msgs):
+    for msg in msgs:
+      self.add(msg)
+    return self
+
+  def columns(self):
+    """(entity path, logMonoTime, values) of every series, as int64 and float64 arrays"""
+    for col in self.services.values():
+      if col is not None:
+        yield from col.columns()
@@ -6,9 +6,9 @@ import multiprocessing
 import rerun as rr
 import rerun.blueprint as rrb
 from functools import partial
-from collections import defaultdict
 
 from cereal.services import SERVICE_LIST
+from openpilot.tools.rerun.columns import LogColumns
 from openpilot.tools.rerun.camera_reader import probe_packet_info, CameraReader, CameraConfig, CameraType
 from openpilot.tools.lib.logreader import LogReader
 from openpilot.tools.lib.route import Route, SegmentRange
@@ -70,32 +70,6 @@ class Rerunner:
     )
     return blueprint
 
-  @staticmethod
-  def _parse_msg(msg, parent_key=''):
-    stack = [(msg, parent_key)]
-    while stack:
-      current_msg, current_parent_key = stack.pop()
-      if isinstance(current_msg, list):
-        for index, item in enumerate(current_msg):
-          new_key = f"{current_parent_key}/{index}"
-          if isinstance(item, (int, float)):
-            yield new_key, item
-          elif isinstance(item, dict):
-            stack.append((item, new_key))
-      elif isinstance(current_msg, dict):
-        for key, value in current_msg.items():
-          new_key = f"{current_parent_key}/{key}"
-          if isinstance(value, (int, float)):
-            yield new_key, value
-          elif isinstance(value, dict):
-            stack.append((value, new_key))
-          elif isinstance(value, list):
-            for index, item in enumerate(value):
-              if isinstance(item, (int, float)):
-                yield f"{new_key}/{index}", item
-      else:
-        pass  # Not a plottable value
-
   @staticmethod
   @rr.shutdown_at_exit
   def _process_log_msgs(blueprint, lr):
@@ -103,22 +77,11 @@ class Rerunner:
     rr.connect()
     rr.send_blueprint(blueprint)
 
-    log_msgs = defaultdict(lambda: defaultdict(list))
-    for msg in lr:
-      msg_type = msg.which()
-
-      if msg_type == "thumbnail":
-        continue
-
-      for entity_path, dat in Rerunner._parse_msg(msg.to_dict()[msg_type], msg_type):
-        log_msgs[entity_path]["times"].append(msg.logMonoTime)
-        log_msgs[entity_path]["data"].append(dat)
-
-    for entity_path, log_msg in log_msgs.items():
+    for entity_path, times, data in LogColumns().extend(lr).columns():
       rr.send_columns(
         entity_path,
-        times=[rr.TimeNanosColumn(RR_TIMELINE_NAME, log_msg["times"])],
-        components=[rr.components.ScalarBatch(log_msg["data"])]
+        times=[rr.TimeNanosColumn(RR_TIMELINE_NAME, times)],
+        components=[rr.components.ScalarBatch(data)]
       )
 
     return []
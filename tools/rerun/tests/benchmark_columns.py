@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+import sys
+import time
+
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.rerun.columns import LogColumns
+from openpilot.tools.rerun.tests.test_columns import to_dict_series
+
+DEMO_SEGMENT = "a2a0ccea32023010|2023-07-27--13-01-19/0"
+
+
+if __name__ == "__main__":
+  # a route, segment or local rlog, the logs are read into memory first to time only the export
+  msgs = list(LogReader(sys.argv[1] if len(sys.argv) > 1 else DEMO_SEGMENT))
+  print(f"{len(msgs)} messages")
+
+  st = time.monotonic()
+  expected = to_dict_series(msgs)
+  legacy = time.monotonic() - st
+
+  st = time.monotonic()
+  got = {path: (times, data) for path, times, data in LogColumns().extend(msgs).columns()}
+  columns = time.monotonic() - st
+
+  assert set(got) == set(expected)
+  print(f"{len(got)} series")
+  print(f"to_dict:  {len(msgs) / legacy:10.0f} msgs/s")
+  print(f"columns:  {len(msgs) / columns:10.0f} msgs/s, {legacy / columns:.1f}x")
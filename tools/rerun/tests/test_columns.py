@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+
+from cereal import messaging
+from openpilot.tools.rerun.columns import LogColumns
+
+
+def to_dict_series(msgs, skip=('thumbnail',)):
+  """The series walking msg.to_dict() gives, what run.py logged before"""
+  series = {}
+  for msg in msgs:
+    which = msg.which()
+    if which in skip:
+      continue
+    stack = [(msg.to_dict()[which], which)]
+    while stack:
+      cur, key = stack.pop()
+      items = enumerate(cur) if isinstance(cur, list) else cur.items() if isinstance(cur, dict) else ()
+      for k, v in items:
+        path = f"{key}/{k}"
+        if isinstance(v, (int, float)):
+          series.setdefault(path, ([], []))
+          series[path][0].append(msg.logMonoTime)
+          series[path][1].append(v)
+        elif isinstance(v, dict):
+          stack.append((v, path))
+        elif isinstance(v, list) and isinstance(cur, dict):
+          for i, x in enumerate(v):
+            if isinstance(x, (int, float)):
+              series.setdefault(f"{path}/{i}", ([], []))
+              series[f"{path}/{i}"][0].append(msg.logMonoTime)
+              series[f"{path}/{i}"][1].append(x)
+  return series
+
+
+def make_msgs(n=300, seed=0):
+  rng = random.Random(seed)
+  msgs = []
+  for t in range(n):
+    service = rng.choice(['carState', 'can', 'modelV2', 'deviceState', 'pandaStates', 'thumbnail'])
+    if service == 'can':
+      msg = messaging.new_message('can', rng.randint(0, 3))
+      for c in msg.can:
+        c.address, c.src, c.dat = rng.randint(0, 0x7ff), rng.randint(0, 2), b'\x01' * 8
+    elif service == 'pandaStates':
+      msg = messaging.new_message('pandaStates', rng.randint(1, 2))
+      for ps in msg.pandaStates:
+        ps.voltage, ps.ignitionLine = rng.randint(0, 15000), rng.random() > 0.5
+    else:
+      msg = messaging.new_message(service)
+      if service == 'carState':
+        msg.carState.vEgo, msg.carState.gasPressed = rng.random(), rng.random() > 0.5
+        msg.carState.cruiseState.speed = rng.random()
+      elif service == 'modelV2':
+        msg.modelV2.position.x = [rng.random() for _ in range(rng.choice([0, 33]))]
+        msg.modelV2.meta.disengagePredictions.brakeDisengageProbs = [rng.random() for _ in range(rng.randint(0, 5))]
+      elif service == 'deviceState':
+        msg.deviceState.cpuTempC = [rng.random() for _ in range(rng.randint(1, 8))]
+    msg.logMonoTime = t
+    msgs.append(msg.as_reader())
+  return msgs
+
+
+def test_same_series_as_to_dict():
+  msgs = make_msgs()
+  expected = to_dict_series(msgs)
+  got = {path: (times, data) for path, times, data in LogColumns().extend(msgs).columns()}
+  assert set(got) == set(expected)
+  for path, (times, values) in expected.items():
+    assert np.array_equal(got[path][0], times), path
+    assert np.array_equal(got[path][1], np.array(values, dtype=np.float64), equal_nan=True), path
+
+
+def test_skip():
+  msgs = make_msgs()
+  paths = {path for path, _, _ in LogColumns(skip=('thumbnail', 'can')).extend(msgs).columns()}
+  assert paths and not any(p.startswith(('can/', 'thumbnail/')) for p in paths)
@@ -1,13 +1,60 @@
 import numpy as np
 import os
-import pyopencl as cl
-import pyopencl.array as cl_array
 
 from msgq.visionipc import VisionIpcServer, VisionStreamType
 from cereal import messaging
 
 from openpilot.common.basedir import BASEDIR
 from openpilot.tools.sim.lib.common import W, H
+from openpilot.tools.sim.lib.rgb_to_nv12 import RgbToNv12
+
+# "cl" or "cpu", by default OpenCL is used when a device is available
+YUV_BACKEND = os.getenv("SIM_YUV_BACKEND")
+YUV_THREADS = int(os.getenv("SIM_YUV_THREADS", str(min(4, os.cpu_count() or 1))))
+
+
+class ClRgbToNv12:
+  """Runs rgb_to_nv12.cl, device buffers are allocated once"""
+  def __init__(self, width, height):
+    import pyopencl as cl
+    import pyopencl.array as cl_array
+    self.cl = cl
+
+    self.ctx = cl.create_some_context()
+    self.queue = cl.CommandQueue(self.ctx)
+    defines = {'HEIGHT': height, 'WIDTH': width, 'RGB_STRIDE': width * 3, 'UV_WIDTH': width // 2, 'UV_HEIGHT': height // 2, 'RGB_SIZE': width * height}
+    cl_arg = "".join(f" -D{k}={v}" for k, v in defines.items()) + " -DCL_DEBUG "
+
+    kernel_fn = os.path.join(BASEDIR, "tools/sim/rgb_to_nv12.cl")
+    with open(kernel_fn) as f:
+      prg = cl.Program(self.ctx, f.read()).build(cl_arg)
+      self.krnl = prg.rgb_to_nv12
+    self.Wdiv4 = width // 4 if (width % 4 == 0) else (width + (4 - width % 4)) // 4
+    self.Hdiv4 = height // 4 if (height % 4 == 0) else (height + (4 - height % 4)) // 4
+
+    self.size = width * height * 3 // 2
+    self.rgb_cl = cl_array.empty(self.queue, (height, width, 3), dtype=np.uint8)
+    self.yuv_cl = cl.Buffer(self.ctx, cl.mem_flags.WRITE_ONLY, self.size)
+
+  def __call__(self, rgb, out=None):
+    if out is None:
+      out = np.empty(self.size, dtype=np.uint8)
+    self.rgb_cl.set(rgb)
+    self.krnl(self.queue, (self.Wdiv4, self.Hdiv4), None, self.rgb_cl.data, self.yuv_cl)
+    self.cl.enqueue_copy(self.queue, out, self.yuv_cl).wait()
+    return out
+
+
+def get_rgb_to_nv12(width, height):
+  if YUV_BACKEND != "cpu":
+    try:
+      return ClRgbToNv12(width, height)
+    except Exception as e:
+      if YUV_BACKEND == "cl":
+        raise
+      print(f"OpenCL unavailable ({e}), converting camera frames on the CPU")
+  return RgbToNv12(width, height, threads=YUV_THREADS)
+
 
 class Camerad:
   """Simulates the camerad daemon"""
@@ -24,17 +71,9 @@ class Camerad:
 
     self.vipc_server.start_listener()
 
-    # set up for pyopencl rgb to yuv conversion
-    self.ctx = cl.create_some_context()
-    self.queue = cl.CommandQueue(self.ctx)
-    cl_arg = f" -DHEIGHT={H} -DWIDTH={W} -DRGB_STRIDE={W * 3} -DUV_WIDTH={W // 2} -DUV_HEIGHT={H // 2} -DRGB_SIZE={W * H} -DCL_DEBUG "
-
-    kernel_fn = os.path.join(BASEDIR, "tools/sim/rgb_to_nv12.cl")
-    with open(kernel_fn) as f:
-      prg = cl.Program(self.ctx, f.read()).build(cl_arg)
-      self.krnl = prg.rgb_to_nv12
-    self.Wdiv4 = W // 4 if (W % 4 == 0) else (W + (4 - W % 4)) // 4
-    self.Hdiv4 = H // 4 if (H % 4 == 0) else (H + (4 - H % 4)) // 4
+    self.rgb_to_nv12 = get_rgb_to_nv12(W, H)
+    # VisionIPC copies frames on send, so one buffer is reused for every frame
+    self.yuv = np.empty(W * H * 3 // 2, dtype=np.uint8)
 
   def cam_send_yuv_road(self, yuv):
     self._send_yuv(yuv, self.frame_road_id, 'roadCameraState', VisionStreamType.VISION_STREAM_ROAD)
@@ -44,16 +83,11 @@ class Camerad:
     self._send_yuv(yuv, self.frame_wide_id, 'wideRoadCameraState', VisionStreamType.VISION_STREAM_WIDE_ROAD)
     self.frame_wide_id += 1
 
-  # Returns: yuv bytes
+  # Returns: NV12 frame, valid until the next call
   def rgb_to_yuv(self, rgb):
     assert rgb.shape == (H, W, 3), f"{rgb.shape}"
     assert rgb.dtype == np.uint8
-
-    rgb_cl = cl_array.to_device(self.queue, rgb)
-    yuv_cl = cl_array.empty_like(rgb_cl)
-    self.krnl(self.queue, (self.Wdiv4, self.Hdiv4), None, rgb_cl.data, yuv_cl.data).wait()
-    yuv = np.resize(yuv_cl.get(), rgb.size // 2)
-    return yuv.data.tobytes()
+    return self.rgb_to_nv12(rgb, self.yuv)
 
   def _send_yuv(self, yuv, frame_id, pub_type, yuv_type):
     eof = int(frame_id * 0.05 * 1e9)
@@ -0,0 +1,82 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RgbToNv12:
+  """
+  CPU version of rgb_to_nv12.cl, bit for bit. Input pixels are in the kernel's byte order
+  (b, g, r), chroma is taken from the 2x2 pixel average. All arithmetic is done in uint16
+  scratch buffers allocated once, which is wide enough for every intermediate of the kernel.
+  With threads > 1 the frame is split into row bands, numpy releases the GIL while converting.
+  """
+  def __init__(self, width, height, threads=1):
+    assert width % 2 == 0 and height % 2 == 0, "NV12 needs an even width and height"
+    self.width, self.height = width, height
+    self.size = width * height * 3 // 2
+
+    threads = max(1, min(threads, height // 2))
+    edges = [2 * (height // 2 * i // threads) for i in range(threads + 1)]
+    self.bands = [(lo, hi, self._scratch(hi - lo)) for lo, hi in zip(edges[:-1], edges[1:], strict=True)]
+    self.pool = ThreadPoolExecutor(threads) if threads > 1 else None
+
+  def _scratch(self, rows):
+    y_shape, uv_shape = (rows, self.width), (rows // 2, self.width // 2)
+    return {
+      'y': np.empty(y_shape, dtype=np.uint16), 'y_tmp': np.empty(y_shape, dtype=np.uint16),
+      'b': np.empty(uv_shape, dtype=np.uint16), 'g': np.empty(uv_shape, dtype=np.uint16), 'r': np.empty(uv_shape, dtype=np.uint16),
+      'uv': np.empty(uv_shape, dtype=np.uint16), 'uv_tmp': np.empty(uv_shape, dtype=np.uint16),
+    }
+
+  def __call__(self, rgb, out=None):
+    """Converts an (height, width, 3) uint8 frame into out, a flat uint8 array of size width * height * 3 / 2"""
+    assert rgb.shape == (self.height, self.width, 3), f"{rgb.shape}"
+    assert rgb.dtype == np.uint8
+    if out is None:
+      out = np.empty(self.size, dtype=np.uint8)
+    assert out.shape == (self.size,) and out.dtype == np.uint8
+
+    y_plane = out[:self.width * self.height].reshape(self.height, self.width)
+    uv_plane = out[self.width * self.height:].reshape(self.height // 2, self.width)
+    if self.pool is None:
+      for lo, hi, s in self.bands:
+        self._convert(rgb[lo:hi], y_plane[lo:hi], uv_plane[lo // 2:hi // 2], s)
+    else:
+      futures = [self.pool.submit(self._convert, rgb[lo:hi], y_plane[lo:hi], uv_plane[lo // 2:hi // 2], s) for lo, hi, s in self.bands]
+      for f in futures:
+        f.result()
+    return out
+
+  @staticmethod
+  def _convert(rgb, y_out, uv_out, s):
+    # RGB_TO_Y: ((b * 13 + g * 65 + r * 33 + 64) >> 7) + 16
+    y, tmp = s['y'], s['y_tmp']
+    np.multiply(rgb[..., 0], 13, out=y, dtype=np.uint16)
+    np.multiply(rgb[..., 1], 65, out=tmp, dtype=np.uint16)
+    y += tmp
+    np.multiply(rgb[..., 2], 33, out=tmp, dtype=np.uint16)
+    y += tmp
+    y += 64
+    y >>= 7
+    y += 16
+    np.copyto(y_out, y, casting='unsafe')
+
+    # AVERAGE: (sum of the 2x2 pixels + 1) >> 1, the chroma coefficients are halved to match
+    for c, name in enumerate('bgr'):
+      avg = s[name]
+      np.add(rgb[0::2, 0::2, c], rgb[0::2, 1::2, c], out=avg, dtype=np.uint16)
+      avg += rgb[1::2, 0::2, c]
+      avg += rgb[1::2, 1::2, c]
+      avg += 1
+      avg >>= 1
+
+    # RGB_TO_U and RGB_TO_V, adding the offset first keeps every intermediate positive
+    uv, tmp = s['uv'], s['uv_tmp']
+    for out_col, (pos, neg1, neg2) in enumerate(((('b', 56), ('g', 37), ('r', 19)), (('r', 56), ('g', 47), ('b', 9)))):
+      np.multiply(s[pos[0]], pos[1], out=uv)
+      uv += 0x8080
+      np.multiply(s[neg1[0]], neg1[1], out=tmp)
+      uv -= tmp
+      np.multiply(s[neg2[0]], neg2[1], out=tmp)
+      uv -= tmp
+      uv >>= 8
+      np.copyto(uv_out[:, out_col::2], uv, casting='unsafe')
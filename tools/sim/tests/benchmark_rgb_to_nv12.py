@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# Simulator camera frames converted per second at the sim resolution, for the CPU backend and OpenCL if available
+import os
+import time
+import numpy as np
+
+from openpilot.tools.sim.lib.common import W, H
+from openpilot.tools.sim.lib.rgb_to_nv12 import RgbToNv12
+
+N = int(os.getenv("N", "100"))
+
+
+def bench(conv):
+  rgb = np.random.default_rng(0).integers(0, 256, (H, W, 3), dtype=np.uint8)
+  out = np.empty(W * H * 3 // 2, dtype=np.uint8)
+  conv(rgb, out)
+  st = time.perf_counter()
+  for _ in range(N):
+    conv(rgb, out)
+  return N / (time.perf_counter() - st)
+
+
+if __name__ == "__main__":
+  print(f"{W}x{H}, {os.cpu_count()} cpus")
+  for threads in sorted({1, 2, 4, os.cpu_count() or 1}):
+    print(f"cpu, {threads} threads: {bench(RgbToNv12(W, H, threads=threads)):6.1f} fps")
+  try:
+    from openpilot.tools.sim.lib.camerad import ClRgbToNv12
+    print(f"opencl:          {bench(ClRgbToNv12(W, H)):6.1f} fps")
+  except Exception as e:
+    print(f"opencl unavailable: {e}")
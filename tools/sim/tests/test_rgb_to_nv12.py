@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from openpilot.tools.sim.lib.common import W, H
+from openpilot.tools.sim.lib.rgb_to_nv12 import RgbToNv12
+
+
+def kernel_pixel(b, g, r):
+  return ((b * 13 + g * 65 + r * 33 + 64) >> 7) + 16
+
+def kernel_uv(pixels):
+  # pixels is the 2x2 block, each (b, g, r)
+  ab, ag, ar = ((sum(p[c] for p in pixels) + 1) >> 1 for c in range(3))
+  return (ab * 56 - ag * 37 - ar * 19 + 0x8080) >> 8, (ar * 56 - ag * 47 - ab * 9 + 0x8080) >> 8
+
+def reference_nv12(rgb):
+  """rgb_to_nv12.cl pixel by pixel"""
+  h, w, _ = rgb.shape
+  rgb = rgb.astype(int).tolist()
+  out = [kernel_pixel(*rgb[row][col]) for row in range(h) for col in range(w)]
+  for row in range(0, h, 2):
+    for col in range(0, w, 2):
+      out += kernel_uv([rgb[row][col], rgb[row][col + 1], rgb[row + 1][col], rgb[row + 1][col + 1]])
+  return np.array(out, dtype=np.uint8)
+
+
+class TestRgbToNv12:
+  @pytest.mark.parametrize("width,height", [(2, 2), (8, 6), (38, 22)])
+  @pytest.mark.parametrize("threads", [1, 3])
+  def test_matches_kernel(self, width, height, threads):
+    rng = np.random.default_rng(width * height)
+    conv = RgbToNv12(width, height, threads=threads)
+    for rgb in (rng.integers(0, 256, (height, width, 3), dtype=np.uint8),
+                np.zeros((height, width, 3), dtype=np.uint8), np.full((height, width, 3), 255, dtype=np.uint8)):
+      np.testing.assert_array_equal(conv(rgb), reference_nv12(rgb))
+
+  def test_sim_resolution(self):
+    rng = np.random.default_rng(0)
+    rgb = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+    out = np.empty(W * H * 3 // 2, dtype=np.uint8)
+    single, banded = RgbToNv12(W, H), RgbToNv12(W, H, threads=4)
+    assert single(rgb, out) is out
+    np.testing.assert_array_equal(banded(rgb), out)
+    # spot check the planes against the kernel
+    for row, col in ((0, 0), (H - 2, W - 2), (H // 2, W // 3 * 2)):
+      assert out[row * W + col] == kernel_pixel(*rgb[row, col].astype(int))
+      block = [rgb[r, c].astype(int) for r in (row, row + 1) for c in (col, col + 1)]
+      assert tuple(out[W * H + row // 2 * W + col:][:2]) == kernel_uv(block)
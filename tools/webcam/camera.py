@@ -1,14 +1,38 @@
+import time
 import av
+import numpy as np
+
+class CameraStats:
+  def __init__(self):
+    self.frames = 0
+    self.dropped = 0
+    self.convert_time = 0.
+    self.max_convert_time = 0.
+
+  def update(self, dropped, convert_time):
+    self.frames += 1
+    self.dropped += dropped
+    self.convert_time += convert_time
+    self.max_convert_time = max(self.max_convert_time, convert_time)
+
+  def summary(self):
+    return {
+      'frames': self.frames,
+      'dropped': self.dropped,
+      'convert_ms_mean': 1e3 * self.convert_time / max(self.frames, 1),
+      'convert_ms_max': 1e3 * self.max_convert_time,
+    }
 
 class Camera:
-  def __init__(self, cam_type_state, stream_type, camera_id):
+  def __init__(self, cam_type_state, stream_type, camera_id, n_buffers=2):
     try:
       camera_id = int(camera_id)
-    except ValueError: # allow strings, ex: /dev/video0
+    except ValueError: # allow strings, ex: /dev/video0 or a video file
       pass
     self.cam_type_state = cam_type_state
     self.stream_type = stream_type
     self.cur_frame_id = 0
+    self.stats = CameraStats()
 
     self.container = av.open(camera_id)
     assert self.container.streams.video, f"Can't open video stream for camera {camera_id}"
@@ -16,14 +40,39 @@ class Camera:
     self.W = self.video_stream.codec_context.width
     self.H = self.video_stream.codec_context.height
 
-  @classmethod
-  def bgr2nv12(self, bgr):
-    frame = av.VideoFrame.from_ndarray(bgr, format='bgr24')
-    return frame.reformat(format='nv12').to_ndarray()
+    # VisionIpcServer.send copies the frame, so a couple of buffers are reused round robin
+    self.buffers = [np.empty(self.W * self.H * 3 // 2, dtype=np.uint8) for _ in range(n_buffers)]
+    self.last_pts = None
+
+  def _dropped_frames(self, frame):
+    # gaps in the presentation timestamps are frames the device or decoder dropped
+    rate = self.video_stream.average_rate or self.video_stream.guessed_rate
+    if frame.pts is None or frame.time_base is None or not rate:
+      return 0
+    dropped = 0
+    if self.last_pts is not None:
+      dropped = max(0, round(float((frame.pts - self.last_pts) * frame.time_base * rate)) - 1)
+    self.last_pts = frame.pts
+    return dropped
+
+  @staticmethod
+  def frame_to_nv12(frame, out):
+    """Reformats a decoded frame of any pixel format to NV12 once, and copies its planes into out"""
+    nv12 = frame if frame.format.name == 'nv12' else frame.reformat(format='nv12')
+    w, h = nv12.width, nv12.height
+    for plane, dst in zip(nv12.planes, (out[:w * h], out[w * h:]), strict=True):
+      src = np.frombuffer(plane, dtype=np.uint8)
+      if plane.line_size == w:
+        dst[:] = src[:dst.size]
+      else:
+        dst.reshape(-1, w)[:] = src.reshape(-1, plane.line_size)[:dst.size // w, :w]
+    return out
 
   def read_frames(self):
-    for frame in self.container.decode(self.video_stream):
-      img = frame.to_rgb().to_ndarray()[:,:, ::-1] # convert to bgr24
-      yuv = Camera.bgr2nv12(img)
-      yield yuv.data.tobytes()
+    """Yields NV12 frames, each one valid until the buffers wrap around"""
+    for i, frame in enumerate(self.container.decode(self.video_stream)):
+      st = time.monotonic()
+      yuv = Camera.frame_to_nv12(frame, self.buffers[i % len(self.buffers)])
+      self.stats.update(self._dropped_frames(frame), time.monotonic() - st)
+      yield yuv
     self.container.close()
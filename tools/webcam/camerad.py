@@ -8,6 +8,7 @@ from cereal import messaging
 
 from openpilot.tools.webcam.camera import Camera
 from openpilot.common.realtime import Ratekeeper
+from openpilot.common.swaglog import cloudlog
 
 DUAL_CAM = os.getenv("DUAL_CAMERA")
 CameraType = namedtuple("CameraType", ["msg_name", "stream_type", "cam_id"])
@@ -17,6 +18,8 @@ CAMERAS = [
 ]
 if DUAL_CAM:
   CAMERAS.append(CameraType("wideRoadCameraState", VisionStreamType.VISION_STREAM_WIDE_ROAD, DUAL_CAM))
+# frames between camera stats logs
+STATS_INTERVAL = 20 * 60
 
 class Camerad:
   def __init__(self):
@@ -49,7 +52,10 @@ class Camerad:
     for yuv in cam.read_frames():
       self._send_yuv(yuv, cam.cur_frame_id, cam.cam_type_state, cam.stream_type)
       cam.cur_frame_id += 1
+      if cam.cur_frame_id % STATS_INTERVAL == 0:
+        cloudlog.info(f"{cam.cam_type_state} {cam.stats.summary()}")
       rk.keep_time()
+    cloudlog.info(f"{cam.cam_type_state} done {cam.stats.summary()}")
 
   def run(self):
     threads = []
@@ -0,0 +1,55 @@
+import av
+import numpy as np
+import pytest
+from fractions import Fraction
+
+from openpilot.tools.webcam.camera import Camera
+
+
+def write_video(path, width, height, n_frames, skip=()):
+  rng = np.random.default_rng(0)
+  frames = []
+  with av.open(str(path), 'w') as container:
+    stream = container.add_stream('ffv1', rate=20)
+    stream.width, stream.height, stream.pix_fmt = width, height, 'yuv420p'
+    stream.time_base = Fraction(1, 20)
+    pts = 0
+    for i in range(n_frames):
+      frame = av.VideoFrame.from_ndarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), format='rgb24').reformat(format='yuv420p')
+      pts += 1 + (i in skip)
+      frame.pts = pts
+      frames.append(frame.reformat(format='nv12').to_ndarray().reshape(-1))
+      container.mux(stream.encode(frame))
+    container.mux(stream.encode())
+  return frames
+
+
+class TestCamera:
+  @pytest.mark.parametrize("width,height", [(64, 48), (100, 50)])
+  def test_video_file(self, tmp_path, width, height):
+    path = tmp_path / "video.mkv"
+    expected = write_video(path, width, height, 10)
+    cam = Camera("roadCameraState", None, str(path))
+    assert (cam.W, cam.H) == (width, height)
+
+    frames = [yuv.copy() for yuv in cam.read_frames()]
+    assert len(frames) == len(expected)
+    for yuv, ref in zip(frames, expected, strict=True):
+      np.testing.assert_array_equal(yuv, ref)
+    assert cam.stats.frames == 10 and cam.stats.dropped == 0
+
+  def test_buffers_reused(self, tmp_path):
+    path = tmp_path / "video.mkv"
+    write_video(path, 64, 48, 6)
+    cam = Camera("roadCameraState", None, str(path))
+    ids = {id(yuv) for yuv in cam.read_frames()}
+    assert ids == {id(b) for b in cam.buffers}
+
+  def test_dropped_frames(self, tmp_path):
+    path = tmp_path / "video.mkv"
+    write_video(path, 64, 48, 10, skip=(3, 7))
+    cam = Camera("roadCameraState", None, str(path))
+    for _ in cam.read_frames():
+      pass
+    assert cam.stats.frames == 10 and cam.stats.dropped == 2
+    assert cam.stats.summary()['convert_ms_max'] > 0